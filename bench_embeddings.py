@@ -0,0 +1,100 @@
+"""
+Benchmark the embedding backends: parity of the ONNX Runtime backends
+(full precision and int8-quantized) with the sentence-transformers (torch)
+backend, and throughput of each at several batch sizes.
+
+Parity is the cosine similarity between each text's ONNX and torch
+embeddings; the script exits non-zero if any text falls below
+--min-cosine, so it can gate an export or a model upgrade.
+
+Export the ONNX model first, then run this from the backend directory:
+    python manage.py export_onnx_model --output storage/models/minilm-onnx
+    python bench_embeddings.py --onnx-path storage/models/minilm-onnx
+"""
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from faiss_manager.embedding_backends import ONNXBackend, SentenceTransformerBackend
+
+WORDS = (
+    'the document describes a method for retrieving relevant passages from large collections '
+    'of text using dense vector embeddings and approximate nearest neighbour search over an index '
+    'which is rebuilt when new files are uploaded and queried by users asking questions in chat'
+).split()
+
+
+def sample_texts(count: int, seed: int = 0) -> list:
+    """Make texts of varied length, from short queries to chunk-sized passages."""
+    rng = random.Random(seed)
+    return [' '.join(rng.choices(WORDS, k=rng.choice((4, 8, 16, 64, 160)))) for _ in range(count)]
+
+
+def throughput(backend, texts: list, batch_size: int, runs: int) -> float:
+    """Get the best texts/second over runs, calling encode with batch_size texts at a time."""
+    backend.encode(texts[:batch_size])  # Warm up
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        for offset in range(0, len(texts), batch_size):
+            backend.encode(texts[offset:offset + batch_size])
+        best = min(best, time.perf_counter() - start)
+    return len(texts) / best
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Row-wise cosine similarity of two embedding arrays."""
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='sentence-transformers/all-MiniLM-L6-v2',
+                        help='sentence-transformers model name or local path for the torch backend')
+    parser.add_argument('--onnx-path', required=True, help='ONNX model directory (export_onnx_model output)')
+    parser.add_argument('--texts', help='File with one text per line (default: generated texts)')
+    parser.add_argument('--count', type=int, default=512, help='Number of generated texts')
+    parser.add_argument('--batch-sizes', default='1,8,32', help='Comma-separated batch sizes to time')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=0, help='Threads per backend, 0 = library default')
+    parser.add_argument('--min-cosine', type=float, default=0.99, help='Lowest acceptable per-text cosine')
+    args = parser.parse_args()
+    
+    if args.texts:
+        with open(args.texts, encoding='utf-8') as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        texts = sample_texts(args.count)
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+    
+    torch_backend = SentenceTransformerBackend(args.model, threads=args.threads)
+    backends = {
+        'torch': torch_backend,
+        'onnx': ONNXBackend(args.onnx_path, threads=args.threads),
+        'onnx int8': ONNXBackend(args.onnx_path, quantize=True, threads=args.threads),
+    }
+    
+    reference = torch_backend.encode(texts)
+    passed = True
+    
+    print(f"{len(texts)} texts\n")
+    print(f"{'backend':<10} {'mean cos':>9} {'min cos':>9}  " + ' '.join(f"{f'bs={size} t/s':>11}" for size in batch_sizes))
+    for label, backend in backends.items():
+        similarities = cosine(backend.encode(texts), reference)
+        if similarities.min() < args.min_cosine:
+            passed = False
+        
+        rates = [throughput(backend, texts, size, args.runs) for size in batch_sizes]
+        print(f"{label:<10} {similarities.mean():>9.5f} {similarities.min():>9.5f}  "
+              + ' '.join(f"{rate:>11.1f}" for rate in rates))
+    
+    if not passed:
+        print(f"\nParity check failed: some texts below cosine {args.min_cosine}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
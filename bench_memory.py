@@ -0,0 +1,121 @@
+"""
+Benchmark per-worker memory of gunicorn with and without preloading the
+embedding model and FAISS index in the master (see gunicorn.conf.py).
+
+For each mode this starts gunicorn with warm-up enabled, waits until the
+workers report ready, and reads each worker's RSS, PSS (RSS with shared
+pages split between the processes sharing them) and private memory from
+/proc, so it needs Linux.
+
+Run this from the backend directory with an index already built:
+    python bench_memory.py --workers 4
+"""
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+
+def read_smaps(pid: int) -> dict:
+    """Get RSS, PSS and private memory of a process in MB."""
+    fields = {}
+    for line in Path(f'/proc/{pid}/smaps_rollup').read_text().splitlines()[1:]:
+        name, value = line.split(':', 1)
+        fields[name] = int(value.split()[0]) / 1024
+    
+    return {
+        'rss': fields['Rss'],
+        'pss': fields['Pss'],
+        'private': fields['Private_Clean'] + fields['Private_Dirty'],
+    }
+
+
+def worker_pids(master_pid: int) -> list:
+    """Get the PIDs of a process's children (gunicorn workers)."""
+    children = Path(f'/proc/{master_pid}/task/{master_pid}/children').read_text().split()
+    return [int(pid) for pid in children]
+
+
+def wait_until_ready(url: str, workers: int, timeout: float):
+    """Poll the readiness endpoint until enough consecutive requests succeed."""
+    deadline = time.monotonic() + timeout
+    successes = 0
+    while successes < workers * 4:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Workers not ready after {timeout:.0f}s")
+        try:
+            with urllib.request.urlopen(url, timeout=5):
+                successes += 1
+        except (urllib.error.URLError, ConnectionError):
+            successes = 0
+            time.sleep(0.5)
+
+
+def measure(preload: bool, args) -> dict:
+    """Start gunicorn in one mode and measure its workers once they are warm."""
+    env = dict(
+        os.environ,
+        GUNICORN_PRELOAD=str(preload),
+        GUNICORN_WORKERS=str(args.workers),
+        GUNICORN_BIND=f'127.0.0.1:{args.port}',
+        FAISS_WARMUP='True',
+    )
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'config.wsgi:application'],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    
+    try:
+        wait_until_ready(f'http://127.0.0.1:{args.port}/api/faiss/ready/', args.workers, args.timeout)
+        time.sleep(args.settle)
+        workers = [read_smaps(pid) for pid in worker_pids(server.pid)]
+        master = read_smaps(server.pid)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+    
+    return {
+        'master': master,
+        'workers': workers,
+        'total_pss': master['pss'] + sum(worker['pss'] for worker in workers),
+    }
+
+
+def report(label: str, result: dict):
+    workers = result['workers']
+    print(f"{label:<12} {len(workers):>7} "
+          f"{statistics.mean(worker['rss'] for worker in workers):>10.1f} "
+          f"{statistics.mean(worker['pss'] for worker in workers):>10.1f} "
+          f"{statistics.mean(worker['private'] for worker in workers):>12.1f} "
+          f"{result['total_pss']:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--timeout', type=float, default=300, help='Seconds to wait for workers to warm up')
+    parser.add_argument('--settle', type=float, default=2, help='Seconds to wait after warm-up before measuring')
+    args = parser.parse_args()
+    
+    results = {
+        'no preload': measure(False, args),
+        'preload': measure(True, args),
+    }
+    
+    print(f"{'mode':<12} {'workers':>7} {'RSS MB':>10} {'PSS MB':>10} {'private MB':>12} {'total PSS':>11}")
+    print(f"{'':<12} {'':>7} {'(mean per worker)':>34} {'(all procs)':>11}")
+    for label, result in results.items():
+        report(label, result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark PDF text extraction in-process and on process pools of several
+sizes (see PDF_EXTRACT_PROCESSES), checking that every pool size extracts
+exactly the same text as the in-process path.
+
+Without --pdf a PDF of --pages generated text pages is used. Run this from
+the backend directory:
+    python bench_pdf_extraction.py --pdf manual.pdf --processes 2,4,8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from documents.pdf_extraction import extract_pages, extract_pages_in_parallel
+
+
+def make_pdf(path: str, pages: int):
+    """Write a PDF of pages pages, each filled with lines of text."""
+    import fitz
+    
+    with fitz.open() as pdf_document:
+        for page_num in range(pages):
+            page = pdf_document.new_page()
+            text = '\n'.join(f'Page {page_num + 1} line {line}: the quick brown fox jumps over the lazy dog'
+                             for line in range(50))
+            page.insert_text((36, 36), text, fontsize=8)
+        pdf_document.save(path)
+
+
+def extract_in_process(path: str) -> dict:
+    """Extract all pages in this process, as below PDF_EXTRACT_MIN_PAGES."""
+    import fitz
+    
+    with fitz.open(path) as pdf_document:
+        return extract_pages(pdf_document, 0, len(pdf_document))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pdf', help='PDF file to extract (default: a generated one)')
+    parser.add_argument('--pages', type=int, default=600, help='Pages of the generated PDF')
+    parser.add_argument('--processes', default=f'2,{os.cpu_count() or 1}', help='Comma-separated pool sizes')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.pdf
+        if not path:
+            path = os.path.join(tmp_dir, 'generated.pdf')
+            make_pdf(path, args.pages)
+        
+        import fitz
+        with fitz.open(path) as pdf_document:
+            page_count = len(pdf_document)
+        
+        def best_of(extract):
+            best, result = float('inf'), None
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                result = extract()
+                best = min(best, time.perf_counter() - start)
+            return best, result
+        
+        baseline, reference = best_of(lambda: extract_in_process(path))
+        print(f"{page_count} pages, {os.cpu_count()} cores\n")
+        print(f"{'processes':>9} {'seconds':>8} {'speedup':>8}")
+        print(f"{'in-proc':>9} {baseline:>8.2f} {1.0:>8.2f}")
+        
+        passed = True
+        for processes in sorted({int(count) for count in args.processes.split(',')}):
+            seconds, text_by_page = best_of(lambda: extract_pages_in_parallel(path, page_count, processes))
+            if text_by_page != reference or list(text_by_page) != list(reference):
+                passed = False
+            print(f"{processes:>9} {seconds:>8.2f} {baseline / seconds:>8.2f}")
+    
+    if not passed:
+        print("\nParallel extraction differs from in-process extraction")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
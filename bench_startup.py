@@ -0,0 +1,89 @@
+"""
+Benchmark process startup: time and peak memory to set up Django and import
+the URL configuration (what manage.py commands, Celery workers and every
+web worker pay), and which heavy libraries that pulls in.
+
+Run this from the backend directory:
+    python bench_startup.py
+    python bench_startup.py --compare HEAD~1   # also measure another git revision
+"""
+import argparse
+import json
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+HEAVY_MODULES = ['torch', 'sentence_transformers', 'onnxruntime', 'faiss', 'fitz', 'google.generativeai']
+
+# Runs in a fresh interpreter inside the tree being measured
+PROBE = f'''
+import json, os, resource, sys, time
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+start = time.perf_counter()
+import django
+django.setup()
+import config.urls
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': seconds,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy_modules': [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+'''
+
+
+def measure(tree: Path, runs: int) -> dict:
+    """Run the probe in tree several times and return median time and memory."""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE],
+            cwd=tree,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    
+    return {
+        'seconds': statistics.median(sample['seconds'] for sample in samples),
+        'max_rss_mb': statistics.median(sample['max_rss_mb'] for sample in samples),
+        'heavy_modules': samples[-1]['heavy_modules'],
+    }
+
+
+def measure_revision(revision: str, runs: int) -> dict:
+    """Check out a git revision into a temporary worktree and measure it."""
+    tree = Path(tempfile.mkdtemp(prefix='bench-startup-'))
+    subprocess.run(['git', 'worktree', 'add', '--detach', str(tree), revision], check=True, capture_output=True)
+    try:
+        if Path('.env').exists():
+            shutil.copy('.env', tree / '.env')
+        return measure(tree, runs)
+    finally:
+        subprocess.run(['git', 'worktree', 'remove', '--force', str(tree)], check=True, capture_output=True)
+
+
+def report(label: str, result: dict):
+    print(f"{label:<20} {result['seconds'] * 1000:>9.0f} ms {result['max_rss_mb']:>9.1f} MB   "
+          f"{', '.join(result['heavy_modules']) or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per measurement (median is reported)')
+    parser.add_argument('--compare', metavar='REVISION', help='Also measure this git revision, e.g. HEAD~1')
+    args = parser.parse_args()
+    
+    print(f"{'tree':<20} {'startup':>12} {'peak RSS':>12}   heavy modules imported")
+    if args.compare:
+        report(args.compare, measure_revision(args.compare, args.runs))
+    report('working tree', measure(Path.cwd(), args.runs))
+
+
+if __name__ == '__main__':
+    main()
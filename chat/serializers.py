@@ -61,6 +61,16 @@ class ChatQuerySerializer(serializers.Serializer):
         max_value=20,
         help_text="Number of chunks to retrieve (1-20)"
     )
+    nprobe = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        help_text="Optional number of IVF lists to visit (IVF indexes only)"
+    )
+    ef_search = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        help_text="Optional HNSW search depth (HNSW indexes only)"
+    )
 
 
 class ChatResponseSerializer(serializers.Serializer):
@@ -3,7 +3,7 @@ Chat and RAG query services with Google Gemini integration.
 """
 from typing import List, Dict, Optional
 from django.conf import settings
-from faiss_manager.services import faiss_service
+from faiss_manager import retrieval
 from .models import Conversation, Message
 import logging
 import os
@@ -46,7 +46,9 @@ class ChatService:
         question: str,
         conversation_id: Optional[str] = None,
         document_ids: Optional[List[str]] = None,
-        top_k: int = 5
+        top_k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None
     ) -> Dict:
         """
         Process a RAG query: search documents, build context, query LLM.
@@ -56,6 +58,8 @@ class ChatService:
             conversation_id: Optional conversation ID for context
             document_ids: Optional list of document IDs to search within
             top_k: Number of context chunks to retrieve
+            nprobe: Optional IVF search breadth override
+            ef_search: Optional HNSW search depth override
             
         Returns:
             Dictionary with answer, sources, and metadata
@@ -63,10 +67,12 @@ class ChatService:
         try:
             # Step 1: Search for relevant chunks using FAISS
             logger.info(f"Searching for top {top_k} relevant chunks...")
-            search_results = faiss_service.search(
+            search_results = retrieval.search(
                 query=question,
                 top_k=top_k,
-                document_ids=document_ids
+                document_ids=document_ids,
+                nprobe=nprobe,
+                ef_search=ef_search
             )
             
             if not search_results:
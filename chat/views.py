@@ -37,6 +37,8 @@ class ChatQueryView(APIView):
         conversation_id = serializer.validated_data.get('conversation_id')
         document_filter = serializer.validated_data.get('document_filter', [])
         top_k = serializer.validated_data.get('top_k', 5)
+        nprobe = serializer.validated_data.get('nprobe')
+        ef_search = serializer.validated_data.get('ef_search')
         
         # Get or create conversation
         if conversation_id:
@@ -68,7 +70,9 @@ class ChatQueryView(APIView):
                 question=question,
                 conversation_id=conversation_id,
                 document_ids=document_filter if document_filter else None,
-                top_k=top_k
+                top_k=top_k,
+                nprobe=nprobe,
+                ef_search=ef_search
             )
             
             # Save assistant response
@@ -180,6 +180,17 @@ CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
 CELERY_TASK_SOFT_TIME_LIMIT = 25 * 60  # 25 minutes
+# Run tasks in-process instead of through the broker (development and tests, no worker
+# needed); retries and failure handlers still run, and ingest_document() logs the error
+# of a failed stage instead of raising it, leaving the document marked failed
+CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', 'False') == 'True'
+# Retries of a failed document ingestion stage, with exponential backoff
+DOCUMENT_TASK_MAX_RETRIES = int(os.getenv('DOCUMENT_TASK_MAX_RETRIES', '3'))
+# PDFs of at least PDF_EXTRACT_MIN_PAGES pages have their text extracted by page range on
+# PDF_EXTRACT_PROCESSES worker processes (0 or 1 = in-process); needs a Celery worker
+# started with --pool=threads or --pool=solo, since prefork workers cannot start processes
+PDF_EXTRACT_PROCESSES = int(os.getenv('PDF_EXTRACT_PROCESSES', '0'))
+PDF_EXTRACT_MIN_PAGES = int(os.getenv('PDF_EXTRACT_MIN_PAGES', '100'))
 
 # Redis Cache
 CACHES = {
@@ -207,6 +218,82 @@ GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
 # Embedding Configuration
 EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
 EMBEDDING_DIMENSION = int(os.getenv('EMBEDDING_DIMENSION', '384'))
+# Backend running the model: sentence_transformers (torch) or onnx (ONNX Runtime).
+# EMBEDDING_MODEL_PATH is a local model directory, so nothing is downloaded; the onnx
+# backend requires one (python manage.py export_onnx_model writes it), and with
+# EMBEDDING_ONNX_QUANTIZE it runs the int8 dynamic-quantized model
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'sentence_transformers')
+EMBEDDING_MODEL_PATH = os.getenv('EMBEDDING_MODEL_PATH', '')
+EMBEDDING_ONNX_QUANTIZE = os.getenv('EMBEDDING_ONNX_QUANTIZE', 'False') == 'True'
+# Query embeddings are cached in an in-process LRU (0 disables it) and, if set,
+# in the shared CACHES alias below (e.g. 'default' for Redis)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '10000'))
+QUERY_EMBEDDING_SHARED_CACHE = os.getenv('QUERY_EMBEDDING_SHARED_CACHE', '')
+QUERY_EMBEDDING_SHARED_CACHE_TTL = int(os.getenv('QUERY_EMBEDDING_SHARED_CACHE_TTL', '86400'))  # seconds
+# Concurrent query encodes are gathered for up to EMBEDDING_BATCH_MAX_WAIT_MS or
+# EMBEDDING_BATCH_MAX_SIZE texts and run as one batched forward pass; a query with
+# no other query queued is encoded at once
+EMBEDDING_BATCHING = os.getenv('EMBEDDING_BATCHING', 'True') == 'True'
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv('EMBEDDING_BATCH_MAX_WAIT_MS', '2'))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', '32'))
+# Bulk embedding (index builds) of at least EMBEDDING_POOL_MIN_TEXTS texts is sharded
+# across EMBEDDING_POOL_PROCESSES worker processes (0 or 1 = in-process), each with
+# cpu_count / processes threads; sub-batches are sized adaptively up to EMBEDDING_POOL_MAX_BATCH
+EMBEDDING_POOL_PROCESSES = int(os.getenv('EMBEDDING_POOL_PROCESSES', '0'))
+EMBEDDING_POOL_MIN_TEXTS = int(os.getenv('EMBEDDING_POOL_MIN_TEXTS', '1000'))
+EMBEDDING_POOL_MAX_BATCH = int(os.getenv('EMBEDDING_POOL_MAX_BATCH', '1024'))
+
+# FAISS Configuration
+# Index type: flat (exact), sq8, sq_fp16, pq (compressed), ivf_flat, ivf_pq or hnsw (approximate)
+FAISS_INDEX_TYPE = os.getenv('FAISS_INDEX_TYPE', 'flat')
+FAISS_IVF_NLIST = int(os.getenv('FAISS_IVF_NLIST', '0'))  # 0 = ~4*sqrt(vectors)
+FAISS_PQ_M = int(os.getenv('FAISS_PQ_M', '48'))  # PQ sub-quantizers, must divide the dimension
+FAISS_PQ_NBITS = int(os.getenv('FAISS_PQ_NBITS', '8'))
+FAISS_HNSW_M = int(os.getenv('FAISS_HNSW_M', '32'))
+FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv('FAISS_HNSW_EF_CONSTRUCTION', '200'))
+FAISS_TRAIN_SAMPLE_SIZE = int(os.getenv('FAISS_TRAIN_SAMPLE_SIZE', '100000'))
+# Default search-time knobs (overridable per request)
+FAISS_NPROBE = int(os.getenv('FAISS_NPROBE', '16'))
+FAISS_EF_SEARCH = int(os.getenv('FAISS_EF_SEARCH', '64'))
+# Memory-map saved indexes read-only so worker processes share one page-cache copy
+FAISS_MMAP = os.getenv('FAISS_MMAP', 'True') == 'True'
+# Re-rank candidates from compressed indexes with full-precision vectors kept on disk
+FAISS_RERANK = os.getenv('FAISS_RERANK', 'True') == 'True'
+FAISS_RERANK_FACTOR = int(os.getenv('FAISS_RERANK_FACTOR', '4'))  # candidates fetched per result
+# Compact the index once this fraction of its vectors belongs to deleted chunks or sits in the delta index
+FAISS_COMPACTION_RATIO = float(os.getenv('FAISS_COMPACTION_RATIO', '0.2'))
+# Merge the delta segments into one once there are more than this many, bounding the delta
+# indexes each search visits and the segments loading a snapshot replays
+FAISS_MAX_DELTA_SEGMENTS = int(os.getenv('FAISS_MAX_DELTA_SEGMENTS', '16'))
+# Number of published index snapshot versions kept on disk
+FAISS_SNAPSHOT_KEEP = int(os.getenv('FAISS_SNAPSHOT_KEEP', '3'))
+# Seconds between checks for index snapshots published by other processes (0 checks on every search)
+FAISS_VERSION_CHECK_INTERVAL = float(os.getenv('FAISS_VERSION_CHECK_INTERVAL', '1.0'))
+# Ingested documents are appended to the index in batches, one snapshot version per batch:
+# a batch is committed this many seconds after its first document (0 commits each document
+# on its own) or as soon as it holds FAISS_INDEX_COMMIT_MAX_DOCUMENTS documents
+FAISS_INDEX_COMMIT_INTERVAL = float(os.getenv('FAISS_INDEX_COMMIT_INTERVAL', '5.0'))
+FAISS_INDEX_COMMIT_MAX_DOCUMENTS = int(os.getenv('FAISS_INDEX_COMMIT_MAX_DOCUMENTS', '50'))
+# Maximum number of queries accepted by /api/faiss/search-batch/
+FAISS_SEARCH_BATCH_MAX_QUERIES = int(os.getenv('FAISS_SEARCH_BATCH_MAX_QUERIES', '1000'))
+# Load the embedding model and index when a server process (gunicorn, uvicorn, daphne or
+# runserver) starts, in a background thread if FAISS_WARMUP_BACKGROUND; /api/faiss/ready/
+# returns 503 until warm-up is done
+FAISS_WARMUP = os.getenv('FAISS_WARMUP', 'False') == 'True'
+FAISS_WARMUP_BACKGROUND = os.getenv('FAISS_WARMUP_BACKGROUND', 'True') == 'True'
+# Set by gunicorn.conf.py in preload mode: the master loads the model and index
+# before fork so workers share them copy-on-write
+FAISS_PRELOAD = os.getenv('FAISS_PRELOAD', 'False') == 'True'
+FAISS_WORKER_THREADS = int(os.getenv('FAISS_WORKER_THREADS', '0'))  # embedding backend/FAISS threads per worker, 0 = library default
+# Optional retrieval server (manage.py run_retrieval_server) owning the model and index;
+# web workers search through it when set and fall back to in-process search if it is down
+RETRIEVAL_SERVER_SOCKET = os.getenv('RETRIEVAL_SERVER_SOCKET', '')
+RETRIEVAL_SERVER_TIMEOUT = float(os.getenv('RETRIEVAL_SERVER_TIMEOUT', '10'))  # seconds
+RETRIEVAL_SERVER_RETRY_INTERVAL = float(os.getenv('RETRIEVAL_SERVER_RETRY_INTERVAL', '5'))  # seconds before retrying after a failure
+RETRIEVAL_CLIENT_POOL_SIZE = int(os.getenv('RETRIEVAL_CLIENT_POOL_SIZE', '4'))  # idle connections kept per process
+# Search results are cached per index snapshot version (0 disables the cache)
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv('SEARCH_RESULT_CACHE_SIZE', '1000'))
+SEARCH_RESULT_CACHE_TTL = float(os.getenv('SEARCH_RESULT_CACHE_TTL', '300'))  # seconds
 
 # RAG Configuration
 CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', '1000'))
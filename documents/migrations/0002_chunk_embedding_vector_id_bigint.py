@@ -0,0 +1,22 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("documents", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="chunk",
+            name="embedding_vector_id",
+            field=models.BigIntegerField(
+                blank=True,
+                help_text="Stable FAISS vector ID, kept across index rebuilds",
+                null=True,
+            ),
+        ),
+    ]
@@ -64,9 +64,8 @@ class Chunk(models.Model):
     chunk_token_count = models.IntegerField(default=0)
     start_char_index = models.IntegerField(default=0)
     end_char_index = models.IntegerField(default=0)
-    embedding_vector_id = models.CharField(
-        max_length=100,
-        help_text="Maps to FAISS index position",
+    embedding_vector_id = models.BigIntegerField(
+        help_text="Stable FAISS vector ID, kept across index rebuilds",
         null=True,
         blank=True
     )
@@ -0,0 +1,68 @@
+"""
+PDF text extraction by page range, in-process or on a process pool.
+
+This module does not import Django, so spawned pool workers can import
+it without setting Django up.
+"""
+import math
+import multiprocessing
+from typing import Dict, List, Tuple
+
+# Page ranges per pool process; several per process even out ranges of slow (e.g. dense) pages
+RANGES_PER_PROCESS = 4
+
+
+def extract_pages(pdf_document, start: int, stop: int) -> Dict[int, str]:
+    """
+    Extract the text of pages start to stop - 1 (0-based) of an open PDF.
+    
+    Returns:
+        Dictionary mapping page number (1-based) to text, for pages with text
+    """
+    text_by_page = {}
+    
+    for page_num in range(start, stop):
+        text = pdf_document[page_num].get_text()
+        
+        # Only store pages with actual text
+        if text.strip():
+            text_by_page[page_num + 1] = text.strip()
+    
+    return text_by_page
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> Dict[int, str]:
+    """Extract a page range in a pool worker, which opens its own copy of the PDF."""
+    import fitz
+    
+    with fitz.open(file_path) as pdf_document:
+        return extract_pages(pdf_document, start, stop)
+
+
+def page_ranges(page_count: int, count: int) -> List[Tuple[int, int]]:
+    """Split pages 0 to page_count - 1 into at most count contiguous (start, stop) ranges of even size."""
+    size = max(1, math.ceil(page_count / max(1, min(count, page_count))))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def extract_pages_in_parallel(file_path: str, page_count: int, processes: int) -> Dict[int, str]:
+    """
+    Extract all pages of a PDF on a pool of processes.
+    
+    Workers are spawned rather than forked, since the calling process may
+    have threads (e.g. torch's) that do not survive fork. Results are
+    merged in page order.
+    
+    Returns:
+        Dictionary mapping page number (1-based) to text, for pages with text
+    """
+    ranges = page_ranges(page_count, processes * RANGES_PER_PROCESS)
+    
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(min(processes, len(ranges))) as pool:
+        parts = pool.starmap(_extract_page_range, [(file_path, start, stop) for start, stop in ranges])
+    
+    text_by_page = {}
+    for part in parts:
+        text_by_page.update(part)
+    return text_by_page
@@ -4,6 +4,7 @@ Signals for document processing
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
 from .models import Document
+from .services import pdf_service
 import os
 import logging
 
@@ -21,3 +22,7 @@ def delete_document_file(sender, instance, **kwargs):
             logger.info(f"Deleted file: {instance.file_path}")
         except Exception as e:
             logger.error(f"Error deleting file {instance.file_path}: {e}")
+    
+    # Extracted text left behind by an unfinished ingestion pipeline
+    if instance.file_path:
+        pdf_service.text_sidecar_path(instance).unlink(missing_ok=True)
@@ -0,0 +1,303 @@
+"""
+Celery tasks for the document ingestion pipeline.
+
+An uploaded document is ingested by a chain of four stages, each taking
+the document ID:
+    extract  text by page from the PDF, saved to a JSON sidecar file
+    chunk    Chunk records from the sidecar text
+    embed    chunk embeddings, saved to the embedding store
+    index    the document queued for the next FAISS index commit
+
+Documents are committed to the index in batches (see
+faiss_manager.index_writer): the index stage queues its document and the
+commit_index task appends everything queued in one snapshot version.
+Each stage checks what is already done (sidecar present, chunks created,
+embeddings stored, chunks indexed) and skips it, so a retried or re-run
+stage is harmless. Progress is recorded in Document.metadata['ingestion'].
+"""
+import json
+import os
+from typing import Dict
+from celery import Task, chain, shared_task
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from kombu.exceptions import OperationalError as BrokerError
+from django.utils import timezone
+
+from .models import Document
+from .services import InvalidPDFError, pdf_service
+from faiss_manager.index_writer import IndexCommitError, index_writer
+from faiss_manager.services import faiss_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+INGESTION_STAGES = ('extract', 'chunk', 'embed', 'index')
+
+
+class IngestionError(Exception):
+    """A document cannot be ingested; retrying will not help."""
+
+
+class IngestionTask(Task):
+    """
+    Base class of the pipeline stages.
+    
+    Transient errors (database, file system, broker) are retried with
+    exponential backoff. Others, such as IngestionError for a missing,
+    invalid or empty PDF, fail the stage at once. When a stage fails for
+    good, the document is marked failed.
+    """
+    
+    autoretry_for = (DatabaseError, OSError, BrokerError)
+    max_retries = settings.DOCUMENT_TASK_MAX_RETRIES
+    retry_backoff = True
+    retry_backoff_max = 300
+    acks_late = True
+    stage = None
+    
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        document_id = args[0] if args else kwargs.get('document_id')
+        logger.error(f"Ingestion of document {document_id} failed at stage {self.stage}: {str(exc)}")
+        _mark_failed(document_id, self.stage, str(exc))
+
+
+class CommitIndexTask(Task):
+    """
+    Base class of commit_index.
+    
+    Any error is retried with exponential backoff. When a commit fails
+    for good, every document of the batch it tried is dequeued and
+    marked failed, so none is left waiting or completed by a later
+    commit.
+    """
+    
+    autoretry_for = (Exception,)
+    max_retries = settings.DOCUMENT_TASK_MAX_RETRIES
+    retry_backoff = True
+    retry_backoff_max = 300
+    acks_late = True
+    
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        document_ids = exc.document_ids if isinstance(exc, IndexCommitError) else []
+        logger.error(f"Index commit of {len(document_ids)} documents failed: {str(exc)}")
+        
+        index_writer.dequeue(document_ids)
+        for document_id in document_ids:
+            _mark_failed(document_id, 'index', str(exc))
+
+
+def ingest_document(document_id: str):
+    """
+    Queue the ingestion pipeline for an uploaded document.
+    
+    With settings.CELERY_TASK_ALWAYS_EAGER the pipeline runs here, before
+    this returns. A stage that fails for good has marked the document
+    failed by then, so its error is logged rather than raised.
+    
+    Returns:
+        Celery AsyncResult of the pipeline's last stage, or None if an eager stage failed
+    """
+    document_id = str(document_id)
+    _record_progress(document_id, stage=INGESTION_STAGES[0], status='queued')
+    
+    pipeline = chain(
+        extract_document_text.si(document_id),
+        chunk_document.si(document_id),
+        embed_document_chunks.si(document_id),
+        index_document.si(document_id),
+    )
+    
+    try:
+        return pipeline.apply_async()
+    except Exception as e:
+        if not settings.CELERY_TASK_ALWAYS_EAGER:
+            # E.g. the broker is down: the caller decides what to do with the document
+            raise
+        # An eager chain re-raises the error of the stage that failed
+        logger.error(f"Ingestion of document {document_id} failed: {str(e)}")
+        return None
+
+
+@shared_task(base=IngestionTask, bind=True, stage='extract')
+def extract_document_text(self, document_id: str) -> str:
+    """Extract the PDF's text by page into the document's sidecar file."""
+    document = _start_stage(document_id, 'extract', processing_status='processing')
+    sidecar = pdf_service.text_sidecar_path(document)
+    
+    if sidecar.exists() or document.chunks.exists():
+        logger.info(f"Text of document {document_id} already extracted")
+        _finish_stage(document_id, 'extract')
+        return document_id
+    
+    try:
+        text_by_page = pdf_service.extract_text_from_pdf(document.file_path)
+    except InvalidPDFError as e:
+        raise IngestionError(str(e)) from e
+    if not text_by_page:
+        raise IngestionError('No text extracted from PDF')
+    
+    # Write to a temporary name, so a retried chunk stage never reads a partial file
+    temp_file = sidecar.with_suffix(f'.{os.getpid()}.tmp')
+    temp_file.write_text(json.dumps(text_by_page))
+    os.replace(temp_file, sidecar)
+    
+    Document.objects.filter(id=document_id).update(page_count=len(text_by_page))
+    _finish_stage(document_id, 'extract', pages=len(text_by_page))
+    return document_id
+
+
+@shared_task(base=IngestionTask, bind=True, stage='chunk')
+def chunk_document(self, document_id: str) -> str:
+    """Create the document's chunks from its sidecar text."""
+    document = _start_stage(document_id, 'chunk')
+    sidecar = pdf_service.text_sidecar_path(document)
+    
+    with transaction.atomic():
+        chunk_count = document.chunks.count()
+        if chunk_count:
+            logger.info(f"Document {document_id} already has {chunk_count} chunks")
+        else:
+            if not sidecar.exists():
+                raise IngestionError('Extracted text is missing; re-run the extract stage')
+            
+            text_by_page = {int(page): text for page, text in json.loads(sidecar.read_text()).items()}
+            chunk_count = pdf_service.create_chunks(document, text_by_page)
+            if chunk_count == 0:
+                raise IngestionError('No chunks created')
+    
+    # The text now lives in the chunks
+    sidecar.unlink(missing_ok=True)
+    
+    _finish_stage(document_id, 'chunk', chunks=chunk_count)
+    return document_id
+
+
+@shared_task(base=IngestionTask, bind=True, stage='embed')
+def embed_document_chunks(self, document_id: str) -> str:
+    """Embed the document's chunk texts into the embedding store."""
+    document = _start_stage(document_id, 'embed')
+    
+    # Texts already in the store (e.g. from an earlier attempt) are not re-encoded
+    chunk_texts = list(document.chunks.order_by('chunk_index').values_list('chunk_text', flat=True))
+    faiss_service.get_chunk_embeddings(chunk_texts)
+    
+    _finish_stage(document_id, 'embed', embedded=len(chunk_texts))
+    return document_id
+
+
+@shared_task(base=IngestionTask, bind=True, stage='index')
+def index_document(self, document_id: str) -> str:
+    """
+    Queue the document's chunk vectors for the next index commit.
+    
+    The document is completed by a commit_index task: one started now if
+    the queue is full (or commits are not coalesced), otherwise the one
+    scheduled when the window opened. A failed commit fails the whole
+    batch in that task, not this stage.
+    """
+    _start_stage(document_id, 'index')
+    opened = index_writer.enqueue(document_id)
+    _record_progress(document_id, stage='index', status='pending_commit')
+    
+    delay = index_writer.seconds_until_due()
+    if delay == 0 or settings.CELERY_TASK_ALWAYS_EAGER:
+        commit_index.apply_async()
+    elif opened:
+        commit_index.apply_async(countdown=delay)
+    return document_id
+
+
+@shared_task(base=CommitIndexTask, bind=True)
+def commit_index(self) -> int:
+    """
+    Commit the queued documents to the index once their window is due.
+    
+    A commit triggered by a full queue may have started a newer window
+    since this was scheduled; it is then re-scheduled for that window's
+    end. Eager tasks ignore countdowns, so they commit at once. Returns
+    the number of documents committed.
+    """
+    delay = index_writer.seconds_until_due()
+    if delay is None:
+        return 0
+    if delay > 0 and not settings.CELERY_TASK_ALWAYS_EAGER:
+        commit_index.apply_async(countdown=delay)
+        return 0
+    return _commit_pending()
+
+
+def _commit_pending() -> int:
+    """Commit the queued documents to the index and mark them completed, returning how many were committed."""
+    added = index_writer.commit()
+    
+    for document_id, vectors in added.items():
+        if not Document.objects.filter(id=document_id).update(processing_status='completed', processing_error=None):
+            # Deleted since the commit read the queue
+            continue
+        _finish_stage(document_id, 'index', status='completed', vectors=vectors)
+        logger.info(f"Document {document_id} ingested")
+    
+    # A document queued while the commit ran found the queue non-empty and scheduled nothing
+    delay = index_writer.seconds_until_due()
+    if delay is not None:
+        if settings.CELERY_TASK_ALWAYS_EAGER:
+            return len(added) + _commit_pending()
+        commit_index.apply_async(countdown=delay)
+    
+    return len(added)
+
+
+def _mark_failed(document_id: str, stage: str, error: str):
+    """Mark a document failed at a stage, unless it was deleted."""
+    try:
+        with transaction.atomic():
+            document = Document.objects.select_for_update().get(id=document_id)
+            document.processing_status = 'failed'
+            document.processing_error = error
+            _update_ingestion(document, stage=stage, status='failed', error=error)
+            document.save(update_fields=['processing_status', 'processing_error', 'metadata'])
+    except Document.DoesNotExist:
+        pass
+
+
+def _start_stage(document_id: str, stage: str, **fields) -> Document:
+    """Record that a stage is running, returning the document."""
+    _record_progress(document_id, stage=stage, status='running', **fields)
+    return Document.objects.get(id=document_id)
+
+
+def _finish_stage(document_id: str, stage: str, status: str = 'running', **fields):
+    """Record that a stage completed, with any counts it produced."""
+    _record_progress(document_id, stage=stage, status=status, completed_stage=stage, **fields)
+
+
+def _record_progress(document_id: str, processing_status: str = None, **fields):
+    """Update a document's ingestion progress under a row lock, so concurrent writers do not clobber it."""
+    with transaction.atomic():
+        document = Document.objects.select_for_update().get(id=document_id)
+        update_fields = ['metadata']
+        if processing_status:
+            document.processing_status = processing_status
+            update_fields.append('processing_status')
+        _update_ingestion(document, **fields)
+        document.save(update_fields=update_fields)
+
+
+def _update_ingestion(document: Document, completed_stage: str = None, **fields):
+    """Merge fields into document.metadata['ingestion'] (not saved)."""
+    ingestion: Dict = dict(document.metadata.get('ingestion', {}))
+    completed = list(ingestion.get('completed_stages', []))
+    if fields.get('status') == 'queued':
+        # A re-queued document starts over; stages skip the work already done
+        completed = []
+    if fields.get('status') in ('queued', 'completed'):
+        ingestion.pop('error', None)
+    if completed_stage and completed_stage not in completed:
+        completed.append(completed_stage)
+    
+    ingestion.update(fields)
+    ingestion['completed_stages'] = completed
+    ingestion['progress'] = len(completed) / len(INGESTION_STAGES)
+    ingestion['updated_at'] = timezone.now().isoformat()
+    document.metadata = dict(document.metadata, ingestion=ingestion)
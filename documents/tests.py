@@ -0,0 +1,181 @@
+"""
+Tests for the document ingestion pipeline, run with Celery in eager mode.
+"""
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from config.celery import app
+from faiss_manager.models import PendingIndexDocument
+from faiss_manager.services import FAISSService, faiss_service
+from .models import Document
+from .services import pdf_service
+from . import tasks
+
+
+def make_pdf(path: Path, pages: int):
+    """Write a PDF with a paragraph of text on each page."""
+    import fitz
+    
+    with fitz.open() as pdf_document:
+        for page_num in range(pages):
+            page = pdf_document.new_page()
+            page.insert_textbox(
+                fitz.Rect(72, 72, 540, 720),
+                f"Page {page_num + 1} describes topic number {page_num + 1} in some detail. " * 10
+            )
+        pdf_document.save(str(path))
+
+
+class IngestionPipelineTests(TestCase):
+    """Tests for ingest_document and its stages."""
+    
+    def setUp(self):
+        self.storage = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.storage, ignore_errors=True)
+        
+        settings_override = override_settings(
+            CELERY_TASK_ALWAYS_EAGER=True,
+            MEDIA_ROOT=str(self.storage / 'media'),
+            PDF_EXTRACT_PROCESSES=0
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        
+        # The Celery app read its configuration from the settings when it was loaded
+        eager, app.conf.task_always_eager = app.conf.task_always_eager, True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', eager)
+        
+        # Each test starts without an index
+        self._reset_index()
+        self.addCleanup(self._reset_index)
+    
+    def _reset_index(self):
+        FAISSService._snapshot = None
+        FAISSService._writer_lock = None
+    
+    def _create_document(self, pages: int = 3) -> Document:
+        file_path = self.storage / 'upload.pdf'
+        make_pdf(file_path, pages)
+        return Document.objects.create(
+            filename=file_path.name,
+            original_filename='upload.pdf',
+            file_path=str(file_path),
+            file_size=file_path.stat().st_size,
+            processing_status='pending'
+        )
+    
+    def test_records_stage_progress(self):
+        document = self._create_document()
+        recorded = []
+        record_progress = tasks._record_progress
+        
+        def spy(document_id, processing_status=None, **fields):
+            recorded.append((fields.get('stage'), fields.get('status')))
+            record_progress(document_id, processing_status=processing_status, **fields)
+        
+        with mock.patch.object(tasks, '_record_progress', side_effect=spy):
+            tasks.ingest_document(document.id)
+        
+        for stage in tasks.INGESTION_STAGES:
+            self.assertIn((stage, 'running'), recorded)
+        self.assertEqual(recorded[0], ('extract', 'queued'))
+        self.assertEqual(recorded[-1], ('index', 'completed'))
+        
+        document.refresh_from_db()
+        ingestion = document.metadata['ingestion']
+        self.assertEqual(ingestion['completed_stages'], list(tasks.INGESTION_STAGES))
+        self.assertEqual(ingestion['progress'], 1.0)
+        self.assertEqual(ingestion['pages'], 3)
+        self.assertEqual(ingestion['chunks'], document.chunks.count())
+    
+    def test_completed_document_is_indexed(self):
+        document = self._create_document()
+        
+        tasks.ingest_document(document.id)
+        
+        document.refresh_from_db()
+        self.assertEqual(document.processing_status, 'completed')
+        self.assertIsNone(document.processing_error)
+        self.assertEqual(document.page_count, 3)
+        self.assertTrue(document.chunks.exists())
+        self.assertFalse(document.chunks.filter(embedding_vector_id__isnull=True).exists())
+        self.assertFalse(pdf_service.text_sidecar_path(document).exists())
+    
+    def test_failing_stage_marks_document_failed(self):
+        document = self._create_document()
+        
+        with mock.patch.object(pdf_service, 'extract_text_from_pdf', return_value={}):
+            result = tasks.ingest_document(document.id)
+        
+        self.assertIsNone(result)
+        document.refresh_from_db()
+        self.assertEqual(document.processing_status, 'failed')
+        self.assertEqual(document.processing_error, 'No text extracted from PDF')
+        self.assertEqual(document.metadata['ingestion']['stage'], 'extract')
+        self.assertEqual(document.metadata['ingestion']['status'], 'failed')
+        self.assertFalse(document.chunks.exists())
+    
+    def test_invalid_pdf_fails_without_retries(self):
+        document = self._create_document()
+        Path(document.file_path).write_bytes(b'not a pdf')
+        
+        with mock.patch.object(pdf_service, 'extract_text_from_pdf', wraps=pdf_service.extract_text_from_pdf) as extract:
+            tasks.ingest_document(document.id)
+        
+        self.assertEqual(extract.call_count, 1)
+        document.refresh_from_db()
+        self.assertEqual(document.processing_status, 'failed')
+        self.assertIn('Cannot open PDF', document.processing_error)
+    
+    def test_document_queued_during_commit_is_committed(self):
+        late = self._create_document()
+        with mock.patch.object(tasks, '_commit_pending'):
+            tasks.ingest_document(late.id)
+        PendingIndexDocument.objects.filter(document_id=late.id).delete()
+        document = self._create_document()
+        add_documents = faiss_service.add_documents
+        
+        def queue_late_document(document_ids):
+            # Queued after the commit read the queue, so it opens no window of its own
+            if not PendingIndexDocument.objects.filter(document_id=late.id).exists():
+                PendingIndexDocument.objects.create(document_id=late.id)
+            return add_documents(document_ids)
+        
+        with mock.patch.object(faiss_service, 'add_documents', side_effect=queue_late_document):
+            tasks.ingest_document(document.id)
+        
+        self.assertFalse(PendingIndexDocument.objects.exists())
+        for ingested in (document, late):
+            ingested.refresh_from_db()
+            self.assertEqual(ingested.processing_status, 'completed')
+    
+    def test_failed_commit_fails_its_batch(self):
+        batch = [self._create_document(), self._create_document()]
+        with mock.patch.object(tasks, '_commit_pending'):
+            for document in batch:
+                tasks.ingest_document(document.id)
+        
+        with mock.patch.object(faiss_service, 'add_documents', side_effect=RuntimeError('faiss boom')) as add_documents:
+            tasks.commit_index.apply_async()
+        
+        self.assertEqual(add_documents.call_count, 1 + tasks.commit_index.max_retries)
+        self.assertFalse(PendingIndexDocument.objects.exists())
+        for document in batch:
+            document.refresh_from_db()
+            self.assertEqual(document.processing_status, 'failed')
+            self.assertEqual(document.processing_error, 'faiss boom')
+            self.assertEqual(document.metadata['ingestion']['stage'], 'index')
+        
+        # A later commit leaves the failed batch alone
+        document = self._create_document()
+        tasks.ingest_document(document.id)
+        document.refresh_from_db()
+        self.assertEqual(document.processing_status, 'completed')
+        self.assertIsNone(document.processing_error)
+        for failed in batch:
+            failed.refresh_from_db()
+            self.assertEqual(failed.processing_status, 'failed')
@@ -16,7 +16,7 @@ from .serializers import (
     DocumentUploadSerializer,
     ChunkSerializer
 )
-from .services import pdf_service
+from .tasks import ingest_document
 from faiss_manager.services import faiss_service
 import logging
 
@@ -63,31 +63,23 @@ class DocumentUploadView(APIView):
         )
         
         try:
-            # Process document immediately (in future, use Celery for async)
-            logger.info(f"Processing document {document.id}...")
-            success = pdf_service.process_document(document)
-            
-            if success:
-                # Rebuild FAISS index with new document
-                logger.info("Rebuilding FAISS index...")
-                faiss_service.build_index()
-                logger.info("FAISS index rebuilt successfully")
-            
+            # Extract, chunk, embed and index in Celery workers (documents/tasks.py)
+            logger.info(f"Queueing document {document.id} for processing...")
+            ingest_document(str(document.id))
         except Exception as e:
-            logger.error(f"Error processing document: {str(e)}")
-            document.processing_status = 'failed'
-            document.processing_error = str(e)
-            document.save()
+            logger.error(f"Error processing document {document.id}: {str(e)}")
+            # Update only these fields, keeping the progress the pipeline recorded in metadata
+            Document.objects.filter(id=document.id).update(processing_status='failed', processing_error=str(e))
         
         # Refresh from database to get updated status
         document.refresh_from_db()
         
         return Response(
             {
-                'message': 'Document uploaded successfully',
+                'message': 'Document uploaded successfully; processing has started',
                 'document': DocumentSerializer(document).data
             },
-            status=status.HTTP_201_CREATED
+            status=status.HTTP_202_ACCEPTED
         )
 
 
@@ -116,8 +108,11 @@ class DocumentDetailView(generics.RetrieveDestroyAPIView):
         """Delete document and associated file"""
         instance = self.get_object()
         
-        # Delete associated chunks from FAISS index
-        # TODO: Implement FAISS cleanup
+        # Delete associated chunks from FAISS index (before the chunks are cascaded)
+        try:
+            faiss_service.remove_document(str(instance.id))
+        except Exception as e:
+            logger.error(f"Error removing document {instance.id} from FAISS index: {str(e)}")
         
         # File will be deleted by signal handler
         self.perform_destroy(instance)
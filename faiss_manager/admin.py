@@ -2,19 +2,19 @@
 Admin interface for FAISS index models
 """
 from django.contrib import admin
-from .models import FAISSIndex
+from .models import FAISSIndex, Embedding, PendingIndexDocument
 
 
 @admin.register(FAISSIndex)
 class FAISSIndexAdmin(admin.ModelAdmin):
-    list_display = ['index_name', 'total_vectors', 'dimension', 'last_updated']
+    list_display = ['index_name', 'index_type', 'total_vectors', 'dimension', 'last_updated']
     list_filter = ['last_updated']
     search_fields = ['index_name']
-    readonly_fields = ['id', 'last_updated', 'total_vectors']
+    readonly_fields = ['id', 'last_updated', 'total_vectors', 'bytes_per_vector']
     
     fieldsets = (
         ('Index Information', {
-            'fields': ('id', 'index_name', 'dimension', 'total_vectors')
+            'fields': ('id', 'index_name', 'index_type', 'dimension', 'total_vectors', 'bytes_per_vector')
         }),
         ('Files', {
             'fields': ('index_file_path', 'metadata_file_path')
@@ -24,3 +24,18 @@ class FAISSIndexAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(Embedding)
+class EmbeddingAdmin(admin.ModelAdmin):
+    list_display = ['content_hash', 'model_name', 'dimension', 'created_at']
+    list_filter = ['model_name', 'created_at']
+    search_fields = ['content_hash']
+    readonly_fields = ['id', 'content_hash', 'model_name', 'dimension', 'created_at']
+    exclude = ['vector']
+
+
+@admin.register(PendingIndexDocument)
+class PendingIndexDocumentAdmin(admin.ModelAdmin):
+    list_display = ['document', 'queued_at']
+    readonly_fields = ['document', 'queued_at']
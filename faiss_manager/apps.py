@@ -1,20 +1,55 @@
+import os
+import sys
+from pathlib import Path
 from django.apps import AppConfig
+from django.conf import settings
+
+# Server entry points whose processes warm up (see FaissManagerConfig._is_server_process)
+SERVER_COMMANDS = ('gunicorn', 'uvicorn', 'daphne')
 
 
 class FaissManagerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'faiss_manager'
     verbose_name = 'FAISS Manager'
-
+    
     def ready(self):
         """
-        Initialize FAISS service when Django starts.
-        This ensures the embedding model and FAISS indexes are loaded once.
+        Warm up the FAISS service when Django starts (settings.FAISS_WARMUP).
+        
+        This loads the embedding model and index once per process before
+        the first request. With FAISS_WARMUP_BACKGROUND the warm-up runs in
+        a thread, so ASGI servers can start accepting connections while
+        /api/faiss/ready/ reports 503 until it finishes.
+        """
+        if not settings.FAISS_WARMUP or not self._is_server_process():
+            return
+        
+        if settings.FAISS_PRELOAD:
+            # gunicorn.conf.py preloads in the master and warms up each worker after fork
+            return
+        
+        from faiss_manager.services import faiss_service
+        if faiss_service.warm_up_enabled():
+            faiss_service.start_warm_up()
+    
+    @staticmethod
+    def _is_server_process() -> bool:
+        """
+        Whether this process serves requests: gunicorn, uvicorn or daphne, or
+        manage.py runserver (not its autoreloader). Celery, pytest, other
+        management commands and scripts do not warm up.
         """
-        # TODO: Uncomment when FAISSService is implemented
-        # from faiss_manager.services import FAISSService
-        # try:
-        #     FAISSService.initialize()
-        # except Exception as e:
-        #     print(f"Could not initialize FAISS on startup: {e}")
-        pass
+        script = Path(sys.argv[0]) if sys.argv and sys.argv[0] else Path()
+        if script.name == '__main__.py':
+            # python -m gunicorn
+            script = script.parent
+        
+        if script.stem in SERVER_COMMANDS:
+            return True
+        
+        if script.name != 'manage.py' or len(sys.argv) < 2 or sys.argv[1] != 'runserver':
+            return False
+        
+        # runserver's parent process only watches files; the child it spawns sets RUN_MAIN
+        return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
@@ -0,0 +1,142 @@
+"""
+Micro-batching of concurrent embedding requests.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch-size histogram buckets (texts per encode call)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class EmbeddingBatcher:
+    """
+    Gathers concurrent encode calls into batched forward passes.
+    
+    Callers from any thread submit texts and wait for their rows. A single
+    scheduler thread takes the first pending request and, if others are
+    already queued, keeps collecting requests for up to max_wait seconds
+    or until max_batch_size texts are gathered. It runs one batched encode
+    and hands each caller its slice of the result. A lone request is
+    encoded at once: under load, requests queue up while a batch encodes,
+    so waiting only delays a request that has nothing to batch with.
+    """
+    
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], max_wait: float, max_batch_size: int):
+        self.max_wait = max_wait  # Seconds to wait for more requests after the first
+        self.max_batch_size = max_batch_size  # Texts per batched encode call
+        self._encode = encode  # Function embedding a list of texts into an (n x dimension) array
+        self._queue = queue.Queue()  # Pending (texts, future) requests
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._texts = 0
+        self._max_queue_depth = 0
+        self._histogram = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as part of the next batch, blocking until it is done."""
+        return self.submit(texts).result()
+    
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for the next batch, returning a future of their embeddings."""
+        future = Future()
+        if not texts:
+            future.set_result(np.empty((0, 0), dtype='float32'))
+            return future
+        
+        self._ensure_thread()
+        self._queue.put((list(texts), future))
+        
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+        return future
+    
+    def stats(self) -> Dict:
+        """Get queue depth, batch counts and the batch-size histogram."""
+        with self._stats_lock:
+            labels = [f'<={bound}' for bound in BATCH_SIZE_BUCKETS] + [f'>{BATCH_SIZE_BUCKETS[-1]}']
+            return {
+                'max_wait_ms': self.max_wait * 1000,
+                'max_batch_size': self.max_batch_size,
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_queue_depth,
+                'batches': self._batches,
+                'texts': self._texts,
+                'mean_batch_size': self._texts / self._batches if self._batches else 0.0,
+                'batch_size_histogram': dict(zip(labels, self._histogram))
+            }
+    
+    def _ensure_thread(self):
+        """Start the scheduler thread on first use, or again if it has died."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                if self._thread is not None:
+                    logger.error("Embedding batcher thread died; restarting it")
+                self._thread = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        """Scheduler loop: collect a batch, encode it, fan results out."""
+        while True:
+            batch = [self._queue.get()]
+            
+            try:
+                size = len(batch[0][0])
+                deadline = time.monotonic() + self.max_wait
+                wait = not self._queue.empty()  # Only wait for more requests when there is concurrency
+                
+                while size < self.max_batch_size:
+                    remaining = deadline - time.monotonic() if wait else 0
+                    try:
+                        request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    batch.append(request)
+                    size += len(request[0])
+                
+                # Claim each future; requests cancelled meanwhile are dropped
+                # and the rest can no longer be cancelled
+                batch = [request for request in batch if request[1].set_running_or_notify_cancel()]
+                if batch:
+                    self._encode_batch(batch, sum(len(request_texts) for request_texts, _ in batch))
+            except Exception as e:
+                # Keep the thread alive for later requests; fail this batch's callers
+                logger.error(f"Error in embedding batcher: {str(e)}")
+                for _, future in batch:
+                    if not future.done() and (future.running() or future.set_running_or_notify_cancel()):
+                        future.set_exception(e)
+    
+    def _encode_batch(self, batch: List, size: int):
+        """Run one encode over all texts in batch and resolve each request's future."""
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        
+        try:
+            embeddings = self._encode(texts)
+        except Exception as e:
+            logger.error(f"Error encoding batch of {size} texts: {str(e)}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        
+        start = 0
+        for request_texts, future in batch:
+            future.set_result(embeddings[start:start + len(request_texts)])
+            start += len(request_texts)
+        
+        bucket = next((i for i, bound in enumerate(BATCH_SIZE_BUCKETS) if size <= bound), len(BATCH_SIZE_BUCKETS))
+        with self._stats_lock:
+            self._batches += 1
+            self._texts += size
+            self._histogram[bucket] += 1
@@ -0,0 +1,391 @@
+"""
+Embedding backends: the model runtimes behind FAISSService's encode calls.
+
+settings.EMBEDDING_BACKEND selects the backend:
+    sentence_transformers  the sentence-transformers (torch) model
+    onnx                   the same model exported to ONNX and run with
+                           ONNX Runtime, optionally int8 dynamic-quantized
+
+Each backend's libraries are imported when it is constructed, so neither
+torch nor onnxruntime is loaded unless that backend is selected.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+import logging
+
+logger = logging.getLogger(__name__)
+
+# File names of the exported model inside an ONNX model directory
+ONNX_MODEL_FILE = 'model.onnx'
+QUANTIZED_ONNX_MODEL_FILE = 'model_quantized.onnx'
+
+# Model input names the ONNX export may declare, in forward() argument order
+ONNX_INPUT_NAMES = ('input_ids', 'attention_mask', 'token_type_ids')
+
+# Used when the model directory has no sentence_bert_config.json
+DEFAULT_MAX_SEQ_LENGTH = 512
+
+
+class EmbeddingBackend:
+    """
+    Interface of an embedding backend.
+    
+    encode() returns one L2-normalized (if the model normalizes) float32
+    row per text, in input order.
+    
+    Backends run texts in batches of similar token length (see
+    _encode_in_length_buckets), since a batch costs as much as its
+    longest text padded across every row. tokens and padded_tokens count
+    the tokens encoded without and with that padding.
+    """
+    
+    name = None
+    batch_size = 32
+    tokens = 0  # Tokens encoded, excluding padding
+    padded_tokens = 0  # Tokens encoded, including padding
+    
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        """Embed texts into an (n_texts x dimension) float32 array."""
+        raise NotImplementedError
+    
+    def after_fork(self, threads: int = 0):
+        """Re-create thread pools in a process forked after the backend was loaded."""
+    
+    def stats(self) -> Dict:
+        """Get the backend name and how much of the encoded tokens were padding."""
+        return {
+            'backend': self.name,
+            'batch_size': self.batch_size,
+            'tokens': self.tokens,
+            'padded_tokens': self.padded_tokens,
+            'padding_efficiency': padding_efficiency(self.tokens, self.padded_tokens)
+        }
+    
+    def _encode_in_length_buckets(
+        self,
+        lengths: List[int],
+        encode_batch: Callable[[np.ndarray], np.ndarray],
+        show_progress_bar: bool = False
+    ) -> np.ndarray:
+        """
+        Encode texts in batches of similar token length and scatter the results back.
+        
+        Text indices are sorted by token length, longest first (so a batch
+        that does not fit in memory fails early), and cut into batches of
+        batch_size.
+        
+        Args:
+            lengths: Token length of each text
+            encode_batch: Function embedding the texts at an array of indices
+            show_progress_bar: Show a progress bar over the batches
+        
+        Returns:
+            Numpy array of embeddings (n_texts x dimension), in input order
+        """
+        lengths = np.asarray(lengths, dtype='int64')
+        order = np.argsort(-lengths, kind='stable')
+        batches = [order[start:start + self.batch_size] for start in range(0, len(order), self.batch_size)]
+        if show_progress_bar:
+            from tqdm.auto import tqdm
+            batches = tqdm(batches, desc='Batches')
+        
+        embeddings = None
+        for batch in batches:
+            batch_embeddings = encode_batch(batch)
+            if embeddings is None:
+                embeddings = np.empty((len(lengths), batch_embeddings.shape[1]), dtype='float32')
+            embeddings[batch] = batch_embeddings
+            
+            self.tokens += int(lengths[batch].sum())
+            self.padded_tokens += int(lengths[batch].max()) * len(batch)
+        
+        if embeddings is None:
+            return np.empty((0, 0), dtype='float32')
+        return embeddings
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Runs the sentence-transformers model with torch."""
+    
+    name = 'sentence_transformers'
+    
+    def __init__(self, model_name_or_path: str, threads: int = 0, batch_size: int = 32):
+        from sentence_transformers import SentenceTransformer
+        
+        self.batch_size = batch_size
+        self._model = SentenceTransformer(model_name_or_path, device='cpu')
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+    
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        # sentence-transformers sorts by character count; bucket by the model's token count instead
+        input_ids = self._model.tokenizer(
+            texts, truncation=True, max_length=self._model.max_seq_length
+        )['input_ids']
+        
+        def encode_batch(batch: np.ndarray) -> np.ndarray:
+            embeddings = self._model.encode([texts[i] for i in batch], batch_size=len(batch), show_progress_bar=False)
+            return np.asarray(embeddings, dtype='float32')
+        
+        return self._encode_in_length_buckets([len(ids) for ids in input_ids], encode_batch, show_progress_bar)
+    
+    def after_fork(self, threads: int = 0):
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+
+
+class ONNXBackend(EmbeddingBackend):
+    """
+    Runs a sentence-transformers model exported to ONNX with ONNX Runtime.
+    
+    The model directory is written by the export_onnx_model command: the
+    tokenizer and sentence-transformers configs, model.onnx and, if
+    quantized, model_quantized.onnx. Pooling and normalization follow the
+    directory's modules.json, so embeddings match the torch backend.
+    Nothing is downloaded; everything is read from model_path.
+    """
+    
+    name = 'onnx'
+    
+    def __init__(self, model_path: str, quantize: bool = False, threads: int = 0, batch_size: int = 32):
+        from tokenizers import Tokenizer
+        
+        self.model_path = Path(model_path)
+        self.quantize = quantize
+        self.batch_size = batch_size
+        
+        model_file = self.model_path / (QUANTIZED_ONNX_MODEL_FILE if quantize else ONNX_MODEL_FILE)
+        if quantize and not model_file.exists():
+            quantize_onnx_model(self.model_path / ONNX_MODEL_FILE, model_file)
+        if not model_file.exists():
+            raise FileNotFoundError(
+                f"No ONNX model at {model_file}; run 'python manage.py export_onnx_model' first"
+            )
+        self.model_file = model_file
+        
+        self.max_seq_length = self._read_max_seq_length()
+        self.pooling_mode, self.normalize = self._read_pipeline()
+        
+        # Texts are tokenized unpadded and padded per batch to the batch's longest text
+        self._tokenizer = Tokenizer.from_file(str(self.model_path / 'tokenizer.json'))
+        self._tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self._tokenizer.no_padding()
+        self._pad_id = self._tokenizer.token_to_id(self._read_pad_token()) or 0
+        
+        self._session = self._create_session(threads)
+        self._input_names = [model_input.name for model_input in self._session.get_inputs()]
+    
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(texts)
+        return self._encode_in_length_buckets(
+            [len(encoding.ids) for encoding in encodings],
+            lambda batch: self._encode_batch([encodings[i] for i in batch]),
+            show_progress_bar
+        )
+    
+    def after_fork(self, threads: int = 0):
+        # ONNX Runtime's thread pool does not survive fork, so the session is rebuilt
+        self._session = self._create_session(threads)
+    
+    def _encode_batch(self, encodings: List) -> np.ndarray:
+        """Pad one batch of tokenized texts, run the model and pool."""
+        width = max(len(encoding.ids) for encoding in encodings)
+        features = {
+            'input_ids': np.full((len(encodings), width), self._pad_id, dtype='int64'),
+            'attention_mask': np.zeros((len(encodings), width), dtype='int64'),
+            'token_type_ids': np.zeros((len(encodings), width), dtype='int64'),
+        }
+        for row, encoding in enumerate(encodings):
+            features['input_ids'][row, :len(encoding.ids)] = encoding.ids
+            features['attention_mask'][row, :len(encoding.ids)] = encoding.attention_mask
+            features['token_type_ids'][row, :len(encoding.ids)] = encoding.type_ids
+        
+        token_embeddings = self._session.run(None, {name: features[name] for name in self._input_names})[0]
+        mask = features['attention_mask'][:, :, None].astype('float32')
+        
+        if self.pooling_mode == 'cls':
+            embeddings = token_embeddings[:, 0]
+        elif self.pooling_mode == 'max':
+            embeddings = np.where(mask > 0, token_embeddings, -1e9).max(axis=1)
+        else:
+            embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        
+        if self.normalize:
+            embeddings = embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings.astype('float32')
+    
+    def _create_session(self, threads: int):
+        """Open an inference session on the model file."""
+        import onnxruntime
+        
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        return onnxruntime.InferenceSession(str(self.model_file), options, providers=['CPUExecutionProvider'])
+    
+    def _read_json(self, name: str) -> Optional[dict]:
+        path = self.model_path / name
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())
+    
+    def _read_max_seq_length(self) -> int:
+        """Get the truncation length the sentence-transformers model uses."""
+        config = self._read_json('sentence_bert_config.json') or {}
+        return config.get('max_seq_length') or DEFAULT_MAX_SEQ_LENGTH
+    
+    def _read_pad_token(self) -> str:
+        config = self._read_json('tokenizer_config.json') or {}
+        pad_token = config.get('pad_token') or '[PAD]'
+        return pad_token['content'] if isinstance(pad_token, dict) else pad_token
+    
+    def _read_pipeline(self):
+        """Get the pooling mode and whether to normalize from the model's modules.json."""
+        pooling_mode, normalize = 'mean', False
+        
+        for module in self._read_json('modules.json') or []:
+            if module['type'].endswith('.Pooling'):
+                config = self._read_json(f"{module['path']}/config.json") or {}
+                if config.get('pooling_mode_cls_token'):
+                    pooling_mode = 'cls'
+                elif config.get('pooling_mode_max_tokens'):
+                    pooling_mode = 'max'
+            elif module['type'].endswith('.Normalize'):
+                normalize = True
+        
+        return pooling_mode, normalize
+
+
+EMBEDDING_BACKENDS = {
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    ONNXBackend.name: ONNXBackend,
+}
+
+
+def padding_efficiency(tokens: int, padded_tokens: int) -> float:
+    """Get the share of encoded tokens that were not padding."""
+    return tokens / padded_tokens if padded_tokens else 1.0
+
+
+def create_embedding_backend(threads: Optional[int] = None) -> EmbeddingBackend:
+    """
+    Construct the backend selected by settings.EMBEDDING_BACKEND.
+    
+    Args:
+        threads: Inference threads, defaults to settings.FAISS_WORKER_THREADS
+    """
+    name, kwargs = embedding_backend_config(threads)
+    return EMBEDDING_BACKENDS[name](**kwargs)
+
+
+def embedding_backend_config(threads: Optional[int] = None) -> Tuple[str, Dict]:
+    """
+    Get the selected backend's name and constructor arguments from settings.
+    
+    The pair is picklable, so processes without Django settings (e.g. an
+    embedding pool's workers) can construct the same backend.
+    """
+    backend = settings.EMBEDDING_BACKEND
+    if backend not in EMBEDDING_BACKENDS:
+        raise ImproperlyConfigured(
+            f"Unknown EMBEDDING_BACKEND '{backend}'; expected one of {', '.join(EMBEDDING_BACKENDS)}"
+        )
+    if threads is None:
+        threads = settings.FAISS_WORKER_THREADS
+    
+    if backend == ONNXBackend.name:
+        if not settings.EMBEDDING_MODEL_PATH:
+            raise ImproperlyConfigured("EMBEDDING_BACKEND=onnx needs EMBEDDING_MODEL_PATH")
+        return backend, {
+            'model_path': settings.EMBEDDING_MODEL_PATH,
+            'quantize': settings.EMBEDDING_ONNX_QUANTIZE,
+            'threads': threads,
+        }
+    
+    return backend, {
+        'model_name_or_path': settings.EMBEDDING_MODEL_PATH or settings.EMBEDDING_MODEL,
+        'threads': threads,
+    }
+
+
+def embedding_model_id() -> str:
+    """
+    Get the name embeddings are stored and cached under.
+    
+    This is settings.EMBEDDING_MODEL, except that int8-quantized ONNX
+    embeddings are kept apart, since they differ slightly from the
+    full-precision ones.
+    """
+    if settings.EMBEDDING_BACKEND == ONNXBackend.name and settings.EMBEDDING_ONNX_QUANTIZE:
+        return f"{settings.EMBEDDING_MODEL}:int8"
+    return settings.EMBEDDING_MODEL
+
+
+def export_onnx_model(model_name: str, output_dir: str, opset: int = 14) -> Path:
+    """
+    Export a sentence-transformers model to an ONNX model directory.
+    
+    The directory gets the tokenizer and sentence-transformers configs
+    (model.save()) and the transformer exported as model.onnx, with
+    dynamic batch and sequence axes.
+    
+    Returns:
+        Path of the exported model.onnx
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    
+    model = SentenceTransformer(model_name, device='cpu')
+    model.save(str(output))
+    
+    transformer = model[0].auto_model.eval()
+    sample = model.tokenizer(['export sample'], return_tensors='pt')
+    input_names = [name for name in ONNX_INPUT_NAMES if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names + ['last_hidden_state']}
+    
+    model_file = output / ONNX_MODEL_FILE
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            str(model_file),
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+    
+    logger.info(f"Exported {model_name} to {model_file}")
+    return model_file
+
+
+def quantize_onnx_model(model_file: Path, quantized_file: Path) -> Path:
+    """
+    Quantize an ONNX model's weights to int8 (dynamic quantization).
+    
+    Activations are quantized on the fly at inference time, so no
+    calibration data is needed.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    
+    if not Path(model_file).exists():
+        raise FileNotFoundError(f"No ONNX model at {model_file}; run 'python manage.py export_onnx_model' first")
+    
+    # Write to a temporary name, so concurrent loaders never see a partial file
+    temp_file = Path(quantized_file).with_suffix(f'.{os.getpid()}.tmp')
+    quantize_dynamic(str(model_file), str(temp_file), weight_type=QuantType.QInt8)
+    os.replace(temp_file, quantized_file)
+    
+    logger.info(f"Quantized {model_file} to int8 at {quantized_file}")
+    return Path(quantized_file)
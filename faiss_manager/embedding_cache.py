@@ -0,0 +1,132 @@
+"""
+Cache of query embeddings: an in-process LRU with an optional shared Django cache tier.
+"""
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, List
+import numpy as np
+from django.core.cache import caches
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize query text for cache lookups.
+    
+    Unicode is NFC-normalized and whitespace runs are collapsed, which the
+    tokenizer ignores anyway, so equal keys always embed to equal vectors.
+    """
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+class QueryEmbeddingCache:
+    """
+    Query embeddings keyed by content hash (model name + normalized text).
+    
+    Lookups go to a bounded in-process LRU first, then to the optional
+    shared tier in a Django cache (e.g. django_redis), which stores raw
+    float32 bytes so every worker benefits from embeddings computed by
+    any other. Shared-tier errors are logged and treated as misses.
+    """
+    
+    KEY_PREFIX = 'faiss:query_embedding:'
+    
+    def __init__(self, max_size: int, shared_alias: str = '', shared_timeout: int = 86400):
+        self.max_size = max_size  # Maximum entries in the in-process LRU (0 disables it)
+        self.shared_alias = shared_alias  # Django cache alias of the shared tier, or '' for none
+        self.shared_timeout = shared_timeout  # Seconds an entry lives in the shared tier
+        self._entries = OrderedDict()  # Content hash -> float32 vector, least recently used first
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._shared_hits = 0
+        self._misses = 0
+    
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Get the cached vectors for the given keys, counting hits and misses."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+            self._hits += len(found)
+        
+        missing = [key for key in keys if key not in found]
+        if missing and self.shared_alias:
+            shared = self._get_shared(missing)
+            found.update(shared)
+            self._put_local(shared)
+            with self._lock:
+                self._shared_hits += len(shared)
+        
+        with self._lock:
+            self._misses += len(keys) - len(found)
+        
+        return found
+    
+    def set_many(self, vectors: Dict[str, np.ndarray]):
+        """Store newly computed vectors in both tiers."""
+        if not vectors:
+            return
+        
+        self._put_local(vectors)
+        
+        if self.shared_alias:
+            try:
+                caches[self.shared_alias].set_many(
+                    {self.KEY_PREFIX + key: vector.astype('float32').tobytes() for key, vector in vectors.items()},
+                    timeout=self.shared_timeout
+                )
+            except Exception as e:
+                logger.warning(f"Error writing query embeddings to shared cache: {str(e)}")
+    
+    def clear(self):
+        """Empty the in-process tier and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._shared_hits = self._misses = 0
+    
+    def stats(self) -> Dict:
+        """Get hit/miss counters and the in-process tier size."""
+        with self._lock:
+            lookups = self._hits + self._shared_hits + self._misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'shared_cache': self.shared_alias or None,
+                'hits': self._hits,
+                'shared_hits': self._shared_hits,
+                'misses': self._misses,
+                'hit_rate': (self._hits + self._shared_hits) / lookups if lookups else 0.0
+            }
+    
+    def _get_shared(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Get vectors for keys from the shared tier."""
+        try:
+            values = caches[self.shared_alias].get_many([self.KEY_PREFIX + key for key in keys])
+        except Exception as e:
+            logger.warning(f"Error reading query embeddings from shared cache: {str(e)}")
+            return {}
+        
+        return {
+            key[len(self.KEY_PREFIX):]: np.frombuffer(value, dtype='float32')
+            for key, value in values.items()
+        }
+    
+    def _put_local(self, vectors: Dict[str, np.ndarray]):
+        """Add vectors to the in-process LRU, evicting the least recently used entries."""
+        if self.max_size <= 0:
+            return
+        
+        with self._lock:
+            for key, vector in vectors.items():
+                self._entries[key] = vector
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
@@ -0,0 +1,140 @@
+"""
+Process pool for embedding large numbers of texts on all cores.
+"""
+import math
+import multiprocessing
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Tuple
+import numpy as np
+import logging
+
+from .embedding_backends import EMBEDDING_BACKENDS
+
+logger = logging.getLogger(__name__)
+
+# The embedding backend of a pool worker process, or the error loading it
+_worker_backend = None
+_worker_error = None
+
+
+def _init_worker(backend_name: str, backend_kwargs: Dict):
+    """Load the embedding backend once per worker process."""
+    global _worker_backend, _worker_error
+    try:
+        _worker_backend = EMBEDDING_BACKENDS[backend_name](**backend_kwargs)
+    except Exception as e:
+        # An initializer that raises makes the pool respawn workers forever,
+        # so the error is raised from the first task instead
+        _worker_error = e
+
+
+def _encode_in_worker(texts: List[str]) -> Tuple[np.ndarray, float, int, int]:
+    """
+    Embed one sub-batch in a worker.
+    
+    Returns:
+        Tuple of (embeddings, seconds taken, tokens, padded tokens)
+    """
+    if _worker_error is not None:
+        raise _worker_error
+    
+    start = time.perf_counter()
+    tokens, padded_tokens = _worker_backend.tokens, _worker_backend.padded_tokens
+    embeddings = _worker_backend.encode(texts)
+    return (
+        embeddings,
+        time.perf_counter() - start,
+        _worker_backend.tokens - tokens,
+        _worker_backend.padded_tokens - padded_tokens
+    )
+
+
+class EmbeddingPool:
+    """
+    Shards texts across worker processes, each with its own copy of the model.
+    
+    backend_kwargs should set the backend's threads so that processes x
+    threads matches the cores, instead of every process contending for
+    all of them. Workers are spawned rather than forked, since torch and
+    ONNX Runtime thread pools do not survive fork.
+    
+    Sub-batches are sized adaptively: the first ones are min_batch texts,
+    later ones are sized from the measured per-process rate to take about
+    target_seconds each, and the tail is split evenly across processes.
+    At most two sub-batches per process are in flight, and results are
+    yielded in input order as they complete. Each worker's backend runs
+    its sub-batch in length-bucketed batches, so min_batch is several
+    model batches, leaving the bucketing texts of similar length to group.
+    
+    Use as a context manager:
+        with EmbeddingPool(4, 'sentence_transformers', {...}) as pool:
+            for embeddings in pool.imap(texts):
+                ...
+    """
+    
+    def __init__(
+        self,
+        processes: int,
+        backend_name: str,
+        backend_kwargs: Dict,
+        target_seconds: float = 1.0,
+        min_batch: int = 256,
+        max_batch: int = 1024
+    ):
+        self.processes = processes
+        self.backend_name = backend_name
+        self.backend_kwargs = backend_kwargs
+        self.target_seconds = target_seconds
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.tokens = 0  # Tokens encoded by all workers, excluding padding
+        self.padded_tokens = 0  # Tokens encoded by all workers, including padding
+        self._pool = None
+    
+    def __enter__(self):
+        context = multiprocessing.get_context('spawn')
+        self._pool = context.Pool(
+            self.processes,
+            initializer=_init_worker,
+            initargs=(self.backend_name, self.backend_kwargs)
+        )
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._pool.close()
+        else:
+            self._pool.terminate()
+        self._pool.join()
+        self._pool = None
+    
+    def imap(self, texts: List[str]) -> Iterator[np.ndarray]:
+        """Embed texts, yielding consecutive sub-batches of embeddings in input order."""
+        pending = deque()
+        start = 0
+        rate = None  # Texts per second per process, smoothed
+        
+        while start < len(texts) or pending:
+            while start < len(texts) and len(pending) < self.processes * 2:
+                size = self._next_batch_size(rate, len(texts) - start)
+                batch = texts[start:start + size]
+                pending.append((len(batch), self._pool.apply_async(_encode_in_worker, (batch,))))
+                start += len(batch)
+            
+            count, result = pending.popleft()
+            embeddings, seconds, tokens, padded_tokens = result.get()
+            self.tokens += tokens
+            self.padded_tokens += padded_tokens
+            
+            batch_rate = count / max(seconds, 1e-6)
+            rate = batch_rate if rate is None else 0.7 * rate + 0.3 * batch_rate
+            yield embeddings
+    
+    def _next_batch_size(self, rate, remaining: int) -> int:
+        """Size the next sub-batch from the measured rate and the texts left."""
+        size = self.min_batch if rate is None else int(rate * self.target_seconds)
+        
+        # Near the end, split what is left evenly so no process idles while one finishes
+        size = min(size, math.ceil(remaining / self.processes))
+        return max(self.min_batch, min(size, self.max_batch))
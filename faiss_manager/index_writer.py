@@ -0,0 +1,100 @@
+"""
+Coalesced index commits for documents ingested in bursts.
+"""
+from typing import Dict, Iterable, List, Optional
+from django.conf import settings
+from django.utils import timezone
+import logging
+
+from .models import PendingIndexDocument
+from .services import faiss_service
+
+logger = logging.getLogger(__name__)
+
+
+class IndexCommitError(Exception):
+    """Committing a batch of queued documents to the index failed."""
+    
+    def __init__(self, message: str, document_ids: Iterable[str] = ()):
+        super().__init__(message)
+        self.document_ids = list(document_ids)  # The batch, still queued
+
+
+class IndexWriter:
+    """
+    Queues documents whose chunks are embedded and appends them to the
+    index in batches, so a bulk upload publishes one delta segment and one
+    snapshot version per commit window instead of one per document.
+    
+    A window opens when a document is queued while the queue is empty and
+    is due settings.FAISS_INDEX_COMMIT_INTERVAL seconds later, or as soon
+    as settings.FAISS_INDEX_COMMIT_MAX_DOCUMENTS documents are queued. The
+    queue is the PendingIndexDocument table, so it is shared by all Celery
+    workers; the caller schedules the commit (see documents.tasks).
+    """
+    
+    def enqueue(self, document_id: str) -> bool:
+        """
+        Queue a document for the next commit.
+        
+        The queue is checked after the insert is committed. A commit
+        clearing the queue at the same time then either sees the document
+        in its final check of the queue, or has already removed the older
+        documents, so the document opens a window.
+        
+        Returns:
+            bool: True if the document opened a new window (it is the oldest queued document)
+        """
+        PendingIndexDocument.objects.get_or_create(document_id=document_id)
+        oldest = PendingIndexDocument.objects.order_by('queued_at', 'document_id').first()
+        return oldest is not None and str(oldest.document_id) == str(document_id)
+    
+    def seconds_until_due(self) -> Optional[float]:
+        """Get the seconds until the queued documents must be committed: 0 if now, None if none are queued."""
+        pending = PendingIndexDocument.objects.order_by('queued_at')
+        count = pending.count()
+        if not count:
+            return None
+        if count >= settings.FAISS_INDEX_COMMIT_MAX_DOCUMENTS:
+            return 0.0
+        
+        age = (timezone.now() - pending.first().queued_at).total_seconds()
+        return max(0.0, settings.FAISS_INDEX_COMMIT_INTERVAL - age)
+    
+    def commit(self) -> Dict[str, int]:
+        """
+        Append all queued documents to the index in one version and dequeue them.
+        
+        The writer locks are held while the queue is read, so concurrent
+        commits in other workers wait and then find the queue empty. If
+        the commit fails, the documents stay queued.
+        
+        Returns:
+            Dict of document ID to number of vectors added
+        
+        Raises:
+            IndexCommitError: carrying the IDs of the documents that were not committed
+        """
+        with faiss_service.writing():
+            document_ids = [
+                str(document_id)
+                for document_id in PendingIndexDocument.objects.values_list('document_id', flat=True)
+            ]
+            if not document_ids:
+                return {}
+            
+            logger.info(f"Committing {len(document_ids)} queued documents to the FAISS index")
+            try:
+                added = faiss_service.add_documents(document_ids)
+            except Exception as e:
+                raise IndexCommitError(str(e), document_ids) from e
+            self.dequeue(document_ids)
+        
+        return added
+    
+    def dequeue(self, document_ids: List[str]):
+        """Remove documents from the queue."""
+        PendingIndexDocument.objects.filter(document_id__in=document_ids).delete()
+
+
+index_writer = IndexWriter()
@@ -0,0 +1,28 @@
+"""
+Convert FAISS index files saved before versioned snapshots.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from faiss_manager.services import INDEX_TYPES, faiss_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert default_index.faiss and chunk_mapping.pkl, saved before versioned index snapshots, "
+        "to snapshot version 1 without re-embedding any chunk."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--index-type',
+            choices=INDEX_TYPES,
+            help='Index type of the converted index (defaults to settings.FAISS_INDEX_TYPE)'
+        )
+    
+    def handle(self, *args, **options):
+        try:
+            converted = faiss_service.convert_legacy_index(options['index_type'])
+        except Exception as e:
+            raise CommandError(f"Could not convert the legacy index: {str(e)}")
+        
+        self.stdout.write(self.style.SUCCESS(f"Converted {converted} vectors to a versioned index snapshot"))
@@ -0,0 +1,57 @@
+"""
+Export the embedding model to ONNX for the onnx embedding backend.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from faiss_manager.embedding_backends import QUANTIZED_ONNX_MODEL_FILE, export_onnx_model, quantize_onnx_model
+
+
+class Command(BaseCommand):
+    help = (
+        "Export settings.EMBEDDING_MODEL to an ONNX model directory (settings.EMBEDDING_MODEL_PATH) "
+        "and quantize it to int8, for EMBEDDING_BACKEND=onnx."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            default=settings.EMBEDDING_MODEL,
+            help='sentence-transformers model name or path (defaults to settings.EMBEDDING_MODEL)'
+        )
+        parser.add_argument(
+            '--output',
+            default=settings.EMBEDDING_MODEL_PATH,
+            help='Output directory (defaults to settings.EMBEDDING_MODEL_PATH)'
+        )
+        parser.add_argument(
+            '--no-quantize',
+            action='store_true',
+            help='Skip writing the int8 dynamic-quantized model'
+        )
+        parser.add_argument(
+            '--opset',
+            type=int,
+            default=14,
+            help='ONNX opset version'
+        )
+    
+    def handle(self, *args, **options):
+        output = options['output']
+        if not output:
+            raise CommandError("Set EMBEDDING_MODEL_PATH or pass --output")
+        
+        try:
+            model_file = export_onnx_model(options['model'], output, opset=options['opset'])
+            self.stdout.write(self.style.SUCCESS(f"Exported {options['model']} to {model_file}"))
+            
+            if not options['no_quantize']:
+                quantized_file = quantize_onnx_model(model_file, model_file.with_name(QUANTIZED_ONNX_MODEL_FILE))
+                self.stdout.write(self.style.SUCCESS(f"Wrote int8 model to {quantized_file}"))
+        except Exception as e:
+            raise CommandError(f"Could not export the model: {str(e)}")
+        
+        self.stdout.write(
+            f"Set EMBEDDING_BACKEND=onnx and EMBEDDING_MODEL_PATH={output} "
+            f"(EMBEDDING_ONNX_QUANTIZE=True for the int8 model) to use it"
+        )
@@ -0,0 +1,49 @@
+"""
+Run the retrieval server that serves embed and search requests to web workers.
+"""
+import signal
+import threading
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from faiss_manager.retrieval import RetrievalServer
+from faiss_manager.services import faiss_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the embedding model and FAISS index once and serve embed and search "
+        "requests on a Unix domain socket (settings.RETRIEVAL_SERVER_SOCKET)."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--socket',
+            default=settings.RETRIEVAL_SERVER_SOCKET,
+            help='Unix socket path (defaults to settings.RETRIEVAL_SERVER_SOCKET)'
+        )
+    
+    def handle(self, *args, **options):
+        socket_path = options['socket']
+        if not socket_path:
+            raise CommandError("Set RETRIEVAL_SERVER_SOCKET or pass --socket")
+        
+        # Load everything before accepting connections, so no client waits on it
+        if not faiss_service.warm_up():
+            raise CommandError("Could not warm up the FAISS service; see the log for details")
+        
+        server = RetrievalServer(socket_path, faiss_service)
+        
+        def shutdown(signum, frame):
+            # shutdown() blocks until serve_forever() returns, so call it from another thread
+            threading.Thread(target=server.shutdown).start()
+        
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        
+        self.stdout.write(self.style.SUCCESS(f"Retrieval server listening on {socket_path}"))
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+        self.stdout.write("Retrieval server stopped")
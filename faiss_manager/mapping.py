@@ -0,0 +1,218 @@
+"""
+Mapping from FAISS vector IDs to chunk metadata, backed by numpy arrays.
+"""
+import json
+import os
+import uuid
+import numpy as np
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+def save_array(path: Path, array: np.ndarray):
+    """
+    Save a numpy array to path atomically.
+    
+    The array is written to a temp file and renamed over the target, so
+    processes that memory-mapped the previous file keep a valid copy.
+    """
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+class VectorIdMap:
+    """
+    Maps FAISS vector IDs to chunk metadata: Chunk UUID, Document UUID,
+    page number and document name.
+    
+    Entries are stored column-wise in blocks of sorted int64 vector IDs,
+    16-byte UUIDs and int32 page numbers. The saved base block can be
+    memory-mapped, so every process on a host shares one page-cache copy;
+    entries appended afterwards are merged into one in-memory block, so a
+    lookup searches at most two blocks however many appends there were.
+    Document names are held once per document rather than per entry.
+    
+    Each document's chunks are indexed with consecutive vector IDs, so a
+    document -> vector ID range table is derived from the blocks and used
+    to restrict searches to a set of documents.
+    """
+    
+    VECTOR_IDS_FILE = 'vector_ids.npy'
+    CHUNK_UUIDS_FILE = 'chunk_uuids.npy'
+    DOCUMENT_UUIDS_FILE = 'document_uuids.npy'
+    PAGE_NUMBERS_FILE = 'page_numbers.npy'
+    DOCUMENT_NAMES_FILE = 'document_names.json'
+    
+    def __init__(self):
+        self._blocks = []  # List of (vector_ids, chunk_uuids, document_uuids, page_numbers) column tuples
+        self._document_ranges = {}  # Document UUID bytes -> list of inclusive vector ID ranges
+        self._document_names = {}  # Document UUID string -> original filename
+    
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> 'VectorIdMap':
+        """Load the base block saved in directory, memory-mapped if requested."""
+        mmap_mode = 'r' if mmap else None
+        id_map = cls()
+        vector_ids = np.load(directory / cls.VECTOR_IDS_FILE, mmap_mode=mmap_mode)
+        chunk_uuids = np.load(directory / cls.CHUNK_UUIDS_FILE, mmap_mode=mmap_mode)
+        document_uuids = np.load(directory / cls.DOCUMENT_UUIDS_FILE, mmap_mode=mmap_mode)
+        page_numbers = np.load(directory / cls.PAGE_NUMBERS_FILE, mmap_mode=mmap_mode)
+        with open(directory / cls.DOCUMENT_NAMES_FILE, 'r', encoding='utf-8') as f:
+            id_map._document_names = json.load(f)
+        
+        if len(vector_ids):
+            id_map._add_block(vector_ids, chunk_uuids, document_uuids, page_numbers)
+        return id_map
+    
+    def save(self, directory: Path):
+        """Save all entries as a single base block."""
+        vector_ids, chunk_uuids, document_uuids, page_numbers = self._merged()
+        save_array(directory / self.VECTOR_IDS_FILE, vector_ids)
+        save_array(directory / self.CHUNK_UUIDS_FILE, chunk_uuids)
+        save_array(directory / self.DOCUMENT_UUIDS_FILE, document_uuids)
+        save_array(directory / self.PAGE_NUMBERS_FILE, page_numbers)
+        
+        names_path = directory / self.DOCUMENT_NAMES_FILE
+        tmp_path = names_path.with_name(names_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._document_names, f)
+        os.replace(tmp_path, names_path)
+    
+    def add(
+        self,
+        vector_ids: Iterable[int],
+        chunk_ids: Iterable[str],
+        document_ids: Iterable[str],
+        page_numbers: Iterable[int],
+        document_names: Dict[str, str]
+    ):
+        """Append entries for newly indexed vectors; document_names maps Document ID to filename."""
+        vector_ids = np.asarray(list(vector_ids), dtype='int64')
+        if not len(vector_ids):
+            return
+        chunk_uuids = self._encode(chunk_ids)
+        document_uuids = self._encode(document_ids)
+        page_numbers = np.asarray(list(page_numbers), dtype='int32')
+        self._document_names.update({str(document_id): name for document_id, name in document_names.items()})
+        
+        order = np.argsort(vector_ids, kind='stable')
+        columns = (vector_ids[order], chunk_uuids[order], document_uuids[order], page_numbers[order])
+        if len(self._blocks) < 2:
+            self._add_block(*columns)
+            return
+        
+        # Merge into the appended block; the block tuple is replaced, not changed, so copies are unaffected
+        self._index_ranges(columns[0], columns[2])
+        merged = [np.concatenate([existing, new]) for existing, new in zip(self._blocks[-1], columns)]
+        order = np.argsort(merged[0], kind='stable')
+        self._blocks[-1] = tuple(column[order] for column in merged)
+    
+    def copy(self) -> 'VectorIdMap':
+        """Get a copy that can be added to without changing this mapping (blocks are shared)."""
+        id_map = VectorIdMap()
+        id_map._blocks = list(self._blocks)
+        id_map._document_ranges = {key: list(ranges) for key, ranges in self._document_ranges.items()}
+        id_map._document_names = dict(self._document_names)
+        return id_map
+    
+    def document_ranges(self, document_ids: Iterable[str]) -> List[Tuple[int, int]]:
+        """Get the inclusive vector ID ranges holding the given documents' chunks."""
+        ranges = []
+        for document_uuid in self._encode(document_ids):
+            ranges.extend(self._document_ranges.get(document_uuid.tobytes(), ()))
+        return sorted(ranges)
+    
+    def get(self, vector_id: int) -> Optional[str]:
+        """Get the Chunk ID for a vector ID, or None if unknown."""
+        row = self.lookup([vector_id])[0]
+        return row['chunk_id'] if row else None
+    
+    def lookup(self, vector_ids: Iterable[int]) -> List[Optional[Dict]]:
+        """
+        Get the metadata of each vector ID, or None for unknown IDs.
+        
+        Returns:
+            List of dicts with chunk_id, document_id, page_number and document_name
+        """
+        vector_ids = np.asarray(list(vector_ids), dtype='int64')
+        rows = [None] * len(vector_ids)
+        
+        for block_ids, chunk_uuids, document_uuids, page_numbers in self._blocks:
+            positions = np.minimum(np.searchsorted(block_ids, vector_ids), len(block_ids) - 1)
+            for i in np.flatnonzero(block_ids[positions] == vector_ids):
+                position = positions[i]
+                document_id = str(uuid.UUID(bytes=document_uuids[position].tobytes()))
+                rows[i] = {
+                    'chunk_id': str(uuid.UUID(bytes=chunk_uuids[position].tobytes())),
+                    'document_id': document_id,
+                    'page_number': int(page_numbers[position]),
+                    'document_name': self._document_names.get(document_id, ''),
+                }
+        
+        return rows
+    
+    def vector_ids_for_chunks(self, chunk_ids: Iterable[str]) -> np.ndarray:
+        """Get the vector IDs mapped to any of the given Chunk IDs."""
+        wanted = self._encode(chunk_ids).view('V16').ravel()
+        matches = [
+            block[0][np.isin(block[1].view('V16').ravel(), wanted)]
+            for block in self._blocks
+        ]
+        return np.concatenate(matches) if matches else np.empty(0, dtype='int64')
+    
+    def chunk_ids(self) -> Set[str]:
+        """Get the set of all mapped Chunk IDs."""
+        return {
+            str(uuid.UUID(bytes=chunk_uuid.tobytes()))
+            for block in self._blocks
+            for chunk_uuid in block[1]
+        }
+    
+    def max_vector_id(self) -> Optional[int]:
+        """Get the largest mapped vector ID."""
+        if not self._blocks:
+            return None
+        return max(int(block[0][-1]) for block in self._blocks)
+    
+    def __contains__(self, vector_id: int) -> bool:
+        return self.get(vector_id) is not None
+    
+    def __len__(self) -> int:
+        return sum(len(block[0]) for block in self._blocks)
+    
+    def _add_block(self, vector_ids: np.ndarray, chunk_uuids: np.ndarray, document_uuids: np.ndarray, page_numbers: np.ndarray):
+        """Add a block sorted by vector ID and index its per-document ID ranges."""
+        self._blocks.append((vector_ids, chunk_uuids, document_uuids, page_numbers))
+        self._index_ranges(vector_ids, document_uuids)
+    
+    def _index_ranges(self, vector_ids: np.ndarray, document_uuids: np.ndarray):
+        """Record the per-document vector ID ranges of entries sorted by vector ID."""
+        # Split the entries into runs of consecutive entries from the same document
+        boundaries = np.flatnonzero(np.any(document_uuids[1:] != document_uuids[:-1], axis=1)) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [len(vector_ids)]]) - 1
+        
+        for start, end in zip(starts, ends):
+            self._document_ranges.setdefault(document_uuids[start].tobytes(), []).append(
+                (int(vector_ids[start]), int(vector_ids[end]))
+            )
+    
+    def _merged(self):
+        """Merge all blocks into one sorted set of column arrays."""
+        if not self._blocks:
+            empty_uuids = np.empty((0, 16), dtype='uint8')
+            return np.empty(0, dtype='int64'), empty_uuids, empty_uuids.copy(), np.empty(0, dtype='int32')
+        
+        order = np.argsort(np.concatenate([block[0] for block in self._blocks]), kind='stable')
+        return tuple(
+            np.concatenate([block[column] for block in self._blocks])[order]
+            for column in range(4)
+        )
+    
+    @staticmethod
+    def _encode(ids: Iterable[str]) -> np.ndarray:
+        """Encode UUID strings as an (n, 16) uint8 array."""
+        raw = b''.join(uuid.UUID(str(value)).bytes for value in ids)
+        return np.frombuffer(raw, dtype='uint8').reshape(-1, 16).copy()
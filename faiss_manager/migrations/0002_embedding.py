@@ -0,0 +1,49 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:20
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("faiss_manager", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Embedding",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "content_hash",
+                    models.CharField(
+                        help_text="SHA-256 of the model name and chunk text",
+                        max_length=64,
+                        unique=True,
+                    ),
+                ),
+                ("model_name", models.CharField(max_length=255)),
+                ("dimension", models.IntegerField(default=384)),
+                ("vector", models.BinaryField(help_text="float32 embedding bytes")),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "db_table": "embeddings",
+                "indexes": [
+                    models.Index(
+                        fields=["model_name"], name="embeddings_model_n_c70b98_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("faiss_manager", "0002_embedding"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="faissindex",
+            name="index_type",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("flat", "Flat (exact)"),
+                    ("ivf_flat", "IVF-Flat"),
+                    ("ivf_pq", "IVF-PQ"),
+                    ("hnsw", "HNSW"),
+                ],
+                help_text="Index type for rebuilds; empty uses settings.FAISS_INDEX_TYPE",
+                max_length=20,
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("faiss_manager", "0003_faissindex_index_type"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="faissindex",
+            name="bytes_per_vector",
+            field=models.IntegerField(
+                default=0,
+                help_text="Estimated in-memory index bytes per vector, for capacity planning",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="faissindex",
+            name="index_type",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("flat", "Flat (exact)"),
+                    ("sq8", "Scalar quantized (8-bit)"),
+                    ("sq_fp16", "Scalar quantized (float16)"),
+                    ("pq", "Product quantized"),
+                    ("ivf_flat", "IVF-Flat"),
+                    ("ivf_pq", "IVF-PQ"),
+                    ("hnsw", "HNSW"),
+                ],
+                help_text="Index type for rebuilds; empty uses settings.FAISS_INDEX_TYPE",
+                max_length=20,
+            ),
+        ),
+    ]
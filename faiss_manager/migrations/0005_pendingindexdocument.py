@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("documents", "0002_chunk_embedding_vector_id_bigint"),
+        ("faiss_manager", "0004_compressed_index_types"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PendingIndexDocument",
+            fields=[
+                (
+                    "document",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="pending_index",
+                        serialize=False,
+                        to="documents.document",
+                    ),
+                ),
+                ("queued_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "db_table": "pending_index_documents",
+                "ordering": ["queued_at"],
+            },
+        ),
+    ]
@@ -9,6 +9,16 @@ from django.utils import timezone
 class FAISSIndex(models.Model):
     """Model for FAISS index metadata"""
     
+    INDEX_TYPE_CHOICES = [
+        ('flat', 'Flat (exact)'),
+        ('sq8', 'Scalar quantized (8-bit)'),
+        ('sq_fp16', 'Scalar quantized (float16)'),
+        ('pq', 'Product quantized'),
+        ('ivf_flat', 'IVF-Flat'),
+        ('ivf_pq', 'IVF-PQ'),
+        ('hnsw', 'HNSW'),
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     index_name = models.CharField(max_length=255, unique=True)
     index_file_path = models.CharField(max_length=500)
@@ -17,7 +27,17 @@ class FAISSIndex(models.Model):
         default=384,
         help_text="Embedding dimension (384 for MiniLM)"
     )
+    index_type = models.CharField(
+        max_length=20,
+        choices=INDEX_TYPE_CHOICES,
+        blank=True,
+        help_text="Index type for rebuilds; empty uses settings.FAISS_INDEX_TYPE"
+    )
     total_vectors = models.IntegerField(default=0)
+    bytes_per_vector = models.IntegerField(
+        default=0,
+        help_text="Estimated in-memory index bytes per vector, for capacity planning"
+    )
     last_updated = models.DateTimeField(auto_now=True)
     documents_included = models.JSONField(
         default=list,
@@ -35,3 +55,46 @@ class FAISSIndex(models.Model):
     
     def __str__(self):
         return f"FAISS Index: {self.index_name} ({self.total_vectors} vectors)"
+
+
+class Embedding(models.Model):
+    """Model for stored embedding vectors, keyed by chunk text and model"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    content_hash = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text="SHA-256 of the model name and chunk text"
+    )
+    model_name = models.CharField(max_length=255)
+    dimension = models.IntegerField(default=384)
+    vector = models.BinaryField(help_text="float32 embedding bytes")
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'embeddings'
+        indexes = [
+            models.Index(fields=['model_name']),
+        ]
+    
+    def __str__(self):
+        return f"Embedding {self.content_hash[:12]} ({self.model_name})"
+
+
+class PendingIndexDocument(models.Model):
+    """Model for a document whose chunks are embedded and wait for the next index commit"""
+    
+    document = models.OneToOneField(
+        'documents.Document',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='pending_index'
+    )
+    queued_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'pending_index_documents'
+        ordering = ['queued_at']
+    
+    def __str__(self):
+        return f"Pending index commit: {self.document_id}"
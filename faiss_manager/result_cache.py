@@ -0,0 +1,74 @@
+"""
+In-process cache of search results for an index snapshot version.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+
+class SearchResultCache:
+    """
+    Search result lists keyed by snapshot version, query and search knobs.
+    
+    Because the key includes the snapshot version, publishing a new version
+    invalidates every entry; stale entries then age out of the LRU. Entries
+    also expire after ttl seconds.
+    """
+    
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size  # Maximum cached result lists (0 disables the cache)
+        self.ttl = ttl  # Seconds an entry stays valid
+        self._entries = OrderedDict()  # Key -> (expiry time, results), least recently used first
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+    
+    def get(self, key: Hashable) -> Optional[List[Dict]]:
+        """Get the cached results for key, or None if missing or expired."""
+        if self.max_size <= 0:
+            return None
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            
+            if entry is None:
+                self._misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+    
+    def set(self, key: Hashable, results: List[Dict]):
+        """Store results for key, evicting the least recently used entries."""
+        if self.max_size <= 0:
+            return
+        
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Empty the cache and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = 0
+    
+    def stats(self) -> Dict:
+        """Get hit/miss counters and the cache size."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,502 @@
+"""
+Standalone retrieval server and its pooled client.
+
+The server (manage.py run_retrieval_server) owns the embedding model and
+FAISS index and serves embed and search requests over a Unix domain
+socket, so web workers do not load either. When no server is configured
+or it cannot be reached, callers fall back to the in-process service.
+
+Wire format: every message is a frame of a 1-byte code (request op or
+response status) and a 4-byte payload length, followed by the payload.
+Strings are a 4-byte length plus UTF-8 bytes, UUIDs are 16 raw bytes and
+numbers are fixed-width big-endian, except embedding matrices, which are
+sent as raw float32.
+"""
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+import numpy as np
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from .services import faiss_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+OP_PING = 1
+OP_EMBED = 2
+OP_SEARCH = 3
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+FRAME_HEADER = struct.Struct('!BI')
+MAX_FRAME_SIZE = 64 * 1024 * 1024  # Refuse larger payloads rather than allocate them
+NO_VALUE = -1  # Encodes None for optional integer fields
+
+
+class RetrievalServerUnavailable(Exception):
+    """The retrieval server could not be reached."""
+
+
+class RetrievalServerError(Exception):
+    """The retrieval server failed to process a request."""
+
+
+class _Writer:
+    """Builds a message payload."""
+    
+    def __init__(self):
+        self._parts = []
+    
+    def u32(self, value: int):
+        self._parts.append(struct.pack('!I', value))
+    
+    def i32(self, value: Optional[int]):
+        self._parts.append(struct.pack('!i', NO_VALUE if value is None else value))
+    
+    def i64(self, value: Optional[int]):
+        self._parts.append(struct.pack('!q', NO_VALUE if value is None else value))
+    
+    def f32(self, value: float):
+        self._parts.append(struct.pack('!f', value))
+    
+    def string(self, value: str):
+        data = value.encode('utf-8')
+        self.u32(len(data))
+        self._parts.append(data)
+    
+    def uuid(self, value: str):
+        self._parts.append(uuid.UUID(str(value)).bytes)
+    
+    def raw(self, data: bytes):
+        self._parts.append(data)
+    
+    def getvalue(self) -> bytes:
+        return b''.join(self._parts)
+
+
+class _Reader:
+    """Reads a message payload written by _Writer."""
+    
+    def __init__(self, data: bytes):
+        self._data = memoryview(data)
+        self._offset = 0
+    
+    def _take(self, size: int) -> memoryview:
+        if self._offset + size > len(self._data):
+            raise ValueError("Truncated retrieval message")
+        chunk = self._data[self._offset:self._offset + size]
+        self._offset += size
+        return chunk
+    
+    def u32(self) -> int:
+        return struct.unpack('!I', self._take(4))[0]
+    
+    def i32(self) -> Optional[int]:
+        value = struct.unpack('!i', self._take(4))[0]
+        return None if value == NO_VALUE else value
+    
+    def i64(self) -> Optional[int]:
+        value = struct.unpack('!q', self._take(8))[0]
+        return None if value == NO_VALUE else value
+    
+    def f32(self) -> float:
+        return struct.unpack('!f', self._take(4))[0]
+    
+    def string(self) -> str:
+        return str(self._take(self.u32()), 'utf-8')
+    
+    def uuid(self) -> str:
+        return str(uuid.UUID(bytes=bytes(self._take(16))))
+    
+    def raw(self, size: int) -> bytes:
+        return bytes(self._take(size))
+
+
+def _send_frame(sock: socket.socket, code: int, payload: bytes):
+    """Send one frame."""
+    sock.sendall(FRAME_HEADER.pack(code, len(payload)) + payload)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    """Read exactly size bytes."""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("Retrieval socket closed")
+        received += count
+    return bytes(buffer)
+
+
+def _recv_frame(sock: socket.socket):
+    """Read one frame, returning (code, payload), or None if the peer closed cleanly."""
+    header = sock.recv(FRAME_HEADER.size, socket.MSG_WAITALL)
+    if not header:
+        return None
+    if len(header) < FRAME_HEADER.size:
+        header += _recv_exactly(sock, FRAME_HEADER.size - len(header))
+    
+    code, size = FRAME_HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise ValueError(f"Retrieval frame of {size} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+    return code, _recv_exactly(sock, size)
+
+
+def encode_search_request(
+    queries: List[str],
+    top_k: int,
+    filters: Optional[List[Optional[List[str]]]],
+    nprobe: Optional[int],
+    ef_search: Optional[int],
+    rerank: Optional[bool]
+) -> bytes:
+    """Encode a search request."""
+    writer = _Writer()
+    writer.u32(top_k)
+    writer.i32(nprobe)
+    writer.i32(ef_search)
+    writer.i32(None if rerank is None else int(rerank))
+    writer.u32(len(queries))
+    for row, query in enumerate(queries):
+        writer.string(query)
+        document_ids = (filters[row] if filters is not None else None) or []
+        writer.u32(len(document_ids))
+        for document_id in document_ids:
+            writer.uuid(document_id)
+    return writer.getvalue()
+
+
+def decode_search_request(payload: bytes) -> Dict:
+    """Decode a search request into FAISSService.search_batch() keyword arguments."""
+    reader = _Reader(payload)
+    top_k = reader.u32()
+    nprobe = reader.i32()
+    ef_search = reader.i32()
+    rerank = reader.i32()
+    queries = []
+    filters = []
+    for _ in range(reader.u32()):
+        queries.append(reader.string())
+        filters.append([reader.uuid() for _ in range(reader.u32())] or None)
+    return {
+        'queries': queries,
+        'top_k': top_k,
+        'filters': filters,
+        'nprobe': nprobe,
+        'ef_search': ef_search,
+        'rerank': None if rerank is None else bool(rerank),
+    }
+
+
+def encode_search_results(results: List[List[Dict]]) -> bytes:
+    """Encode FAISSService.search_batch() results."""
+    writer = _Writer()
+    writer.u32(len(results))
+    for query_results in results:
+        writer.u32(len(query_results))
+        for hit in query_results:
+            writer.uuid(hit['chunk_id'])
+            writer.uuid(hit['document_id'])
+            writer.i32(hit['page_number'])
+            writer.f32(hit['distance'])
+            writer.string(hit['document_name'])
+            writer.string(hit['text'])
+    return writer.getvalue()
+
+
+def decode_search_results(payload: bytes) -> List[List[Dict]]:
+    """Decode search results into the dicts FAISSService.search_batch() returns."""
+    reader = _Reader(payload)
+    results = []
+    for _ in range(reader.u32()):
+        query_results = []
+        for _ in range(reader.u32()):
+            chunk_id = reader.uuid()
+            document_id = reader.uuid()
+            page_number = reader.i32()
+            distance = reader.f32()
+            document_name = reader.string()
+            text = reader.string()
+            query_results.append({
+                'chunk_id': chunk_id,
+                'document_id': document_id,
+                'document_name': document_name,
+                'text': text,
+                'page_number': page_number,
+                # Same conversion as FAISSService, from the same float32 distance
+                'similarity_score': 1 / (1 + distance),
+                'distance': distance
+            })
+        results.append(query_results)
+    return results
+
+
+class _RetrievalRequestHandler(socketserver.BaseRequestHandler):
+    """Serves requests on one client connection until the client closes it."""
+    
+    def handle(self):
+        while True:
+            try:
+                frame = _recv_frame(self.request)
+            except (ConnectionError, ValueError) as e:
+                logger.warning(f"Dropping retrieval client connection: {str(e)}")
+                return
+            
+            if frame is None:
+                return
+            
+            op, payload = frame
+            try:
+                response = self.server.dispatch(op, payload)
+                _send_frame(self.request, STATUS_OK, response)
+            except (ConnectionError, BrokenPipeError):
+                return
+            except Exception as e:
+                logger.error(f"Error handling retrieval request (op {op}): {str(e)}")
+                writer = _Writer()
+                writer.string(str(e))
+                _send_frame(self.request, STATUS_ERROR, writer.getvalue())
+
+
+class RetrievalServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves FAISSService embed and search requests on a Unix domain socket.
+    
+    Each client connection is handled in its own thread; searches run
+    against the service's lock-free index snapshot.
+    """
+    
+    daemon_threads = True
+    request_queue_size = 128  # Pending connections from all web workers' pools
+    
+    def __init__(self, socket_path: str, service):
+        self.socket_path = socket_path
+        self.service = service  # FAISSService that owns the model and index
+        
+        # A stale socket file from a crashed server would make bind fail
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        
+        super().__init__(socket_path, _RetrievalRequestHandler)
+        os.chmod(socket_path, 0o660)
+    
+    def dispatch(self, op: int, payload: bytes) -> bytes:
+        """Run one request and return the response payload."""
+        if op == OP_PING:
+            writer = _Writer()
+            writer.u32(os.getpid())
+            writer.i64(self.service.get_readiness()['index_version'])
+            return writer.getvalue()
+        
+        if op == OP_EMBED:
+            reader = _Reader(payload)
+            texts = [reader.string() for _ in range(reader.u32())]
+            embeddings = np.ascontiguousarray(self.service.get_query_embeddings(texts), dtype='<f4')
+            writer = _Writer()
+            writer.u32(embeddings.shape[0])
+            writer.u32(embeddings.shape[1])
+            writer.raw(embeddings.tobytes())
+            return writer.getvalue()
+        
+        if op == OP_SEARCH:
+            results = self.service.search_batch(**decode_search_request(payload))
+            return encode_search_results(results)
+        
+        raise ValueError(f"Unknown retrieval op {op}")
+    
+    def server_close(self):
+        """Close the socket and remove its file."""
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class RetrievalClient:
+    """
+    Client for the retrieval server, keeping a pool of open connections.
+    
+    Connections are reused across requests and threads; at most pool_size
+    idle connections are kept. Connection failures raise
+    RetrievalServerUnavailable, errors reported by the server raise
+    RetrievalServerError.
+    """
+    
+    def __init__(self, socket_path: str, pool_size: int = 4, timeout: float = 10.0):
+        self.socket_path = socket_path
+        self.timeout = timeout  # Seconds to wait for a connection or response
+        self._pool = queue.LifoQueue(maxsize=pool_size)  # Idle connections, most recently used first
+    
+    def ping(self) -> Dict:
+        """Check the server is up; returns its pid and index snapshot version."""
+        reader = _Reader(self._request(OP_PING, b''))
+        return {'pid': reader.u32(), 'index_version': reader.i64()}
+    
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Get query embeddings (n_texts x dimension) from the server."""
+        writer = _Writer()
+        writer.u32(len(texts))
+        for text in texts:
+            writer.string(text)
+        
+        reader = _Reader(self._request(OP_EMBED, writer.getvalue()))
+        rows, dimension = reader.u32(), reader.u32()
+        return np.frombuffer(reader.raw(rows * dimension * 4), dtype='<f4').reshape(rows, dimension).astype('float32')
+    
+    def search_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        filters: Optional[List[Optional[List[str]]]] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        rerank: Optional[bool] = None
+    ) -> List[List[Dict]]:
+        """Run FAISSService.search_batch() on the server."""
+        payload = encode_search_request(queries, top_k, filters, nprobe, ef_search, rerank)
+        return decode_search_results(self._request(OP_SEARCH, payload))
+    
+    def close(self):
+        """Close all idle connections."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+    
+    def _request(self, op: int, payload: bytes) -> bytes:
+        """Send a request on a pooled connection and return the response payload."""
+        sock, reused = self._acquire()
+        try:
+            frame = self._exchange(sock, op, payload)
+        except ConnectionError as e:
+            sock.close()
+            if not reused:
+                raise RetrievalServerUnavailable(f"Retrieval server request failed: {str(e)}") from e
+            
+            # The pooled connection went stale (e.g. the server restarted), so retry once on a new one
+            sock, _ = self._acquire(pooled=False)
+            try:
+                frame = self._exchange(sock, op, payload)
+            except (OSError, ValueError) as e:
+                sock.close()
+                raise RetrievalServerUnavailable(f"Retrieval server request failed: {str(e)}") from e
+        except (OSError, ValueError) as e:
+            sock.close()
+            raise RetrievalServerUnavailable(f"Retrieval server request failed: {str(e)}") from e
+        
+        self._release(sock)
+        status, response = frame
+        if status != STATUS_OK:
+            raise RetrievalServerError(_Reader(response).string())
+        return response
+    
+    def _exchange(self, sock: socket.socket, op: int, payload: bytes):
+        """Send one request frame and read the response frame."""
+        _send_frame(sock, op, payload)
+        frame = _recv_frame(sock)
+        if frame is None:
+            raise ConnectionError("Retrieval server closed the connection")
+        return frame
+    
+    def _acquire(self, pooled: bool = True):
+        """Get an idle pooled connection or open a new one, returning (socket, reused)."""
+        if pooled:
+            try:
+                return self._pool.get_nowait(), True
+            except queue.Empty:
+                pass
+        
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise RetrievalServerUnavailable(f"Cannot connect to retrieval server at {self.socket_path}: {str(e)}") from e
+        return sock, False
+    
+    def _release(self, sock: socket.socket):
+        """Return a connection to the pool, closing it if the pool is full."""
+        try:
+            self._pool.put_nowait(sock)
+        except queue.Full:
+            sock.close()
+
+
+class _RetrievalFallback:
+    """Tracks when the retrieval server last failed, to skip it for a while afterwards."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._retry_at = 0.0  # time.monotonic() before which the server is not tried
+    
+    def should_try(self) -> bool:
+        with self._lock:
+            return time.monotonic() >= self._retry_at
+    
+    def failed(self):
+        with self._lock:
+            self._retry_at = time.monotonic() + settings.RETRIEVAL_SERVER_RETRY_INTERVAL
+
+
+_fallback = _RetrievalFallback()
+
+# Pooled client for settings.RETRIEVAL_SERVER_SOCKET, created on first use
+retrieval_client = SimpleLazyObject(lambda: RetrievalClient(
+    settings.RETRIEVAL_SERVER_SOCKET,
+    pool_size=settings.RETRIEVAL_CLIENT_POOL_SIZE,
+    timeout=settings.RETRIEVAL_SERVER_TIMEOUT
+))
+
+
+def search_batch(
+    queries: List[str],
+    top_k: int = 5,
+    filters: Optional[List[Optional[List[str]]]] = None,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    rerank: Optional[bool] = None
+) -> List[List[Dict]]:
+    """
+    Search through the retrieval server if one is configured, else in-process.
+    
+    If the server cannot be reached, the search runs in-process and the
+    server is not tried again for settings.RETRIEVAL_SERVER_RETRY_INTERVAL
+    seconds.
+    """
+    if settings.RETRIEVAL_SERVER_SOCKET and _fallback.should_try():
+        try:
+            return retrieval_client.search_batch(
+                queries, top_k=top_k, filters=filters, nprobe=nprobe, ef_search=ef_search, rerank=rerank
+            )
+        except RetrievalServerUnavailable as e:
+            _fallback.failed()
+            logger.warning(f"{str(e)}; searching in-process")
+    
+    return faiss_service.search_batch(
+        queries, top_k=top_k, filters=filters, nprobe=nprobe, ef_search=ef_search, rerank=rerank
+    )
+
+
+def search(
+    query: str,
+    top_k: int = 5,
+    document_ids: Optional[List[str]] = None,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    rerank: Optional[bool] = None
+) -> List[Dict]:
+    """Search for one query through the retrieval server if configured, else in-process."""
+    return search_batch(
+        [query], top_k=top_k, filters=[document_ids], nprobe=nprobe, ef_search=ef_search, rerank=rerank
+    )[0]
@@ -0,0 +1,59 @@
+"""
+Serializers for FAISS management requests
+"""
+from django.conf import settings
+from rest_framework import serializers
+
+
+class SearchBatchSerializer(serializers.Serializer):
+    """Serializer for batched search requests"""
+    queries = serializers.ListField(
+        child=serializers.CharField(),
+        min_length=1,
+        help_text="Search query texts"
+    )
+    top_k = serializers.IntegerField(
+        default=5,
+        min_value=1,
+        max_value=100,
+        help_text="Number of chunks to retrieve per query (1-100)"
+    )
+    document_filter = serializers.ListField(
+        child=serializers.UUIDField(),
+        required=False,
+        allow_empty=True,
+        help_text="Optional list of document IDs to search within, for every query"
+    )
+    filters = serializers.ListField(
+        child=serializers.ListField(child=serializers.UUIDField(), allow_empty=True),
+        required=False,
+        help_text="Optional per-query lists of document IDs, one per query"
+    )
+    nprobe = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        help_text="Optional number of IVF lists to visit (IVF indexes only)"
+    )
+    ef_search = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        help_text="Optional HNSW search depth (HNSW indexes only)"
+    )
+    
+    def validate_queries(self, value):
+        """Cap the number of queries per request"""
+        if len(value) > settings.FAISS_SEARCH_BATCH_MAX_QUERIES:
+            raise serializers.ValidationError(
+                f"At most {settings.FAISS_SEARCH_BATCH_MAX_QUERIES} queries per request."
+            )
+        return value
+    
+    def validate(self, attrs):
+        """Check that filters line up with queries"""
+        if 'filters' in attrs and 'document_filter' in attrs:
+            raise serializers.ValidationError("Use either document_filter or filters, not both.")
+        
+        if 'filters' in attrs and len(attrs['filters']) != len(attrs['queries']):
+            raise serializers.ValidationError({'filters': ["Provide one filter per query."]})
+        
+        return attrs
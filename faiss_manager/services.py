@@ -1,27 +1,66 @@
 """
 FAISS vector database management and embedding generation services.
+
+faiss and the embedding backend (torch or onnxruntime) are imported
+inside the methods that use them, so importing this module, e.g. for
+migrate or the admin, does not load them.
 """
-import faiss
+import hashlib
+import multiprocessing
 import numpy as np
+import os
 import pickle
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional
-from sentence_transformers import SentenceTransformer
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from django.db.models import Max
 from documents.models import Chunk
-from .models import FAISSIndex
+from .batching import EmbeddingBatcher
+from .embedding_backends import create_embedding_backend, embedding_backend_config, embedding_model_id, padding_efficiency
+from .embedding_cache import QueryEmbeddingCache, normalize_query
+from .embedding_pool import EmbeddingPool
+from .mapping import VectorIdMap, save_array
+from .result_cache import SearchResultCache
+from .snapshots import IndexSnapshot, SnapshotStore
+from .models import FAISSIndex, Embedding
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Supported values for settings.FAISS_INDEX_TYPE / FAISSIndex.index_type
+INDEX_TYPES = ('flat', 'sq8', 'sq_fp16', 'pq', 'ivf_flat', 'ivf_pq', 'hnsw')
+
+# Number of content hashes looked up or inserted per query
+EMBEDDING_LOOKUP_BATCH_SIZE = 500
+
+# Arrays of a delta segment file: appended vectors and their mapping, and removed vector IDs
+DELTA_SEGMENT_KEYS = (
+    'vector_ids', 'embeddings', 'chunk_ids', 'document_ids', 'page_numbers', 'document_names', 'removed_ids'
+)
+
 
 class FAISSService:
     """Service for managing FAISS indexes and embeddings."""
     
     _instance = None
-    _model = None
-    _index = None
-    _chunk_id_map = None  # Maps FAISS vector ID to Chunk database ID
+    _model = None  # EmbeddingBackend selected by settings.EMBEDDING_BACKEND
+    _snapshot = None  # Current IndexSnapshot, replaced as a whole by writers
+    _write_lock = threading.RLock()  # Serializes index writers within the process
+    _writer_lock = None  # WriterLock serializing index writers across processes
+    _reload_lock = threading.Lock()  # Guards starting the background reload thread
+    _reload_thread = None  # Thread loading a version published by another process
+    _last_version_check = 0.0  # time.monotonic() of the last CURRENT pointer check
+    _query_cache = None  # QueryEmbeddingCache of recent query embeddings
+    _result_cache = None  # SearchResultCache of recent search results
+    _embedding_batcher = None  # EmbeddingBatcher gathering concurrent query encodes
+    _warmup_state = 'not_started'  # not_started, running, done or failed
+    _warmup_error = None  # Error message of a failed warm-up
     
     def __new__(cls):
         """Singleton pattern to ensure only one instance."""
@@ -30,15 +69,13 @@ class FAISSService:
         return cls._instance
     
     def __init__(self):
-        """Initialize the FAISS service."""
-        if FAISSService._model is None:
-            self.load_embedding_model()
+        """Initialize the FAISS service (the embedding model is loaded on first use)."""
     
     def load_embedding_model(self):
-        """Load the sentence transformer model for embeddings."""
+        """Load the embedding model with the backend selected by settings.EMBEDDING_BACKEND."""
         try:
-            logger.info("Loading sentence-transformers model: all-MiniLM-L6-v2")
-            FAISSService._model = SentenceTransformer('all-MiniLM-L6-v2')
+            logger.info(f"Loading embedding model {settings.EMBEDDING_MODEL} ({settings.EMBEDDING_BACKEND} backend)")
+            FAISSService._model = create_embedding_backend()
             logger.info("Model loaded successfully")
         except Exception as e:
             logger.error(f"Error loading embedding model: {str(e)}")
@@ -50,16 +87,12 @@ class FAISSService:
         
         Args:
             text: Text to embed
-            
+        
         Returns:
             Numpy array of embedding vector (384 dimensions)
         """
-        if FAISSService._model is None:
-            self.load_embedding_model()
-        
         try:
-            embedding = FAISSService._model.encode([text])[0]
-            return embedding.astype('float32')
+            return self.encode_queries([text])[0]
         except Exception as e:
             logger.error(f"Error generating embedding: {str(e)}")
             raise
@@ -70,88 +103,467 @@ class FAISSService:
         
         Args:
             texts: List of texts to embed
-            
+        
         Returns:
             Numpy array of embeddings (n_texts x 384)
         """
-        if FAISSService._model is None:
-            self.load_embedding_model()
+        batches = list(self.iter_embeddings_batches(texts))
+        if not batches:
+            return np.empty((0, settings.EMBEDDING_DIMENSION), dtype='float32')
+        return np.vstack(batches)
+    
+    def iter_embeddings_batches(self, texts: List[str]):
+        """
+        Embed texts for bulk ingestion, yielding consecutive batches of embeddings in input order.
+        
+        At least settings.EMBEDDING_POOL_MIN_TEXTS texts are sharded across
+        settings.EMBEDDING_POOL_PROCESSES worker processes (see
+        EmbeddingPool); fewer are embedded in-process in one batch. Either
+        way the backend runs length-bucketed batches, and throughput and
+        padding efficiency are logged.
+        
+        Args:
+            texts: List of texts to embed
+        
+        Yields:
+            Numpy arrays of embeddings (n_batch_texts x 384)
+        """
+        start = time.perf_counter()
+        done = 0
+        tokens = padded_tokens = 0
         
         try:
-            embeddings = FAISSService._model.encode(texts, show_progress_bar=True)
-            return embeddings.astype('float32')
+            if self._use_embedding_pool(len(texts)):
+                processes = settings.EMBEDDING_POOL_PROCESSES
+                threads = max(1, (os.cpu_count() or 1) // processes)
+                backend_name, backend_kwargs = embedding_backend_config(threads)
+                logger.info(f"Embedding {len(texts)} texts with {processes} processes x {threads} threads")
+                
+                with EmbeddingPool(processes, backend_name, backend_kwargs, max_batch=settings.EMBEDDING_POOL_MAX_BATCH) as pool:
+                    next_report = len(texts) / 10
+                    for embeddings in pool.imap(texts):
+                        done += len(embeddings)
+                        if done >= next_report:
+                            rate = done / (time.perf_counter() - start)
+                            logger.info(f"Embedded {done}/{len(texts)} texts ({rate:.1f} chunks/s)")
+                            next_report += len(texts) / 10
+                        yield embeddings
+                
+                tokens, padded_tokens = pool.tokens, pool.padded_tokens
+            else:
+                if FAISSService._model is None:
+                    self.load_embedding_model()
+                if texts:
+                    model = FAISSService._model
+                    tokens_before, padded_tokens_before = model.tokens, model.padded_tokens
+                    embeddings = model.encode(texts, show_progress_bar=True)
+                    done = len(embeddings)
+                    tokens = model.tokens - tokens_before
+                    padded_tokens = model.padded_tokens - padded_tokens_before
+                    yield embeddings.astype('float32')
         except Exception as e:
             logger.error(f"Error generating batch embeddings: {str(e)}")
             raise
+        
+        if done:
+            seconds = time.perf_counter() - start
+            logger.info(
+                f"Embedded {done} texts in {seconds:.1f}s ({done / seconds:.1f} chunks/s, "
+                f"padding efficiency {padding_efficiency(tokens, padded_tokens):.1%})"
+            )
+    
+    def _use_embedding_pool(self, count: int) -> bool:
+        """Whether to embed count texts with a process pool."""
+        if settings.EMBEDDING_POOL_PROCESSES < 2 or count < settings.EMBEDDING_POOL_MIN_TEXTS:
+            return False
+        if multiprocessing.current_process().daemon:
+            # Daemonic processes (e.g. Celery prefork workers) cannot start children
+            logger.warning("Cannot start an embedding pool from a daemonic process; embedding in-process")
+            return False
+        return True
+    
+    def encode_queries(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed query texts with the model, no caching.
+        
+        With settings.EMBEDDING_BATCHING, concurrent calls from all threads
+        are gathered into batched forward passes by the embedding batcher.
+        
+        Args:
+            texts: List of query texts
+        
+        Returns:
+            Numpy array of embeddings (n_texts x 384)
+        """
+        if settings.EMBEDDING_BATCHING:
+            return self._get_embedding_batcher().encode(texts)
+        return self._encode_texts(texts)
+    
+    def get_query_embeddings(self, queries: List[str]) -> np.ndarray:
+        """
+        Get embeddings for search queries, encoding only queries not in the cache.
+        
+        Args:
+            queries: List of query texts
+        
+        Returns:
+            Numpy array of embeddings (n_queries x 384), in input order
+        """
+        cache = self._get_query_cache()
+        model_name = embedding_model_id()
+        hashes = [self._content_hash(normalize_query(query), model_name) for query in queries]
+        vectors_by_hash = cache.get_many(hashes)
+        
+        # Encode each distinct uncached query once
+        missing = {}
+        for query, content_hash in zip(queries, hashes):
+            if content_hash not in vectors_by_hash:
+                missing.setdefault(content_hash, normalize_query(query))
+        
+        if missing:
+            embeddings = self.encode_queries(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), embeddings))
+            cache.set_many(new_vectors)
+            vectors_by_hash.update(new_vectors)
+        
+        if not hashes:
+            return np.empty((0, settings.EMBEDDING_DIMENSION), dtype='float32')
+        
+        return np.vstack([vectors_by_hash[content_hash] for content_hash in hashes]).astype('float32')
+    
+    def get_chunk_embeddings(self, texts: List[str]) -> np.ndarray:
+        """
+        Get embeddings for chunk texts, encoding only texts not seen before.
+        
+        Embeddings are stored by a hash of the model name and text, so
+        rebuilds and restarts load vectors instead of re-running the model.
+        
+        Args:
+            texts: List of chunk texts
+        
+        Returns:
+            Numpy array of embeddings (n_texts x 384), in input order
+        """
+        model_name = embedding_model_id()
+        hashes = [self._content_hash(text, model_name) for text in texts]
+        
+        # Load stored vectors in batches to stay under DB parameter limits
+        vectors_by_hash = {}
+        unique_hashes = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique_hashes), EMBEDDING_LOOKUP_BATCH_SIZE):
+            batch = unique_hashes[start:start + EMBEDDING_LOOKUP_BATCH_SIZE]
+            for content_hash, vector in Embedding.objects.filter(content_hash__in=batch).values_list('content_hash', 'vector'):
+                vectors_by_hash[content_hash] = np.frombuffer(vector, dtype='float32')
+        
+        # Encode the texts that have no stored vector yet
+        missing = {}
+        for text, content_hash in zip(texts, hashes):
+            if content_hash not in vectors_by_hash:
+                missing.setdefault(content_hash, text)
+        
+        logger.info(f"Embedding store hit for {len(unique_hashes) - len(missing)}/{len(unique_hashes)} chunk texts")
+        
+        # Store each batch as it arrives, so an interrupted bulk run keeps its progress
+        missing_hashes = list(missing.keys())
+        start = 0
+        for embeddings in self.iter_embeddings_batches(list(missing.values())):
+            batch_hashes = missing_hashes[start:start + len(embeddings)]
+            start += len(embeddings)
+            new_records = []
+            for content_hash, embedding in zip(batch_hashes, embeddings):
+                vectors_by_hash[content_hash] = embedding
+                new_records.append(Embedding(
+                    content_hash=content_hash,
+                    model_name=model_name,
+                    dimension=embedding.shape[0],
+                    vector=embedding.tobytes()
+                ))
+            Embedding.objects.bulk_create(new_records, batch_size=EMBEDDING_LOOKUP_BATCH_SIZE, ignore_conflicts=True)
+        
+        if not hashes:
+            return np.empty((0, settings.EMBEDDING_DIMENSION), dtype='float32')
+        
+        return np.vstack([vectors_by_hash[content_hash] for content_hash in hashes]).astype('float32')
     
-    def build_index(self, document_ids: Optional[List[str]] = None) -> bool:
+    @contextmanager
+    def writing(self):
+        """
+        Hold the index writer locks: _write_lock for threads of this
+        process and the snapshot store's file lock for other processes, so
+        writers in different Celery workers never publish on top of the
+        same version. Reentrant; callers whose write depends on state they
+        read first (e.g. IndexWriter's queue) hold it around both.
+        """
+        with FAISSService._write_lock:
+            if FAISSService._writer_lock is None:
+                FAISSService._writer_lock = self._get_store().writer_lock()
+            with FAISSService._writer_lock:
+                yield
+    
+    def build_index(
+        self,
+        document_ids: Optional[List[str]] = None,
+        index_type: Optional[str] = None,
+        exclude_chunk_ids: Optional[List[str]] = None
+    ) -> bool:
         """
         Build or rebuild FAISS index from chunks in database.
         
+        This is a full rebuild that re-embeds every chunk. Newly uploaded
+        documents should be indexed with add_document() instead. The result
+        is published as a new snapshot version.
+        
         Args:
             document_ids: Optional list of document IDs to index. If None, index all.
-            
+            index_type: Optional index type (flat, ivf_flat, ivf_pq, hnsw). Defaults to
+                the FAISSIndex record's index_type, then settings.FAISS_INDEX_TYPE.
+            exclude_chunk_ids: Optional list of chunk IDs to leave out of the index
+        
         Returns:
             bool: True if successful
         """
         try:
-            logger.info("Building FAISS index...")
-            
-            # Get chunks from database
-            if document_ids:
-                chunks = Chunk.objects.filter(document_id__in=document_ids).order_by('id')
-            else:
-                chunks = Chunk.objects.all().order_by('id')
-            
-            if not chunks.exists():
-                logger.warning("No chunks found to index")
-                return False
-            
-            # Extract texts and IDs
-            chunk_texts = [chunk.chunk_text for chunk in chunks]
-            chunk_ids = [str(chunk.id) for chunk in chunks]
-            
-            logger.info(f"Generating embeddings for {len(chunk_texts)} chunks...")
-            
-            # Generate embeddings
-            embeddings = self.generate_embeddings_batch(chunk_texts)
-            
-            # Create FAISS index
-            dimension = embeddings.shape[1]  # Should be 384
-            FAISSService._index = faiss.IndexFlatL2(dimension)
-            
-            # Add embeddings to index
-            FAISSService._index.add(embeddings)
-            
-            # Create mapping from FAISS vector ID to Chunk database ID
-            FAISSService._chunk_id_map = {i: chunk_ids[i] for i in range(len(chunk_ids))}
-            
-            # Save index to disk
-            self.save_index()
-            
-            # Update FAISSIndex model
-            index_record, created = FAISSIndex.objects.get_or_create(
-                index_name='default',
-                defaults={
-                    'dimension': dimension,
-                    'total_vectors': len(chunk_ids),
-                    'index_file_path': str(self._get_index_path())
-                }
-            )
-            
-            if not created:
-                index_record.total_vectors = len(chunk_ids)
-                index_record.last_updated = None  # Will auto-update
-                index_record.save()
-            
-            logger.info(f"FAISS index built successfully with {len(chunk_ids)} vectors")
-            return True
-            
+            with self.writing():
+                logger.info("Building FAISS index...")
+                
+                # Get chunks from database, grouped by document so each document
+                # gets a contiguous range of vector IDs
+                if document_ids:
+                    chunks = Chunk.objects.filter(document_id__in=document_ids)
+                else:
+                    chunks = Chunk.objects.all()
+                if exclude_chunk_ids:
+                    chunks = chunks.exclude(id__in=exclude_chunk_ids)
+                chunks = chunks.select_related('document').order_by('document_id', 'chunk_index')
+                
+                if not chunks.exists():
+                    logger.warning("No chunks found to index")
+                    return False
+                
+                # Reuse each chunk's stable vector ID, adding vectors in ID order
+                chunks = list(chunks)
+                vector_ids = self._assign_vector_ids(chunks, FAISSService._snapshot)
+                order = np.argsort(vector_ids, kind='stable')
+                chunks = [chunks[i] for i in order]
+                vector_ids = vector_ids[order]
+                
+                chunk_texts = [chunk.chunk_text for chunk in chunks]
+                
+                logger.info(f"Generating embeddings for {len(chunk_texts)} chunks...")
+                
+                # Load stored embeddings, generating only the missing ones
+                embeddings = self.get_chunk_embeddings(chunk_texts)
+                
+                self._publish_index(chunks, vector_ids, embeddings, index_type)
+                
+                # Index files saved before versioned snapshots are superseded
+                if self._get_legacy_index_path().exists():
+                    self._remove_legacy_files()
+                
+                logger.info(f"FAISS index built successfully with {len(chunks)} vectors")
+                return True
+        
         except Exception as e:
             logger.error(f"Error building FAISS index: {str(e)}")
             raise
     
-    def search(self, query: str, top_k: int = 5, document_ids: Optional[List[str]] = None) -> List[Dict]:
+    def add_document(self, document_id: str) -> int:
+        """
+        Embed a single document's chunks and append them to the index.
+        
+        See add_documents(), which indexes many documents in one version.
+        
+        Args:
+            document_id: ID of the document whose chunks should be indexed
+        
+        Returns:
+            Number of vectors added
+        """
+        return self.add_documents([document_id])[str(document_id)]
+    
+    def add_documents(self, document_ids: List[str]) -> Dict[str, int]:
+        """
+        Embed documents' chunks and append them to the index.
+        
+        Only the new chunks are encoded. The vectors go to the delta index
+        and are published as one small delta segment in a new snapshot
+        version, however many documents there are, instead of rewriting the
+        index. Once the delta exceeds FAISS_COMPACTION_RATIO of the index,
+        the index is compacted; once there are more than
+        FAISS_MAX_DELTA_SEGMENTS segments, they are merged into one.
+        
+        Args:
+            document_ids: IDs of the documents whose chunks should be indexed
+        
+        Returns:
+            Dict of document ID to number of vectors added (0 if it was already indexed or has no chunks)
+        """
+        document_ids = [str(document_id) for document_id in document_ids]
+        added = dict.fromkeys(document_ids, 0)
+        
+        try:
+            with self.writing():
+                snapshot = self._get_write_snapshot()
+                
+                # Skip documents that are already present in the index
+                if snapshot is not None and len(snapshot.id_map):
+                    indexed = [
+                        document_id for document_id in document_ids
+                        if snapshot.id_map.document_ranges([document_id])
+                    ]
+                    for document_id in indexed:
+                        logger.warning(f"Document {document_id} is already indexed")
+                    document_ids = [document_id for document_id in document_ids if document_id not in indexed]
+                
+                chunks = list(
+                    Chunk.objects.filter(document_id__in=document_ids)
+                    .select_related('document')
+                    .order_by('document_id', 'chunk_index')
+                )
+                
+                if not chunks:
+                    logger.warning(f"No new chunks found to index for documents {', '.join(document_ids)}")
+                    return added
+                
+                for chunk in chunks:
+                    added[str(chunk.document_id)] += 1
+                
+                if snapshot is None:
+                    # First documents ever: build the index so it can be trained on these vectors
+                    self.build_index()
+                    return added
+                
+                # Appended IDs must be above every indexed ID, so stale ones are replaced
+                vector_ids = self._assign_vector_ids(
+                    chunks, snapshot, min_id=self._next_vector_id(snapshot, include_stored=False)
+                )
+                order = np.argsort(vector_ids, kind='stable')
+                chunks = [chunks[i] for i in order]
+                vector_ids = vector_ids[order]
+                
+                chunk_texts = [chunk.chunk_text for chunk in chunks]
+                chunk_ids = [str(chunk.id) for chunk in chunks]
+                document_count = sum(1 for count in added.values() if count)
+                
+                logger.info(f"Generating embeddings for {len(chunk_texts)} chunks of {document_count} documents...")
+                embeddings = self.get_chunk_embeddings(chunk_texts)
+                
+                FAISSService._snapshot = self._publish_delta(snapshot, {
+                    'vector_ids': vector_ids,
+                    'embeddings': embeddings,
+                    'chunk_ids': np.array(chunk_ids),
+                    'document_ids': np.array([str(chunk.document_id) for chunk in chunks]),
+                    'page_numbers': np.array([chunk.page_number for chunk in chunks], dtype='int32'),
+                    'document_names': np.array([chunk.document.original_filename for chunk in chunks])
+                })
+                logger.info(f"Added {len(chunk_ids)} vectors for {document_count} documents to FAISS index")
+                
+                if self._delta_ratio(FAISSService._snapshot) > settings.FAISS_COMPACTION_RATIO:
+                    self.compact_index()
+                else:
+                    if self._too_many_deltas(FAISSService._snapshot):
+                        FAISSService._snapshot = self._merge_deltas(FAISSService._snapshot)
+                    self._update_index_record(FAISSService._snapshot)
+                
+                return added
+        
+        except Exception as e:
+            logger.error(f"Error adding documents {', '.join(document_ids)} to FAISS index: {str(e)}")
+            raise
+    
+    def remove_document(self, document_id: str) -> int:
+        """
+        Remove a document's vectors from search results.
+        
+        The vectors are tombstoned so search skips them, and the tombstones
+        are published as a delta segment. Once tombstones exceed
+        FAISS_COMPACTION_RATIO of the index, the index is compacted; once
+        there are more than FAISS_MAX_DELTA_SEGMENTS segments, they are
+        merged into one.
+        
+        Args:
+            document_id: ID of the document being deleted (call before deleting its chunks)
+        
+        Returns:
+            Number of vectors removed
+        """
+        try:
+            with self.writing():
+                snapshot = self._get_write_snapshot()
+                
+                if snapshot is None or not len(snapshot.id_map):
+                    return 0
+                
+                chunk_ids = Chunk.objects.filter(document_id=document_id).values_list('id', flat=True)
+                removed_ids = [
+                    int(vector_id) for vector_id in snapshot.id_map.vector_ids_for_chunks(chunk_ids)
+                    if int(vector_id) not in snapshot.tombstones
+                ]
+                
+                if not removed_ids:
+                    logger.info(f"Document {document_id} has no vectors in FAISS index")
+                    return 0
+                
+                FAISSService._snapshot = self._publish_delta(snapshot, {
+                    'removed_ids': np.array(removed_ids, dtype='int64')
+                })
+                logger.info(f"Removed {len(removed_ids)} vectors for document {document_id} from FAISS index")
+                
+                if self._tombstone_ratio(FAISSService._snapshot) > settings.FAISS_COMPACTION_RATIO:
+                    self.compact_index()
+                else:
+                    if self._too_many_deltas(FAISSService._snapshot):
+                        FAISSService._snapshot = self._merge_deltas(FAISSService._snapshot)
+                    self._update_index_record(FAISSService._snapshot)
+                
+                return len(removed_ids)
+        
+        except Exception as e:
+            logger.error(f"Error removing document {document_id} from FAISS index: {str(e)}")
+            raise
+    
+    def compact_index(self) -> bool:
+        """
+        Drop tombstoned vectors and fold the delta index in by rebuilding the index.
+        
+        The rebuild reads vectors from the embedding store, so no chunk is
+        re-encoded, and IVF indexes are retrained on the live corpus.
+        
+        Returns:
+            bool: True if the index was compacted
+        """
+        try:
+            with self.writing():
+                snapshot = self._get_write_snapshot()
+                
+                if snapshot is None or not (snapshot.tombstones or snapshot.delta_indexes):
+                    return False
+                
+                logger.info(f"Compacting FAISS index, dropping {len(snapshot.tombstones)} tombstoned vectors...")
+                
+                # In-place removal is not an option: HNSW does not support it and IVF
+                # lists inside an ID map keep stale positions, so rebuild instead.
+                # Tombstoned chunks may still be in the database (remove_document
+                # runs before the delete), so they are excluded explicitly.
+                tombstoned_rows = snapshot.id_map.lookup(sorted(snapshot.tombstones))
+                self.build_index(exclude_chunk_ids=[row['chunk_id'] for row in tombstoned_rows if row])
+                
+                logger.info(f"FAISS index compacted, {FAISSService._snapshot.index.ntotal} vectors remain")
+                return True
+        
+        except Exception as e:
+            logger.error(f"Error compacting FAISS index: {str(e)}")
+            raise
+    
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        document_ids: Optional[List[str]] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        rerank: Optional[bool] = None
+    ) -> List[Dict]:
         """
         Search for similar chunks using FAISS.
         
@@ -159,152 +571,1219 @@ class FAISSService:
             query: Search query text
             top_k: Number of results to return
             document_ids: Optional list of document IDs to filter results
-            
+            nprobe: Optional number of IVF lists to visit (IVF indexes only)
+            ef_search: Optional HNSW search depth (HNSW indexes only)
+            rerank: Re-rank candidates with full-precision vectors (compressed
+                indexes only). Defaults to settings.FAISS_RERANK.
+        
         Returns:
             List of dictionaries with chunk info and similarity scores
         """
         try:
-            # Load index if not already loaded
-            if FAISSService._index is None or FAISSService._chunk_id_map is None:
-                logger.info("Loading FAISS index from disk...")
-                self.load_index()
+            logger.info(f"Document filter: {document_ids} (type: {type(document_ids)})")
+            results = self.search_batch(
+                [query],
+                top_k=top_k,
+                filters=[document_ids],
+                nprobe=nprobe,
+                ef_search=ef_search,
+                rerank=rerank
+            )[0]
+            
+            logger.info(f"Found {len(results)} results for query")
+            return results
+        
+        except Exception as e:
+            logger.error(f"Error searching FAISS index: {str(e)}")
+            raise
+    
+    def search_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        filters: Optional[List[Optional[List[str]]]] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        rerank: Optional[bool] = None
+    ) -> List[List[Dict]]:
+        """
+        Search for similar chunks for many queries at once.
+        
+        All queries are embedded in one forward pass, and queries sharing a
+        document filter are searched with a single FAISS call on the stacked
+        query matrix. Chunk texts for the union of hits are fetched in one query.
+        Results are cached per snapshot version, so repeated searches skip all
+        of this until the index changes.
+        
+        Args:
+            queries: Search query texts
+            top_k: Number of results to return per query
+            filters: Optional list with one document ID list (or None) per query
+            nprobe: Optional number of IVF lists to visit (IVF indexes only)
+            ef_search: Optional HNSW search depth (HNSW indexes only)
+            rerank: Re-rank candidates with full-precision vectors (compressed
+                indexes only). Defaults to settings.FAISS_RERANK.
+        
+        Returns:
+            List of result lists, in query order
+        """
+        try:
+            if filters is not None and len(filters) != len(queries):
+                raise ValueError(f"Got {len(filters)} filters for {len(queries)} queries")
+            
+            # Use one snapshot for the whole search, loading it if needed
+            snapshot = self._get_snapshot()
             
-            if FAISSService._index is None:
+            if snapshot is None or snapshot.total_vectors() == 0:
                 logger.warning("No FAISS index available")
-                return []
+                return [[] for _ in queries]
             
-            if FAISSService._chunk_id_map is None or len(FAISSService._chunk_id_map) == 0:
+            if len(snapshot.id_map) == 0:
                 logger.warning("Chunk ID mapping is empty")
+                return [[] for _ in queries]
+            
+            if not queries:
                 return []
             
-            logger.info(f"FAISS index has {FAISSService._index.ntotal} vectors, mapping has {len(FAISSService._chunk_id_map)} entries")
-            logger.info(f"Document filter: {document_ids} (type: {type(document_ids)})")
+            logger.info(
+                f"FAISS index v{snapshot.version:06d} has {snapshot.total_vectors()} vectors, "
+                f"mapping has {len(snapshot.id_map)} entries"
+            )
             
-            # Generate query embedding
-            query_embedding = self.generate_embedding(query)
-            query_embedding = np.array([query_embedding])
+            rerank = settings.FAISS_RERANK if rerank is None else rerank
+            filter_keys = [
+                tuple(sorted({str(document_id) for document_id in document_ids})) if document_ids else ()
+                for document_ids in (filters or [None] * len(queries))
+            ]
             
-            # Search FAISS index
-            distances, indices = FAISSService._index.search(query_embedding, min(top_k * 3, FAISSService._index.ntotal))
+            # Serve repeated searches against this snapshot from the result cache
+            result_cache = self._get_result_cache()
+            cache_keys = [
+                (snapshot.version, normalize_query(query), filter_key, top_k, nprobe, ef_search, rerank)
+                for query, filter_key in zip(queries, filter_keys)
+            ]
+            results = [result_cache.get(cache_key) for cache_key in cache_keys]
             
-            logger.info(f"FAISS search returned {len(indices[0])} results, distances: {distances[0][:5]}")
-            logger.info(f"FAISS indices: {indices[0][:5]}")
-            logger.info(f"Sample chunk_id_map entries: {list(FAISSService._chunk_id_map.items())[:3]}")
+            misses = [row for row, cached in enumerate(results) if cached is None]
+            if misses:
+                found = self._search_snapshot(
+                    snapshot,
+                    [queries[row] for row in misses],
+                    [filter_keys[row] for row in misses],
+                    top_k,
+                    nprobe,
+                    ef_search,
+                    rerank
+                )
+                for row, query_results in zip(misses, found):
+                    results[row] = query_results
+                    result_cache.set(cache_keys[row], query_results)
             
-            # Convert results to chunk info
-            results = []
-            for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-                if idx == -1:  # FAISS returns -1 for empty results
-                    continue
+            # Cached hit lists are shared, so hand out copies
+            return [[dict(hit) for hit in query_results] for query_results in results]
+        
+        except Exception as e:
+            logger.error(f"Error batch searching FAISS index: {str(e)}")
+            raise
+    
+    def _search_snapshot(
+        self,
+        snapshot: IndexSnapshot,
+        queries: List[str],
+        filter_keys: List[Tuple[str, ...]],
+        top_k: int,
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+        rerank: bool
+    ) -> List[List[Dict]]:
+        """Embed and search queries against a snapshot, resolving hits to result dicts."""
+        # Generate query embeddings, reusing cached ones for repeated queries
+        query_embeddings = self.get_query_embeddings(queries)
+        
+        # Group queries by document filter so each group is one FAISS call
+        groups = {}
+        for row, filter_key in enumerate(filter_keys):
+            groups.setdefault(filter_key, []).append(row)
+        
+        k = min(top_k, snapshot.total_vectors())
+        distances = np.full((len(queries), k), np.inf, dtype='float32')
+        indices = np.full((len(queries), k), -1, dtype='int64')
+        
+        for document_ids, rows in groups.items():
+            # Search FAISS index, skipping deleted vectors and vectors outside the document filter
+            distances[rows], indices[rows] = self._search_index(
+                snapshot,
+                query_embeddings[rows],
+                k,
+                document_ids=list(document_ids),
+                nprobe=nprobe,
+                ef_search=ef_search,
+                rerank=rerank
+            )
+        
+        logger.info(f"FAISS search returned {indices.shape[1]} results for {len(queries)} queries")
+        
+        # Resolve metadata from the in-memory table and texts in one query
+        rows = snapshot.id_map.lookup(indices.ravel())
+        chunks = Chunk.objects.only('id', 'chunk_text').in_bulk({row['chunk_id'] for row in rows if row})
+        
+        results = [[] for _ in queries]
+        for position, (distance, row) in enumerate(zip(distances.ravel(), rows)):
+            if row is None:  # FAISS returns -1 for empty results
+                continue
+            
+            chunk = chunks.get(uuid.UUID(row['chunk_id']))
+            if chunk is None:
+                logger.warning(f"Chunk {row['chunk_id']} not found in database")
+                continue
+            
+            # Calculate similarity score (convert L2 distance to similarity)
+            similarity = 1 / (1 + float(distance))
+            
+            results[position // k].append({
+                'chunk_id': row['chunk_id'],
+                'document_id': row['document_id'],
+                'document_name': row['document_name'],
+                'text': chunk.chunk_text,
+                'page_number': row['page_number'],
+                'similarity_score': similarity,
+                'distance': float(distance)
+            })
+        
+        return results
+    
+    def load_index(self):
+        """
+        Load the current snapshot version from disk.
+        
+        With settings.FAISS_MMAP, IVF indexes and the chunk mapping are
+        memory-mapped read-only, so processes on one host share a single
+        page-cache copy. Delta segments listed in the manifest are replayed
+        into a small in-memory delta index searched alongside it.
+        """
+        try:
+            store = self._get_store()
+            version = store.current_version()
+            
+            if version is None:
+                if self._get_legacy_index_path().exists():
+                    # Converting writes an index, which the read path never does
+                    logger.warning(
+                        f"Found FAISS index files saved before versioned snapshots in {store.root}; "
+                        f"run 'python manage.py convert_legacy_index' to convert them"
+                    )
+                else:
+                    logger.warning(f"No FAISS index snapshot found in {store.root}")
+                return False
+            
+            FAISSService._snapshot = self._read_snapshot(version, base=FAISSService._snapshot)
+            
+            logger.info(
+                f"FAISS index snapshot v{version:06d} loaded from {store.path(version)} "
+                f"(memory-mapped: {FAISSService._snapshot.memory_mapped})"
+            )
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error loading FAISS index: {str(e)}")
+            return False
+    
+    def convert_legacy_index(self, index_type: Optional[str] = None) -> int:
+        """
+        Convert index files saved before versioned snapshots to snapshot version 1.
+        
+        The vectors are read back from the old flat index and paired with
+        chunks through the pickled position-to-chunk map, so nothing is
+        re-embedded. Mapped chunks that were deleted since are dropped.
+        
+        Args:
+            index_type: Optional index type of the new index, as for build_index()
+        
+        Returns:
+            Number of vectors converted
+        """
+        import faiss
+        
+        try:
+            with self.writing():
+                store = self._get_store()
+                if store.current_version() is not None:
+                    raise ValueError(f"{store.root} already holds a versioned index snapshot")
+                if not self._get_legacy_index_path().exists():
+                    raise FileNotFoundError(f"No legacy FAISS index at {self._get_legacy_index_path()}")
                 
-                logger.debug(f"Looking for index {idx} (type: {type(idx)}) in mapping")
+                legacy_index = faiss.read_index(str(self._get_legacy_index_path()))
+                with open(store.root / 'chunk_mapping.pkl', 'rb') as f:
+                    chunk_id_map = pickle.load(f)
                 
-                # Get chunk ID from mapping
-                chunk_id = FAISSService._chunk_id_map.get(int(idx))
-                if not chunk_id:
-                    logger.warning(f"No chunk ID found for FAISS index {idx}. Mapping keys type: {type(list(FAISSService._chunk_id_map.keys())[0]) if FAISSService._chunk_id_map else 'empty'}")
-                    continue
+                vectors = legacy_index.reconstruct_n(0, legacy_index.ntotal)
+                positions = {str(chunk_id): position for position, chunk_id in chunk_id_map.items()}
                 
-                logger.info(f"Found chunk_id {chunk_id} for index {idx}")
-                
-                # Get chunk from database
-                try:
-                    chunk = Chunk.objects.select_related('document').get(id=chunk_id)
-                    
-                    # Filter by document if specified (only if document_ids is not None and not empty)
-                    if document_ids is not None and len(document_ids) > 0:
-                        # Convert both to strings for comparison
-                        chunk_doc_id = str(chunk.document_id)
-                        filter_ids = [str(doc_id) for doc_id in document_ids]
-                        
-                        if chunk_doc_id not in filter_ids:
-                            logger.info(f"Filtered out chunk from document {chunk_doc_id} (not in {filter_ids})")
-                            continue
-                    
-                    # Calculate similarity score (convert L2 distance to similarity)
-                    similarity = 1 / (1 + float(distance))
-                    
-                    results.append({
-                        'chunk_id': str(chunk.id),
-                        'document_id': str(chunk.document_id),
-                        'document_name': chunk.document.original_filename,
-                        'text': chunk.chunk_text,
-                        'page_number': chunk.page_number,
-                        'similarity_score': similarity,
-                        'distance': float(distance)
-                    })
-                    
-                    # Stop if we have enough results
-                    if len(results) >= top_k:
-                        break
-                        
-                except Chunk.DoesNotExist:
-                    logger.warning(f"Chunk {chunk_id} not found in database")
-                    continue
-            
-            logger.info(f"Found {len(results)} results for query")
-            return results
-            
+                # Group chunks by document so each document gets a contiguous range of vector IDs
+                chunks = list(
+                    Chunk.objects.filter(id__in=list(positions))
+                    .select_related('document')
+                    .order_by('document_id', 'chunk_index')
+                )
+                if not chunks:
+                    raise ValueError("None of the chunks in the legacy index exist any more")
+                if len(chunks) < len(positions):
+                    logger.warning(f"Dropping {len(positions) - len(chunks)} vectors of deleted chunks")
+                
+                vector_ids = self._assign_vector_ids(chunks, None)
+                order = np.argsort(vector_ids, kind='stable')
+                chunks = [chunks[i] for i in order]
+                embeddings = np.ascontiguousarray(
+                    vectors[[positions[str(chunk.id)] for chunk in chunks]], dtype='float32'
+                )
+                
+                self._publish_index(chunks, vector_ids[order], embeddings, index_type)
+                self._remove_legacy_files()
+                
+                logger.info(
+                    f"Converted legacy FAISS index with {len(chunks)} vectors to snapshot "
+                    f"v{FAISSService._snapshot.version:06d}"
+                )
+                return len(chunks)
+        
         except Exception as e:
-            logger.error(f"Error searching FAISS index: {str(e)}")
+            logger.error(f"Error converting legacy FAISS index: {str(e)}")
             raise
     
-    def save_index(self):
-        """Save FAISS index and chunk mapping to disk."""
+    def warm_up(self) -> bool:
+        """
+        Load the embedding model and index and run a dummy encode and search.
+        
+        This moves model load, index load and first-inference costs to
+        process start instead of the first request.
+        
+        Returns:
+            bool: True if the service is warm
+        """
+        FAISSService._warmup_state = 'running'
+        FAISSService._warmup_error = None
+        
         try:
-            index_path = self._get_index_path()
-            index_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Save FAISS index
-            faiss.write_index(FAISSService._index, str(index_path))
+            logger.info("Warming up FAISS service...")
+            start = time.monotonic()
             
-            # Save chunk ID mapping
-            mapping_path = index_path.parent / 'chunk_mapping.pkl'
-            with open(mapping_path, 'wb') as f:
-                pickle.dump(FAISSService._chunk_id_map, f)
+            query_embeddings = self.encode_queries(['warm up'])
             
-            logger.info(f"FAISS index saved to {index_path}")
+            # Search directly so the dummy query stays out of the caches and their stats
+            snapshot = self._get_snapshot()
+            if snapshot is not None and snapshot.total_vectors():
+                self._search_index(snapshot, query_embeddings, 1, rerank=settings.FAISS_RERANK)
             
+            FAISSService._warmup_state = 'done'
+            logger.info(f"FAISS service warmed up in {time.monotonic() - start:.1f}s")
+            return True
+        
         except Exception as e:
-            logger.error(f"Error saving FAISS index: {str(e)}")
-            raise
+            FAISSService._warmup_state = 'failed'
+            FAISSService._warmup_error = str(e)
+            logger.error(f"Error warming up FAISS service: {str(e)}")
+            return False
     
-    def load_index(self):
-        """Load FAISS index and chunk mapping from disk."""
+    def warm_up_enabled(self) -> bool:
+        """
+        Whether server processes should warm up at start (settings.FAISS_WARMUP).
+        
+        Not when searches go to a retrieval server, which warms up itself.
+        """
+        return settings.FAISS_WARMUP and not settings.RETRIEVAL_SERVER_SOCKET
+    
+    def start_warm_up(self):
+        """Run warm_up(), in a background thread if settings.FAISS_WARMUP_BACKGROUND."""
+        if settings.FAISS_WARMUP_BACKGROUND:
+            threading.Thread(target=self.warm_up, name='faiss-warmup', daemon=True).start()
+        else:
+            self.warm_up()
+    
+    def preload(self):
+        """
+        Load the embedding model and current index snapshot without running inference.
+        
+        Called in a pre-fork server's master process, so workers share the
+        model weights and index pages copy-on-write. Inference is left to the
+        workers, since thread pools started before fork are not usable in
+        the children.
+        """
+        if settings.RETRIEVAL_SERVER_SOCKET:
+            # Workers search through the retrieval server and load only as a fallback
+            return
+        
+        logger.info("Preloading embedding model and FAISS index before fork...")
+        if FAISSService._model is None:
+            self.load_embedding_model()
+        if FAISSService._snapshot is None:
+            self.load_index()
+    
+    def reset_after_fork(self):
+        """
+        Re-create per-process state in a worker forked from a preloaded master.
+        
+        Locks and the reload thread are not inherited safely across fork,
+        the embedding backend re-creates its thread pools, sized per worker
+        like FAISS's by settings.FAISS_WORKER_THREADS.
+        """
+        FAISSService._write_lock = threading.RLock()
+        FAISSService._writer_lock = None
+        FAISSService._reload_lock = threading.Lock()
+        FAISSService._reload_thread = None
+        FAISSService._last_version_check = 0.0
+        FAISSService._query_cache = None
+        FAISSService._result_cache = None
+        FAISSService._embedding_batcher = None
+        
+        if FAISSService._model is not None:
+            FAISSService._model.after_fork(settings.FAISS_WORKER_THREADS)
+        
+        if settings.FAISS_WORKER_THREADS:
+            import faiss
+            faiss.omp_set_num_threads(settings.FAISS_WORKER_THREADS)
+    
+    def get_readiness(self) -> Dict:
+        """
+        Report whether this process is ready to serve searches.
+        
+        With warm-up enabled, the process is ready once warm-up finished;
+        otherwise it is always ready and loads on first use.
+        """
+        snapshot = FAISSService._snapshot
+        
+        if self.warm_up_enabled():
+            ready = FAISSService._warmup_state == 'done'
+            warmup = FAISSService._warmup_state
+        else:
+            ready = True
+            warmup = 'disabled'
+        
+        return {
+            'ready': ready,
+            'warmup': warmup,
+            'error': FAISSService._warmup_error,
+            'model_loaded': FAISSService._model is not None,
+            'index_loaded': snapshot is not None,
+            'index_version': snapshot.version if snapshot is not None else None
+        }
+    
+    def _content_hash(self, text: str, model_name: str) -> str:
+        """Get the embedding store key for a text encoded by a model."""
+        return hashlib.sha256(f"{model_name}\0{text}".encode('utf-8')).hexdigest()
+    
+    def _get_index_type(self) -> str:
+        """Get the configured index type (FAISSIndex record overrides settings)."""
+        index_record = FAISSIndex.objects.filter(index_name='default').first()
+        if index_record and index_record.index_type:
+            return index_record.index_type
+        return settings.FAISS_INDEX_TYPE
+    
+    def _create_index(self, dimension: int, index_type: str = 'flat', training_vectors: Optional[np.ndarray] = None):
+        """
+        Create an empty ID-mapped FAISS index of the given type.
+        
+        Quantized and IVF variants are trained on a random sample of
+        training_vectors. Corpora too small to train the requested layout
+        fall back to a flat index.
+        
+        Args:
+            dimension: Embedding dimension
+            index_type: One of flat, sq8, sq_fp16, pq, ivf_flat, ivf_pq, hnsw
+            training_vectors: Vectors to sample from when training
+        
+        Returns:
+            Empty faiss.IndexIDMap wrapping the requested index
+        """
+        import faiss
+        
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type '{index_type}'. Choose one of: {', '.join(INDEX_TYPES)}")
+        
+        n_train = 0 if training_vectors is None else len(training_vectors)
+        pq = f"PQ{settings.FAISS_PQ_M}x{settings.FAISS_PQ_NBITS}"
+        
+        if index_type in ('ivf_flat', 'ivf_pq'):
+            # Auto-size nlist to ~4*sqrt(n), keeping the 39 points per centroid FAISS needs
+            nlist = settings.FAISS_IVF_NLIST or int(4 * np.sqrt(max(n_train, 1)))
+            nlist = min(nlist, n_train // 39)
+            if nlist < 1:
+                index_type = self._fallback_index_type(index_type, n_train)
+        
+        if index_type in ('pq', 'ivf_pq') and n_train < 2 ** settings.FAISS_PQ_NBITS:
+            index_type = self._fallback_index_type(index_type, n_train)
+        
+        if index_type == 'sq8' and n_train == 0:
+            index_type = self._fallback_index_type(index_type, n_train)
+        
+        if index_type == 'ivf_flat':
+            description = f"IVF{nlist},Flat"
+        elif index_type == 'ivf_pq':
+            description = f"IVF{nlist},{pq}"
+        elif index_type == 'hnsw':
+            description = f"HNSW{settings.FAISS_HNSW_M}"
+        elif index_type == 'pq':
+            # IndexPQ rejects search-time ID selectors, so flat PQ codes are kept
+            # in a single IVF list, which is scanned in full and accepts them
+            description = f"IVF1,{pq}"
+        else:
+            description = {'flat': "Flat", 'sq8': "SQ8", 'sq_fp16': "SQfp16"}[index_type]
+        inner = faiss.index_factory(dimension, description)
+        
+        if index_type == 'hnsw':
+            inner.hnsw.efConstruction = settings.FAISS_HNSW_EF_CONSTRUCTION
+            inner.hnsw.efSearch = settings.FAISS_EF_SEARCH
+        
+        if not inner.is_trained:
+            sample_size = min(n_train, settings.FAISS_TRAIN_SAMPLE_SIZE)
+            sample = training_vectors[np.random.choice(n_train, sample_size, replace=False)]
+            logger.info(f"Training {description} index on {sample_size} vectors...")
+            inner.train(sample)
+        
+        if index_type in ('ivf_flat', 'ivf_pq'):
+            faiss.downcast_index(inner).nprobe = min(settings.FAISS_NPROBE, nlist)
+        
+        logger.info(f"Created FAISS index {description} ({index_type})")
+        return faiss.IndexIDMap(inner)
+    
+    def _fallback_index_type(self, index_type: str, n_train: int) -> str:
+        """Log and return the index type used when a corpus is too small to train."""
+        logger.warning(f"Only {n_train} vectors available, too few to train {index_type}. Using a flat index.")
+        return 'flat'
+    
+    def _get_snapshot(self) -> Optional[IndexSnapshot]:
+        """
+        Get the current snapshot, loading it from disk on first use.
+        
+        Versions published by other processes are picked up by a background
+        reload; until it finishes, the snapshot already in memory is served.
+        """
+        snapshot = FAISSService._snapshot
+        if snapshot is None:
+            logger.info("Loading FAISS index from disk...")
+            self.load_index()
+            return FAISSService._snapshot
+        
+        self._check_for_new_version(snapshot)
+        return snapshot
+    
+    def _check_for_new_version(self, snapshot: IndexSnapshot):
+        """Start a background reload if the CURRENT pointer moved past snapshot (at most once per interval)."""
+        now = time.monotonic()
+        if now - FAISSService._last_version_check < settings.FAISS_VERSION_CHECK_INTERVAL:
+            return
+        FAISSService._last_version_check = now
+        
+        version = self._get_store().current_version()
+        if version is None or version <= snapshot.version:
+            return
+        
+        with FAISSService._reload_lock:
+            if FAISSService._reload_thread is not None and FAISSService._reload_thread.is_alive():
+                return
+            FAISSService._reload_thread = threading.Thread(
+                target=self._reload_snapshot,
+                args=(version,),
+                name='faiss-snapshot-reload',
+                daemon=True
+            )
+            FAISSService._reload_thread.start()
+    
+    def _reload_snapshot(self, version: int):
+        """Load a snapshot version and swap it in, unless a newer one is already being served."""
         try:
-            index_path = self._get_index_path()
+            logger.info(f"Reloading FAISS index snapshot v{version:06d} published by another process")
+            snapshot = self._read_snapshot(version, base=FAISSService._snapshot)
             
-            if not index_path.exists():
-                logger.warning(f"FAISS index file not found at {index_path}")
-                return False
+            with FAISSService._write_lock:
+                current = FAISSService._snapshot
+                if current is None or snapshot.version > current.version:
+                    FAISSService._snapshot = snapshot
+                    logger.info(f"FAISS index snapshot v{version:06d} swapped in")
+        except Exception as e:
+            # The next version check retries, e.g. if the version was pruned meanwhile
+            logger.error(f"Error reloading FAISS index snapshot v{version:06d}: {str(e)}")
+    
+    def _get_write_snapshot(self) -> Optional[IndexSnapshot]:
+        """Get the snapshot a writer builds on: the latest published version (call within writing())."""
+        snapshot = FAISSService._snapshot
+        current_version = self._get_store().current_version()
+        if snapshot is None or (current_version is not None and current_version != snapshot.version):
+            self.load_index()
+        return FAISSService._snapshot
+    
+    def _make_snapshot(
+        self,
+        version: int,
+        index,
+        id_map: VectorIdMap,
+        delta_indexes: tuple = (),
+        tombstones: frozenset = frozenset(),
+        full_vectors=None,
+        memory_mapped: bool = False,
+        deltas: tuple = (),
+        base_id: Optional[str] = None,
+        base_id_map: Optional[VectorIdMap] = None,
+        previous: Optional[IndexSnapshot] = None
+    ) -> IndexSnapshot:
+        """
+        Create a snapshot, building the selectors search uses to skip tombstoned vectors.
+        
+        Selectors of previous, a snapshot sharing index and possibly delta
+        indexes, are reused when its tombstones are the same.
+        """
+        reuse = previous is not None and previous.tombstones == tombstones
+        if reuse and previous.index is index:
+            tombstone_selector = previous.tombstone_selector
+        else:
+            tombstone_selector = self._make_tombstone_selector(index, tombstones)
+        
+        previous_selectors = {}
+        if reuse:
+            previous_selectors = dict(zip(map(id, previous.delta_indexes), previous.delta_tombstone_selectors))
+        delta_tombstone_selectors = tuple(
+            previous_selectors[id(delta_index)] if id(delta_index) in previous_selectors
+            else self._make_tombstone_selector(delta_index, tombstones)
+            for delta_index in delta_indexes
+        )
+        
+        return IndexSnapshot(
+            version,
+            index,
+            id_map,
+            delta_indexes=delta_indexes,
+            tombstones=tombstones,
+            tombstone_selector=tombstone_selector,
+            delta_tombstone_selectors=delta_tombstone_selectors,
+            full_vectors=full_vectors,
+            memory_mapped=memory_mapped,
+            deltas=deltas,
+            base_id=base_id,
+            base_id_map=base_id_map
+        )
+    
+    def _publish_index(
+        self,
+        chunks: List[Chunk],
+        vector_ids: np.ndarray,
+        embeddings: np.ndarray,
+        index_type: Optional[str] = None
+    ):
+        """Build an index of chunks' embeddings (sorted by vector ID), publish it as a full snapshot and swap it in."""
+        # Create ID-mapped FAISS index so vectors can be appended later
+        dimension = embeddings.shape[1]  # Should be 384
+        index = self._create_index(dimension, index_type or self._get_index_type(), embeddings)
+        
+        # Add embeddings to index
+        index.add_with_ids(embeddings, vector_ids)
+        
+        # Create mapping from FAISS vector ID to Chunk database ID
+        id_map = VectorIdMap()
+        id_map.add(
+            vector_ids,
+            [str(chunk.id) for chunk in chunks],
+            [str(chunk.document_id) for chunk in chunks],
+            [chunk.page_number for chunk in chunks],
+            {str(chunk.document_id): chunk.document.original_filename for chunk in chunks}
+        )
+        
+        # Publish a full snapshot to disk, then swap it in for readers
+        full_vectors = embeddings if self._is_compressed(index) else None
+        version, base_id = self._write_snapshot(index, id_map, full_vectors)
+        if full_vectors is not None:
+            # Full-precision vectors stay on disk and are paged in on demand
+            full_vectors = np.load(
+                self._get_store().path(version) / SnapshotStore.FULL_VECTORS_FILE, mmap_mode='r'
+            )
+        FAISSService._snapshot = self._make_snapshot(
+            version, index, id_map, full_vectors=full_vectors, base_id=base_id
+        )
+        
+        # Update FAISSIndex model
+        self._update_index_record(FAISSService._snapshot)
+    
+    def _read_snapshot(self, version: int, base: Optional[IndexSnapshot] = None) -> IndexSnapshot:
+        """
+        Load a published snapshot version and replay its delta segments.
+        
+        If the version is a later version of base's full index build (see
+        _extends()), base's index and mapping are reused, so a document
+        added by another process does not re-read the whole index: only
+        the new segments are applied or, if the segments were merged, the
+        merged segment is applied to base's index alone. After a compaction
+        or rebuild the version is read in full.
+        """
+        import faiss
+        
+        store = self._get_store()
+        directory = store.path(version)
+        manifest = store.read_manifest(version)
+        
+        if base is not None and self._extends(manifest, base):
+            if manifest['deltas'][:len(base.deltas)] != list(base.deltas):
+                base = self._without_deltas(base)
+            delta_names = manifest['deltas'][len(base.deltas):]
+            snapshot = self._apply_deltas(base, version, delta_names, self._read_deltas(directory, delta_names))
+            logger.info(f"Applied {len(delta_names)} new FAISS delta segments to snapshot v{base.version:06d}")
+            return snapshot
+        
+        # Load FAISS index (FAISS only memory-maps IVF inverted lists; other formats are read in full)
+        io_flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if settings.FAISS_MMAP else 0
+        index = faiss.read_index(str(directory / SnapshotStore.INDEX_FILE), io_flags)
+        memory_mapped = bool(io_flags) and isinstance(faiss.downcast_index(index.index), faiss.IndexIVF)
+        
+        id_map = VectorIdMap.load(directory, mmap=settings.FAISS_MMAP)
+        
+        # Full-precision vectors stay on disk and are paged in on demand
+        vectors_path = directory / SnapshotStore.FULL_VECTORS_FILE
+        full_vectors = np.load(vectors_path, mmap_mode='r') if vectors_path.exists() else None
+        
+        snapshot = self._make_snapshot(
+            version, index, id_map, full_vectors=full_vectors, memory_mapped=memory_mapped,
+            base_id=manifest.get('base_id')
+        )
+        
+        deltas = self._read_deltas(directory, manifest['deltas'])
+        if deltas:
+            snapshot = self._apply_deltas(snapshot, version, manifest['deltas'], deltas)
+            logger.info(f"Applied {len(deltas)} FAISS delta segments")
+        
+        return snapshot
+    
+    @staticmethod
+    def _extends(manifest: Dict, base: IndexSnapshot) -> bool:
+        """Whether a version's manifest is a later version of base's full index build."""
+        return (
+            base.base_id is not None
+            and manifest.get('base_id') == base.base_id
+            and manifest['version'] > base.version
+        )
+    
+    @staticmethod
+    def _read_deltas(directory: Path, delta_names: List[str]) -> List[Dict[str, np.ndarray]]:
+        """Read delta segment files of a version."""
+        deltas = []
+        for delta_name in delta_names:
+            with np.load(directory / delta_name) as delta:
+                deltas.append({key: delta[key] for key in delta.files})
+        return deltas
+    
+    def _write_snapshot(self, index, id_map: VectorIdMap, full_vectors: Optional[np.ndarray]) -> Tuple[int, str]:
+        """
+        Publish a full snapshot of an index and its mapping.
+        
+        The manifest gets a new base_id, which versions publishing delta
+        segments on top of it carry over.
+        
+        Returns:
+            Tuple of (new version, base_id)
+        """
+        import faiss
+        
+        def write_files(directory: Path):
+            faiss.write_index(index, str(directory / SnapshotStore.INDEX_FILE))
+            id_map.save(directory)
+            if full_vectors is not None:
+                save_array(directory / SnapshotStore.FULL_VECTORS_FILE, full_vectors)
+        
+        base_id = uuid.uuid4().hex
+        version = self._get_store().publish(write_files, {
+            'base_id': base_id,
+            'index_type': type(faiss.downcast_index(index.index)).__name__,
+            'dimension': index.d,
+            'total_vectors': index.ntotal,
+            'deltas': []
+        })
+        return version, base_id
+    
+    def _publish_delta(self, snapshot: IndexSnapshot, delta: Dict[str, np.ndarray]) -> IndexSnapshot:
+        """
+        Publish an index change (appended vectors or removed IDs) as a delta
+        segment in a new version, and return the snapshot with it applied.
+        """
+        delta_name = self._next_delta_name(snapshot)
+        
+        def write_files(directory: Path):
+            np.savez(directory / delta_name, **delta)
+        
+        store = self._get_store()
+        manifest = store.read_manifest(snapshot.version)
+        manifest['deltas'] = list(snapshot.deltas) + [delta_name]
+        version = store.publish(write_files, manifest, link_from=snapshot.version)
+        
+        new_snapshot = self._apply_deltas(snapshot, version, [delta_name], [delta])
+        return new_snapshot
+    
+    def _apply_deltas(
+        self,
+        snapshot: IndexSnapshot,
+        version: int,
+        delta_names: List[str],
+        deltas: List[Dict[str, np.ndarray]]
+    ) -> IndexSnapshot:
+        """
+        Return a new snapshot with delta segments applied on top of snapshot, which is left unchanged.
+        
+        Each segment's appended vectors get a delta index of their own, so
+        the new snapshot shares snapshot's delta indexes instead of copying them.
+        """
+        import faiss
+        
+        id_map = snapshot.id_map.copy()
+        delta_indexes = list(snapshot.delta_indexes)
+        tombstones = set(snapshot.tombstones)
+        
+        for delta in deltas:
+            if 'vector_ids' in delta:
+                # Appended vectors are searched exactly in the delta indexes until the next compaction
+                delta_index = faiss.IndexIDMap(faiss.IndexFlatL2(snapshot.index.d))
+                delta_index.add_with_ids(delta['embeddings'], delta['vector_ids'])
+                delta_indexes.append(delta_index)
+                document_ids = [str(document_id) for document_id in delta['document_ids']]
+                id_map.add(
+                    delta['vector_ids'],
+                    [str(chunk_id) for chunk_id in delta['chunk_ids']],
+                    document_ids,
+                    delta['page_numbers'].tolist(),
+                    dict(zip(document_ids, (str(name) for name in delta['document_names'])))
+                )
             
-            # Load FAISS index
-            FAISSService._index = faiss.read_index(str(index_path))
+            if 'removed_ids' in delta:
+                tombstones.update(int(vector_id) for vector_id in delta['removed_ids'])
+        
+        return self._make_snapshot(
+            version,
+            snapshot.index,
+            id_map,
+            delta_indexes=tuple(delta_indexes),
+            tombstones=frozenset(tombstones),
+            full_vectors=snapshot.full_vectors,
+            memory_mapped=snapshot.memory_mapped,
+            deltas=snapshot.deltas + tuple(delta_names),
+            base_id=snapshot.base_id,
+            base_id_map=snapshot.base_id_map,
+            previous=snapshot
+        )
+    
+    def _merge_deltas(self, snapshot: IndexSnapshot) -> IndexSnapshot:
+        """
+        Publish a version whose delta segments are merged into one, and return it.
+        
+        The index is not rebuilt: the segments' files are concatenated, so
+        this costs as much as the delta, and other processes holding this
+        full index build reapply just the merged segment.
+        """
+        store = self._get_store()
+        segments = self._read_deltas(store.path(snapshot.version), list(snapshot.deltas))
+        merged = {}
+        for key in DELTA_SEGMENT_KEYS:
+            parts = [segment[key] for segment in segments if key in segment]
+            if parts:
+                merged[key] = np.concatenate(parts)
+        
+        delta_name = self._next_delta_name(snapshot)
+        
+        def write_files(directory: Path):
+            # Drop the merged segments' files linked from the previous version
+            for name in snapshot.deltas:
+                (directory / name).unlink()
+            np.savez(directory / delta_name, **merged)
+        
+        manifest = store.read_manifest(snapshot.version)
+        manifest['deltas'] = [delta_name]
+        version = store.publish(write_files, manifest, link_from=snapshot.version)
+        logger.info(f"Merged {len(snapshot.deltas)} FAISS delta segments into {delta_name}")
+        
+        return self._apply_deltas(self._without_deltas(snapshot), version, [delta_name], [merged])
+    
+    def _without_deltas(self, snapshot: IndexSnapshot) -> IndexSnapshot:
+        """
+        Get snapshot's full index build without its delta segments.
+        
+        Tombstones are kept: a later version of the same build has them
+        all, so they are still valid and their selector can be reused.
+        """
+        return self._make_snapshot(
+            snapshot.version,
+            snapshot.index,
+            snapshot.base_id_map,
+            tombstones=snapshot.tombstones,
+            full_vectors=snapshot.full_vectors,
+            memory_mapped=snapshot.memory_mapped,
+            base_id=snapshot.base_id,
+            previous=snapshot
+        )
+    
+    @staticmethod
+    def _next_delta_name(snapshot: IndexSnapshot) -> str:
+        """Get an unused delta segment file name, numbered after the snapshot's last segment."""
+        number = max((int(name[len('delta_'):-len('.npz')]) for name in snapshot.deltas), default=0) + 1
+        return f'delta_{number:06d}.npz'
+    
+    def _next_vector_id(self, snapshot: Optional[IndexSnapshot], include_stored: bool = True) -> int:
+        """
+        Get the next unused FAISS vector ID.
+        
+        Tombstoned IDs stay mapped, so stay reserved. With include_stored,
+        IDs stored on chunks that are not in the index are reserved too.
+        """
+        max_vector_id = snapshot.id_map.max_vector_id() if snapshot is not None else None
+        if include_stored:
+            max_stored_id = Chunk.objects.aggregate(max_id=Max('embedding_vector_id'))['max_id']
+            if max_stored_id is not None and (max_vector_id is None or max_stored_id > max_vector_id):
+                max_vector_id = max_stored_id
+        return 0 if max_vector_id is None else max_vector_id + 1
+    
+    def _assign_vector_ids(self, chunks: List[Chunk], snapshot: Optional[IndexSnapshot], min_id: int = 0) -> np.ndarray:
+        """
+        Get each chunk's stable vector ID from Chunk.embedding_vector_id.
+        
+        Chunks without an ID, or with one below min_id, get new consecutive
+        IDs in the given order, and the IDs are saved to the database.
+        """
+        unassigned = [
+            chunk for chunk in chunks
+            if chunk.embedding_vector_id is None or chunk.embedding_vector_id < min_id
+        ]
+        
+        if unassigned:
+            start_id = self._next_vector_id(snapshot)
+            for offset, chunk in enumerate(unassigned):
+                chunk.embedding_vector_id = start_id + offset
+            Chunk.objects.bulk_update(unassigned, ['embedding_vector_id'], batch_size=EMBEDDING_LOOKUP_BATCH_SIZE)
+            logger.info(f"Assigned FAISS vector IDs {start_id}-{start_id + len(unassigned) - 1} to {len(unassigned)} chunks")
+        
+        return np.array([chunk.embedding_vector_id for chunk in chunks], dtype='int64')
+    
+    def _make_tombstone_selector(self, index, tombstones: frozenset):
+        """Build a selector excluding tombstoned vectors of an ID-mapped index, or None."""
+        import faiss
+        
+        if index is None or not tombstones or index.ntotal == 0:
+            return None
+        
+        # The ID map is searched through its inner index, which only knows
+        # insertion positions, so tombstones are translated to positions here
+        vector_ids = faiss.rev_swig_ptr(index.id_map.data(), index.ntotal)
+        positions = np.flatnonzero(np.isin(vector_ids, np.fromiter(tombstones, dtype='int64')))
+        if not len(positions):
+            return None
+        
+        batch = faiss.IDSelectorBatch(positions.astype('int64'))
+        selector = faiss.IDSelectorNot(batch)
+        selector.referenced_batch = batch  # keep the wrapped selector alive
+        return selector
+    
+    def _make_filter_selector(
+        self,
+        id_map: VectorIdMap,
+        index,
+        document_ids: List[str],
+        tombstone_selector,
+        tombstones: frozenset = frozenset()
+    ):
+        """
+        Build a selector limiting an ID-mapped index to the given documents' vectors.
+        
+        Returns the selector and the number of vectors it accepts, or
+        (None, 0) when none of the documents has vectors in this index.
+        """
+        import faiss
+        
+        if index.ntotal == 0:
+            return None, 0
+        
+        # Vector IDs are increasing in insertion order, so each document's ID
+        # range is a contiguous run of inner positions
+        vector_ids = faiss.rev_swig_ptr(index.id_map.data(), index.ntotal)
+        position_ranges = []
+        for start_id, end_id in id_map.document_ranges(document_ids):
+            start = int(np.searchsorted(vector_ids, start_id, side='left'))
+            end = int(np.searchsorted(vector_ids, end_id, side='right'))
+            if start < end:
+                position_ranges.append((start, end))
+        
+        if not position_ranges:
+            return None, 0
+        
+        if len(position_ranges) == 1:
+            selector = faiss.IDSelectorRange(*position_ranges[0])
+        else:
+            positions = np.concatenate([np.arange(start, end) for start, end in position_ranges])
+            selector = faiss.IDSelectorBatch(positions.astype('int64'))
+        
+        if tombstone_selector is not None:
+            filter_selector = selector
+            selector = faiss.IDSelectorAnd(filter_selector, tombstone_selector)
+            selector.referenced_selectors = (filter_selector, tombstone_selector)  # keep the wrapped selectors alive
+        
+        allowed = sum(end - start for start, end in position_ranges)
+        if tombstone_selector is not None:
+            tombstone_ids = np.fromiter(tombstones, dtype='int64')
+            allowed -= sum(int(np.isin(vector_ids[start:end], tombstone_ids).sum()) for start, end in position_ranges)
+        
+        return selector, allowed
+    
+    def _is_compressed(self, index) -> bool:
+        """Whether an index stores lossy vector codes rather than raw float32 vectors."""
+        import faiss
+        
+        inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+        return not isinstance(inner, (faiss.IndexFlat, faiss.IndexIVFFlat, faiss.IndexHNSWFlat))
+    
+    def _rerank(
+        self,
+        full_vectors: np.ndarray,
+        query_embeddings: np.ndarray,
+        positions: np.ndarray,
+        k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Re-score candidate positions with exact L2 distances and keep the best k."""
+        distances = np.full((len(positions), k), np.inf, dtype='float32')
+        reranked = np.full((len(positions), k), -1, dtype='int64')
+        
+        for row, (query, candidates) in enumerate(zip(query_embeddings, positions)):
+            candidates = candidates[candidates >= 0]
+            if not len(candidates):
+                continue
             
-            # Load chunk ID mapping
-            mapping_path = index_path.parent / 'chunk_mapping.pkl'
-            if mapping_path.exists():
-                with open(mapping_path, 'rb') as f:
-                    FAISSService._chunk_id_map = pickle.load(f)
+            candidates = np.sort(candidates)
+            vectors = np.asarray(full_vectors[candidates], dtype='float32')
+            exact = ((vectors - query) ** 2).sum(axis=1)
+            order = np.argsort(exact, kind='stable')[:k]
             
-            logger.info(f"FAISS index loaded from {index_path}")
-            return True
+            distances[row, :len(order)] = exact[order]
+            reranked[row, :len(order)] = candidates[order]
+        
+        return distances, reranked
+    
+    def _tombstone_ratio(self, snapshot: IndexSnapshot) -> float:
+        """Fraction of vectors in the index that are tombstoned."""
+        if snapshot.total_vectors() == 0:
+            return 0.0
+        return len(snapshot.tombstones) / snapshot.total_vectors()
+    
+    def _delta_ratio(self, snapshot: IndexSnapshot) -> float:
+        """Fraction of vectors in the index that sit in the delta indexes."""
+        if snapshot.total_vectors() == 0:
+            return 0.0
+        return snapshot.delta_vectors() / snapshot.total_vectors()
+    
+    def _too_many_deltas(self, snapshot: IndexSnapshot) -> bool:
+        """Whether the snapshot has more delta segments (and delta indexes to search) than allowed."""
+        return len(snapshot.deltas) > settings.FAISS_MAX_DELTA_SEGMENTS
+    
+    def _search_index(
+        self,
+        snapshot: IndexSnapshot,
+        query_embeddings: np.ndarray,
+        k: int,
+        document_ids: Optional[List[str]] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        rerank: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search a snapshot's index and delta indexes, merging results by distance.
+        
+        With document_ids, only those documents' vectors are scored, so the
+        k results returned all pass the filter.
+        """
+        searches = [
+            (snapshot.index, snapshot.tombstone_selector, dict(
+                nprobe=nprobe,
+                ef_search=ef_search,
+                full_vectors=snapshot.full_vectors if rerank else None
+            )),
+        ]
+        searches.extend(
+            (delta_index, selector, {})
+            for delta_index, selector in zip(snapshot.delta_indexes, snapshot.delta_tombstone_selectors)
+            if delta_index.ntotal
+        )
+        
+        all_distances = []
+        all_indices = []
+        for index, selector, knobs in searches:
+            allowed = None
+            if document_ids:
+                selector, allowed = self._make_filter_selector(
+                    snapshot.id_map, index, document_ids, selector, snapshot.tombstones
+                )
+                if selector is None:
+                    continue
             
-        except Exception as e:
-            logger.error(f"Error loading FAISS index: {str(e)}")
-            return False
+            distances, indices = self._search_one(index, selector, query_embeddings, k, allowed=allowed, **knobs)
+            all_distances.append(distances)
+            all_indices.append(indices)
+        
+        if not all_distances:
+            return (
+                np.full((len(query_embeddings), k), np.inf, dtype='float32'),
+                np.full((len(query_embeddings), k), -1, dtype='int64')
+            )
+        
+        if len(all_distances) == 1:
+            return all_distances[0], all_indices[0]
+        
+        distances = np.hstack(all_distances)
+        indices = np.hstack(all_indices)
+        
+        # Missing results are -1 with a max distance, so they sort last
+        order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(indices, order, axis=1)
     
-    def _get_index_path(self) -> Path:
-        """Get path to FAISS index file."""
-        media_root = Path(settings.MEDIA_ROOT)
-        return media_root / 'faiss_indexes' / 'default_index.faiss'
+    def _search_one(
+        self,
+        index,
+        selector,
+        query_embeddings: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        full_vectors: Optional[np.ndarray] = None,
+        allowed: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search one ID-mapped index with per-request knobs, scoring only vectors the selector accepts.
+        
+        With full_vectors, extra candidates are fetched and re-ranked exactly.
+        allowed is the number of vectors a document filter accepts; an IVF
+        search finding fewer than min(k, allowed) of them is retried with
+        more probes, since they may sit in lists that were not probed.
+        """
+        import faiss
+        
+        inner = faiss.downcast_index(index.index)
+        
+        k_final = k
+        if full_vectors is not None:
+            k = min(k * settings.FAISS_RERANK_FACTOR, index.ntotal)
+        
+        if isinstance(inner, faiss.IndexIVF):
+            params = faiss.SearchParametersIVF()
+            params.nprobe = min(nprobe or settings.FAISS_NPROBE, inner.nlist)
+        elif isinstance(inner, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW()
+            params.efSearch = max(ef_search or settings.FAISS_EF_SEARCH, k)
+        else:
+            params = faiss.SearchParameters()
+        
+        if selector is not None:
+            params.sel = selector
+        
+        distances, positions = inner.search(query_embeddings, k, params=params)
+        
+        if allowed is not None and isinstance(inner, faiss.IndexIVF):
+            wanted = min(k_final, allowed)
+            while params.nprobe < inner.nlist and ((positions >= 0).sum(axis=1) < wanted).any():
+                params.nprobe = min(params.nprobe * 2, inner.nlist)
+                distances, positions = inner.search(query_embeddings, k, params=params)
+        
+        if full_vectors is not None:
+            distances, positions = self._rerank(full_vectors, query_embeddings, positions, k_final)
+        
+        # Translate inner positions back to vector IDs
+        vector_ids = faiss.rev_swig_ptr(index.id_map.data(), index.ntotal)
+        indices = np.where(positions >= 0, vector_ids[np.maximum(positions, 0)], -1)
+        return distances, indices
+    
+    def _update_index_record(self, snapshot: IndexSnapshot):
+        """Sync the FAISSIndex record with a snapshot."""
+        index_record, created = FAISSIndex.objects.get_or_create(
+            index_name='default',
+            defaults={
+                'dimension': snapshot.index.d,
+                'total_vectors': snapshot.total_vectors(),
+                'bytes_per_vector': self._bytes_per_vector(snapshot.index),
+                'index_file_path': str(self._get_store().path(snapshot.version))
+            }
+        )
+        
+        if not created:
+            index_record.total_vectors = snapshot.total_vectors()
+            index_record.bytes_per_vector = self._bytes_per_vector(snapshot.index)
+            index_record.index_file_path = str(self._get_store().path(snapshot.version))
+            index_record.save()
+    
+    def _bytes_per_vector(self, index) -> int:
+        """Estimate in-memory bytes per vector: stored codes, graph links and ID mapping."""
+        import faiss
+        
+        inner = faiss.downcast_index(index.index)
+        
+        if isinstance(inner, faiss.IndexHNSW):
+            # Stored vectors plus level-0 neighbour links (int32 each)
+            code_size = faiss.downcast_index(inner.storage).code_size + inner.hnsw.nb_neighbors(0) * 4
+        elif isinstance(inner, faiss.IndexIVF):
+            # Codes plus the int64 label kept in the inverted list
+            code_size = inner.code_size + 8
+        else:
+            code_size = inner.code_size
+        
+        # IndexIDMap keeps one int64 external ID per vector
+        return int(code_size) + 8
+    
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Run one model forward pass over texts."""
+        if FAISSService._model is None:
+            self.load_embedding_model()
+        return FAISSService._model.encode(texts, show_progress_bar=False).astype('float32')
+    
+    def _get_embedding_batcher(self) -> EmbeddingBatcher:
+        """Get the query embedding batcher, creating it from settings on first use."""
+        if FAISSService._embedding_batcher is None:
+            FAISSService._embedding_batcher = EmbeddingBatcher(
+                self._encode_texts,
+                max_wait=settings.EMBEDDING_BATCH_MAX_WAIT_MS / 1000,
+                max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE
+            )
+        return FAISSService._embedding_batcher
+    
+    def _get_query_cache(self) -> QueryEmbeddingCache:
+        """Get the query embedding cache, creating it from settings on first use."""
+        if FAISSService._query_cache is None:
+            FAISSService._query_cache = QueryEmbeddingCache(
+                settings.QUERY_EMBEDDING_CACHE_SIZE,
+                shared_alias=settings.QUERY_EMBEDDING_SHARED_CACHE,
+                shared_timeout=settings.QUERY_EMBEDDING_SHARED_CACHE_TTL
+            )
+        return FAISSService._query_cache
+    
+    def _get_result_cache(self) -> SearchResultCache:
+        """Get the search result cache, creating it from settings on first use."""
+        if FAISSService._result_cache is None:
+            FAISSService._result_cache = SearchResultCache(
+                settings.SEARCH_RESULT_CACHE_SIZE,
+                settings.SEARCH_RESULT_CACHE_TTL
+            )
+        return FAISSService._result_cache
+    
+    def _get_store(self) -> SnapshotStore:
+        """Get the store holding versioned index snapshots."""
+        return SnapshotStore(Path(settings.MEDIA_ROOT) / 'faiss_indexes', keep=settings.FAISS_SNAPSHOT_KEEP)
+    
+    def _get_legacy_index_path(self) -> Path:
+        """Get path to the index file written before versioned snapshots."""
+        return self._get_store().root / 'default_index.faiss'
+    
+    def _remove_legacy_files(self):
+        """Remove index, mapping and delta files written before versioned snapshots."""
+        root = self._get_store().root
+        for name in (
+            'default_index.faiss', 'chunk_mapping.pkl', 'full_vectors.npy',
+            VectorIdMap.VECTOR_IDS_FILE, VectorIdMap.CHUNK_UUIDS_FILE, VectorIdMap.DOCUMENT_UUIDS_FILE,
+            VectorIdMap.PAGE_NUMBERS_FILE, VectorIdMap.DOCUMENT_NAMES_FILE,
+        ):
+            (root / name).unlink(missing_ok=True)
+        shutil.rmtree(root / 'deltas', ignore_errors=True)
     
     def get_index_stats(self) -> Dict:
         """Get statistics about the current FAISS index."""
-        if FAISSService._index is None:
-            self.load_index()
+        import faiss
+        
+        snapshot = self._get_snapshot()
         
-        if FAISSService._index is None:
+        if snapshot is None:
             return {
                 'status': 'not_initialized',
                 'total_vectors': 0,
@@ -313,12 +1792,24 @@ class FAISSService:
         
         return {
             'status': 'active',
-            'total_vectors': FAISSService._index.ntotal,
-            'dimension': FAISSService._index.d,
-            'total_chunks': Chunk.objects.count()
+            'version': snapshot.version,
+            'index_type': type(faiss.downcast_index(snapshot.index.index)).__name__,
+            'memory_mapped': snapshot.memory_mapped,
+            'total_vectors': snapshot.total_vectors(),
+            'delta_vectors': snapshot.delta_vectors(),
+            'delta_segments': len(snapshot.deltas),
+            'dimension': snapshot.index.d,
+            'bytes_per_vector': self._bytes_per_vector(snapshot.index),
+            'rerank_available': snapshot.full_vectors is not None,
+            'total_chunks': Chunk.objects.count(),
+            'tombstoned_vectors': len(snapshot.tombstones),
+            'tombstone_ratio': self._tombstone_ratio(snapshot),
+            'query_embedding_cache': self._get_query_cache().stats(),
+            'search_result_cache': self._get_result_cache().stats(),
+            'embedding_batcher': self._get_embedding_batcher().stats() if settings.EMBEDDING_BATCHING else None,
+            'embedding_backend': FAISSService._model.stats() if FAISSService._model is not None else None
         }
 
 
-# Singleton instance
-faiss_service = FAISSService()
-
+# Singleton instance, created on first use
+faiss_service = SimpleLazyObject(FAISSService)
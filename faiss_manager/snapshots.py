@@ -0,0 +1,240 @@
+"""
+Versioned FAISS index snapshots, on disk and in memory.
+"""
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Optional
+from django.utils import timezone
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSnapshot:
+    """
+    One consistent view of the index: the FAISS index, the delta indexes of
+    vectors appended since the last full build (one per delta segment),
+    the chunk mapping and the tombstoned vector IDs.
+    
+    Snapshots are never modified after construction. Writers build a new
+    snapshot and swap it in by reference, so a search finishes against the
+    snapshot it started with.
+    """
+    
+    def __init__(
+        self,
+        version: int,
+        index,
+        id_map,
+        delta_indexes: tuple = (),
+        tombstones: frozenset = frozenset(),
+        tombstone_selector=None,
+        delta_tombstone_selectors: tuple = (),
+        full_vectors=None,
+        memory_mapped: bool = False,
+        deltas: tuple = (),
+        base_id: Optional[str] = None,
+        base_id_map=None
+    ):
+        self.version = version  # Published snapshot version this was loaded from or written as
+        self.index = index  # ID-mapped FAISS index
+        self.id_map = id_map  # VectorIdMap covering index and delta_indexes
+        self.delta_indexes = delta_indexes  # Flat ID-mapped indexes of appended vectors, shared with older snapshots
+        self.tombstones = tombstones  # Vector IDs of deleted chunks still present in the index
+        self.tombstone_selector = tombstone_selector  # FAISS selector skipping tombstoned vectors
+        self.delta_tombstone_selectors = delta_tombstone_selectors  # Same, per delta index
+        self.full_vectors = full_vectors  # Full-precision vectors in index order (compressed indexes only)
+        self.memory_mapped = memory_mapped  # Whether index is a read-only memory map of the saved file
+        self.deltas = deltas  # Delta segment file names applied on top of index
+        self.base_id = base_id  # Manifest ID of the full index build index was read from or written as
+        self.base_id_map = base_id_map if base_id_map is not None else id_map  # VectorIdMap of index alone
+    
+    def delta_vectors(self) -> int:
+        """Number of vectors in the delta indexes."""
+        return sum(delta_index.ntotal for delta_index in self.delta_indexes)
+    
+    def total_vectors(self) -> int:
+        """Number of vectors in the index and its delta indexes."""
+        return self.index.ntotal + self.delta_vectors()
+
+
+class WriterLock:
+    """
+    Exclusive lock on a file, serializing index writers across processes.
+    
+    The lock is reentrant, so a writer can call another writer (e.g.
+    compaction after an append). It does not serialize threads: callers
+    hold a thread lock around it. Without fcntl (Windows) it is a no-op.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+        self._depth = 0
+    
+    def __enter__(self):
+        if self._depth == 0 and fcntl is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            lock_file = open(self.path, 'a')
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            except Exception:
+                lock_file.close()
+                raise
+            self._file = lock_file
+        self._depth += 1
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class SnapshotStore:
+    """
+    Versioned snapshot directories under one root.
+    
+    Each version lives in its own directory (v000001, v000002, ...) with
+    the index, the chunk mapping, delta segments and a manifest. A version
+    is written to a temp directory, published by renaming it into place and
+    made current by atomically replacing the CURRENT pointer file. Files
+    carried over from the previous version are hard links, so publishing a
+    delta does not copy the index.
+    """
+    
+    CURRENT_FILE = 'CURRENT'
+    MANIFEST_FILE = 'manifest.json'
+    INDEX_FILE = 'index.faiss'
+    FULL_VECTORS_FILE = 'full_vectors.npy'
+    LOCK_FILE = 'write.lock'
+    STALE_TMP_SECONDS = 3600  # Temp directories older than this are left over from crashed writers
+    
+    def __init__(self, root: Path, keep: int = 3):
+        self.root = root
+        self.keep = keep  # Number of most recent versions kept on disk
+    
+    def path(self, version: int) -> Path:
+        """Get the directory of a version."""
+        return self.root / f'v{version:06d}'
+    
+    def current_version(self) -> Optional[int]:
+        """Get the current version from the CURRENT pointer, or None if nothing is published."""
+        try:
+            name = (self.root / self.CURRENT_FILE).read_text().strip()
+        except FileNotFoundError:
+            return None
+        return int(name.lstrip('v'))
+    
+    def writer_lock(self) -> WriterLock:
+        """Get a lock serializing writers of this store across processes."""
+        return WriterLock(self.root / self.LOCK_FILE)
+    
+    def read_manifest(self, version: int) -> dict:
+        """Read the manifest of a version."""
+        with open(self.path(version) / self.MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def publish(self, write_files: Callable[[Path], None], manifest: dict, link_from: Optional[int] = None) -> int:
+        """
+        Write and publish a new version.
+        
+        Args:
+            write_files: Callable writing the version's new files into the directory it is given
+            manifest: Manifest fields; version, created_at and files are filled in here
+            link_from: Optional version whose files are hard-linked into the new one
+        
+        Returns:
+            The published version
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_dir = self.root / f'.tmp-{uuid.uuid4().hex}'
+        tmp_dir.mkdir()
+        
+        try:
+            if link_from is not None:
+                for source in self.path(link_from).iterdir():
+                    if source.name != self.MANIFEST_FILE:
+                        os.link(source, tmp_dir / source.name)
+            
+            write_files(tmp_dir)
+            
+            version = self._next_version()
+            manifest = dict(
+                manifest,
+                version=version,
+                created_at=timezone.now().isoformat(),
+                files=sorted(path.name for path in tmp_dir.iterdir())
+            )
+            with open(tmp_dir / self.MANIFEST_FILE, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            
+            # Make the files durable before the directory becomes visible
+            for path in tmp_dir.iterdir():
+                self._fsync(path)
+            
+            os.rename(tmp_dir, self.path(version))
+            self._fsync(self.root)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        
+        self._write_current(version)
+        logger.info(f"Published FAISS index snapshot v{version:06d}")
+        
+        self.prune()
+        return version
+    
+    def prune(self):
+        """Delete all but the most recent versions, and temp directories of crashed writers."""
+        current = self.current_version()
+        versions = self._versions()
+        for version in versions[:-self.keep]:
+            if version != current:
+                shutil.rmtree(self.path(version), ignore_errors=True)
+        
+        for tmp_dir in self.root.glob('.tmp-*'):
+            if time.time() - tmp_dir.stat().st_mtime > self.STALE_TMP_SECONDS:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+    
+    def _versions(self):
+        """Get published versions on disk, oldest first."""
+        return sorted(
+            int(path.name[1:]) for path in self.root.glob('v*')
+            if path.is_dir() and path.name[1:].isdigit()
+        )
+    
+    def _next_version(self) -> int:
+        """Get the version number for the next publish."""
+        versions = self._versions()
+        return versions[-1] + 1 if versions else 1
+    
+    def _write_current(self, version: int):
+        """Point CURRENT at a version atomically."""
+        current_path = self.root / self.CURRENT_FILE
+        tmp_path = current_path.with_name(f'{self.CURRENT_FILE}.{uuid.uuid4().hex}.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(self.path(version).name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, current_path)
+    
+    @staticmethod
+    def _fsync(path: Path):
+        """Flush a file or directory to disk."""
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
@@ -0,0 +1,402 @@
+"""
+Tests for the FAISS manager app.
+"""
+import importlib.util
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from documents.models import Chunk, Document
+from .batching import EmbeddingBatcher
+from .embedding_backends import ONNX_MODEL_FILE, ONNXBackend, SentenceTransformerBackend
+from .index_writer import IndexWriter
+from .models import PendingIndexDocument
+from .services import FAISSService, faiss_service
+
+
+def fake_encode(texts):
+    """Embed texts as rows of their lengths."""
+    return np.array([[len(text)] * 3 for text in texts], dtype='float32')
+
+
+class EmbeddingBatcherTests(SimpleTestCase):
+    """Tests for micro-batching of concurrent embedding requests."""
+    
+    def test_encode_returns_each_callers_rows(self):
+        batcher = EmbeddingBatcher(fake_encode, max_wait=0.01, max_batch_size=32)
+        
+        embeddings = batcher.encode(['a', 'bbb'])
+        
+        np.testing.assert_array_equal(embeddings[:, 0], [1, 3])
+    
+    def _blocked_batcher(self, max_wait: float):
+        """Get a batcher whose first encode blocks until the returned event is set, and its encode calls."""
+        release = threading.Event()
+        calls = []
+        
+        def encode(texts):
+            calls.append(texts)
+            if len(calls) == 1:
+                release.wait(timeout=5)
+            return fake_encode(texts)
+        
+        batcher = EmbeddingBatcher(encode, max_wait=max_wait, max_batch_size=32)
+        blocker = batcher.submit(['blocker'])
+        while not calls:
+            time.sleep(0.001)
+        return batcher, release, calls, blocker
+    
+    def test_lone_request_is_not_held_back(self):
+        batcher = EmbeddingBatcher(fake_encode, max_wait=5, max_batch_size=32)
+        
+        start = time.monotonic()
+        batcher.encode(['alone'])
+        
+        self.assertLess(time.monotonic() - start, 1)
+    
+    def test_requests_queued_during_encode_are_batched(self):
+        batcher, release, calls, blocker = self._blocked_batcher(max_wait=0.05)
+        futures = [batcher.submit([text]) for text in ('a', 'bb', 'ccc')]
+        release.set()
+        
+        blocker.result(timeout=5)
+        rows = [future.result(timeout=5)[0, 0] for future in futures]
+        
+        self.assertEqual(rows, [1, 2, 3])
+        self.assertEqual(calls, [['blocker'], ['a', 'bb', 'ccc']])
+    
+    def test_cancelled_request_does_not_stop_batcher(self):
+        # The request is cancelled while it waits for the batch before it
+        batcher, release, calls, blocker = self._blocked_batcher(max_wait=0.01)
+        cancelled = batcher.submit(['cancelled'])
+        self.assertTrue(cancelled.cancel())
+        release.set()
+        
+        embeddings = batcher.submit(['after']).result(timeout=5)
+        
+        np.testing.assert_array_equal(embeddings[:, 0], [5])
+        self.assertNotIn(['cancelled'], calls)
+        self.assertTrue(batcher._thread.is_alive())
+    
+    def test_failed_batch_does_not_stop_batcher(self):
+        calls = []
+        
+        def encode(texts):
+            calls.append(texts)
+            if len(calls) == 1:
+                raise RuntimeError('model error')
+            return fake_encode(texts)
+        
+        batcher = EmbeddingBatcher(encode, max_wait=0.01, max_batch_size=32)
+        
+        with self.assertRaises(RuntimeError):
+            batcher.encode(['first'])
+        embeddings = batcher.submit(['second']).result(timeout=5)
+        
+        np.testing.assert_array_equal(embeddings[:, 0], [6])
+
+
+class ONNXBackendParityTests(SimpleTestCase):
+    """
+    Tests that the ONNX backend embeds like the torch backend.
+    
+    Set ONNX_MODEL_PATH (default: settings.EMBEDDING_MODEL_PATH) to an
+    export_onnx_model directory of settings.EMBEDDING_MODEL to run them.
+    """
+    
+    # Lowest acceptable per-text cosine similarity, as in bench_embeddings.py
+    MIN_COSINE = 0.99
+    
+    TEXTS = [
+        'What does the manual say about resetting the device?',
+        'Chunks are embedded and searched with an approximate nearest neighbour index.',
+        ' '.join(['A longer passage that is padded in a batch with much shorter texts.'] * 12),
+        'short'
+    ]
+    
+    def setUp(self):
+        self.model_path = os.getenv('ONNX_MODEL_PATH', settings.EMBEDDING_MODEL_PATH)
+        if not self.model_path or not (Path(self.model_path) / ONNX_MODEL_FILE).exists():
+            self.skipTest('No exported ONNX model; set ONNX_MODEL_PATH')
+        for module in ('onnxruntime', 'tokenizers', 'sentence_transformers'):
+            if importlib.util.find_spec(module) is None:
+                self.skipTest(f'{module} is not installed')
+    
+    def test_embeddings_match_torch_backend(self):
+        reference = SentenceTransformerBackend(settings.EMBEDDING_MODEL).encode(self.TEXTS)
+        embeddings = ONNXBackend(self.model_path).encode(self.TEXTS)
+        
+        self.assertEqual(embeddings.shape, reference.shape)
+        cosine = (embeddings * reference).sum(axis=1) / (
+            np.linalg.norm(embeddings, axis=1) * np.linalg.norm(reference, axis=1)
+        )
+        self.assertGreaterEqual(cosine.min(), self.MIN_COSINE)
+
+
+class SnapshotReloadTests(TestCase):
+    """Tests for loading snapshot versions published by other processes."""
+    
+    def setUp(self):
+        storage = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, storage, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=storage, FAISS_COMPACTION_RATIO=10.0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        
+        self._reset_index()
+        self.addCleanup(self._reset_index)
+    
+    def _reset_index(self):
+        FAISSService._snapshot = None
+        FAISSService._writer_lock = None
+    
+    def _create_document(self, name: str, chunk_count: int) -> Document:
+        document = Document.objects.create(
+            filename=name, original_filename=name, file_path=f'/nonexistent/{name}', file_size=1
+        )
+        Chunk.objects.bulk_create([
+            Chunk(document=document, chunk_text=f'{name} chunk {i}', page_number=1, chunk_index=i)
+            for i in range(chunk_count)
+        ])
+        return document
+    
+    def test_new_delta_is_applied_to_the_loaded_index(self):
+        self._create_document('first.pdf', 4)
+        faiss_service.build_index()
+        loaded = FAISSService._snapshot
+        
+        # Another process appends a document; this one still serves the old version
+        added = self._create_document('second.pdf', 3)
+        faiss_service.add_document(str(added.id))
+        published = FAISSService._snapshot
+        FAISSService._snapshot = loaded
+        
+        self.assertTrue(faiss_service.load_index())
+        
+        reloaded = FAISSService._snapshot
+        self.assertEqual(reloaded.version, published.version)
+        self.assertIs(reloaded.index, loaded.index)
+        self.assertEqual(reloaded.total_vectors(), 7)
+        self.assertEqual(reloaded.deltas, published.deltas)
+    
+    def test_rebuilt_index_is_read_in_full(self):
+        self._create_document('first.pdf', 4)
+        faiss_service.build_index()
+        loaded = FAISSService._snapshot
+        
+        self._create_document('second.pdf', 3)
+        faiss_service.build_index()
+        FAISSService._snapshot = loaded
+        
+        self.assertTrue(faiss_service.load_index())
+        
+        self.assertIsNot(FAISSService._snapshot.index, loaded.index)
+        self.assertEqual(FAISSService._snapshot.total_vectors(), 7)
+    
+    def test_appended_documents_share_one_id_map_block(self):
+        self._create_document('first.pdf', 4)
+        faiss_service.build_index()
+        
+        documents = [self._create_document(f'added{i}.pdf', 2) for i in range(3)]
+        for document in documents:
+            faiss_service.add_document(str(document.id))
+        
+        id_map = FAISSService._snapshot.id_map
+        self.assertEqual(len(id_map._blocks), 2)
+        self.assertEqual(len(id_map), 10)
+        for document in documents:
+            vector_ids = id_map.vector_ids_for_chunks(document.chunks.values_list('id', flat=True))
+            self.assertEqual(len(vector_ids), 2)
+            self.assertEqual(
+                {entry['document_id'] for entry in id_map.lookup(vector_ids)}, {str(document.id)}
+            )
+    
+    @override_settings(FAISS_MAX_DELTA_SEGMENTS=2)
+    def test_delta_segments_are_merged_past_the_cap(self):
+        self._create_document('first.pdf', 4)
+        faiss_service.build_index()
+        built = FAISSService._snapshot
+        
+        removed = self._create_document('removed.pdf', 1)
+        faiss_service.add_document(str(removed.id))
+        loaded = FAISSService._snapshot
+        faiss_service.remove_document(str(removed.id))
+        self.assertEqual(len(FAISSService._snapshot.deltas), 2)
+        
+        faiss_service.add_document(str(self._create_document('last.pdf', 2).id))
+        
+        merged = FAISSService._snapshot
+        self.assertEqual(len(merged.deltas), 1)
+        self.assertEqual(len(merged.delta_indexes), 1)
+        self.assertIs(merged.index, built.index)
+        self.assertEqual(merged.base_id, built.base_id)
+        self.assertEqual(merged.total_vectors(), 7)
+        self.assertEqual(len(merged.tombstones), 1)
+        
+        # A process holding an earlier version of the build applies the merged segment to its index
+        FAISSService._snapshot = loaded
+        self.assertTrue(faiss_service.load_index())
+        reloaded = FAISSService._snapshot
+        self.assertIs(reloaded.index, built.index)
+        self.assertEqual(reloaded.deltas, merged.deltas)
+        self.assertEqual(reloaded.tombstones, merged.tombstones)
+        self.assertEqual(len(reloaded.id_map), 7)
+
+
+class FilteredSearchTests(TestCase):
+    """Tests for searches limited to some documents."""
+    
+    def setUp(self):
+        storage = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, storage, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=storage, FAISS_IVF_NLIST=4, FAISS_NPROBE=1)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        
+        FAISSService._snapshot = None
+        FAISSService._writer_lock = None
+        self.addCleanup(setattr, FAISSService, '_snapshot', None)
+        self.addCleanup(setattr, FAISSService, '_writer_lock', None)
+    
+    def test_filtered_ivf_search_probes_more_lists_for_top_k(self):
+        import faiss
+        
+        # Four well-separated clusters, with one chunk of the filtered document in each
+        centers = np.eye(4, 8, dtype='float32') * 100
+        noise = np.random.default_rng(0).normal(scale=0.1, size=(40, 8)).astype('float32')
+        vectors = {}
+        for name, per_cluster in (('filler', 40), ('target', 1)):
+            document = Document.objects.create(
+                filename=f'{name}.pdf',
+                original_filename=f'{name}.pdf',
+                file_path=f'/nonexistent/{name}.pdf',
+                file_size=1
+            )
+            chunks = Chunk.objects.bulk_create([
+                Chunk(document=document, chunk_text=f'{name} chunk {i}', page_number=1, chunk_index=i)
+                for i in range(4 * per_cluster)
+            ])
+            for i, chunk in enumerate(chunks):
+                vectors[chunk.chunk_text] = centers[i % 4] + noise[i // 4]
+        
+        with mock.patch.object(
+            faiss_service, 'get_chunk_embeddings', side_effect=lambda texts: np.array([vectors[text] for text in texts])
+        ):
+            faiss_service.build_index(index_type='ivf_flat')
+        
+        snapshot = FAISSService._snapshot
+        self.assertEqual(faiss.downcast_index(snapshot.index.index).nlist, 4)
+        
+        # The default single probe only reaches the cluster nearest the query
+        distances, vector_ids = faiss_service._search_index(
+            snapshot, centers[:1], 4, document_ids=[str(document.id)]
+        )
+        
+        self.assertEqual((vector_ids[0] >= 0).sum(), 4)
+        self.assertEqual(
+            {entry['document_id'] for entry in snapshot.id_map.lookup(vector_ids[0])}, {str(document.id)}
+        )
+
+
+class LegacyIndexConversionTests(TestCase):
+    """Tests for converting index files saved before versioned snapshots."""
+    
+    def setUp(self):
+        storage = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, storage, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=storage, FAISS_INDEX_TYPE='flat')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        
+        FAISSService._snapshot = None
+        FAISSService._writer_lock = None
+        self.addCleanup(setattr, FAISSService, '_snapshot', None)
+        self.addCleanup(setattr, FAISSService, '_writer_lock', None)
+        
+        self.document = Document.objects.create(
+            filename='old.pdf', original_filename='old.pdf', file_path='/nonexistent/old.pdf', file_size=1
+        )
+        self.chunks = Chunk.objects.bulk_create([
+            Chunk(document=self.document, chunk_text=f'old chunk {i}', page_number=i + 1, chunk_index=i)
+            for i in range(5)
+        ])
+        self.vectors = np.random.default_rng(0).random((5, 8), dtype='float32')
+        self._write_legacy_index(self.chunks)
+    
+    def _write_legacy_index(self, chunks):
+        import faiss
+        
+        root = Path(settings.MEDIA_ROOT) / 'faiss_indexes'
+        root.mkdir(parents=True)
+        index = faiss.IndexFlatL2(self.vectors.shape[1])
+        index.add(self.vectors)
+        faiss.write_index(index, str(root / 'default_index.faiss'))
+        with open(root / 'chunk_mapping.pkl', 'wb') as f:
+            pickle.dump({i: str(chunk.id) for i, chunk in enumerate(chunks)}, f)
+    
+    def test_read_path_does_not_convert(self):
+        with mock.patch.object(faiss_service, 'build_index') as build_index:
+            self.assertFalse(faiss_service.load_index())
+        
+        build_index.assert_not_called()
+        self.assertTrue(faiss_service._get_legacy_index_path().exists())
+        self.assertIsNone(faiss_service._get_store().current_version())
+    
+    def test_converts_without_re_embedding(self):
+        self.chunks[4].delete()
+        
+        with mock.patch.object(faiss_service, 'get_chunk_embeddings', side_effect=AssertionError('re-embedded')):
+            self.assertEqual(faiss_service.convert_legacy_index(), 4)
+        
+        snapshot = FAISSService._snapshot
+        self.assertEqual(snapshot.version, 1)
+        self.assertFalse(faiss_service._get_legacy_index_path().exists())
+        self.assertEqual(snapshot.index.ntotal, 4)
+        
+        # Each chunk's legacy vector is found under the chunk's vector ID
+        distances, vector_ids = snapshot.index.search(self.vectors[:4], 1)
+        np.testing.assert_array_equal(distances[:, 0], 0)
+        for chunk, vector_id in zip(self.chunks[:4], vector_ids[:, 0]):
+            chunk.refresh_from_db()
+            self.assertEqual(vector_id, chunk.embedding_vector_id)
+            self.assertEqual(snapshot.id_map.lookup([vector_id])[0]['chunk_id'], str(chunk.id))
+
+
+class IndexWriterTests(TestCase):
+    """Tests for the queue of documents waiting for an index commit."""
+    
+    def setUp(self):
+        self.writer = IndexWriter()
+        self.document_ids = [
+            str(Document.objects.create(
+                filename=name, original_filename=name, file_path=f'/nonexistent/{name}', file_size=1
+            ).id)
+            for name in ('first.pdf', 'second.pdf')
+        ]
+    
+    def test_first_queued_document_opens_window(self):
+        self.assertTrue(self.writer.enqueue(self.document_ids[0]))
+        self.assertFalse(self.writer.enqueue(self.document_ids[1]))
+    
+    def test_document_queued_while_commit_clears_queue_opens_window(self):
+        first, second = self.document_ids
+        self.writer.enqueue(first)
+        get_or_create = PendingIndexDocument.objects.get_or_create
+        
+        def insert_during_commit(**kwargs):
+            # The commit dequeues its batch and finds nothing else queued before this insert lands
+            self.writer.dequeue([first])
+            self.assertIsNone(self.writer.seconds_until_due())
+            return get_or_create(**kwargs)
+        
+        with mock.patch.object(PendingIndexDocument.objects, 'get_or_create', side_effect=insert_during_commit):
+            self.assertTrue(self.writer.enqueue(second))
@@ -3,5 +3,8 @@ from . import views
 
 urlpatterns = [
     path('status/', views.FAISSStatusView.as_view(), name='faiss-status'),
+    path('ready/', views.FAISSReadyView.as_view(), name='faiss-ready'),
     path('rebuild/', views.FAISSRebuildView.as_view(), name='faiss-rebuild'),
+    path('compact/', views.FAISSCompactView.as_view(), name='faiss-compact'),
+    path('search-batch/', views.FAISSSearchBatchView.as_view(), name='faiss-search-batch'),
 ]
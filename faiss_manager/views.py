@@ -1,16 +1,139 @@
 """
-Placeholder views for FAISS manager app.
-Will be implemented in the next step.
+Views for FAISS index management
 """
+from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
+from . import retrieval
+from .serializers import SearchBatchSerializer
+from .services import faiss_service
+import logging
+
+logger = logging.getLogger(__name__)
+
 
 class FAISSStatusView(APIView):
     """Get FAISS index status"""
-    pass
+    
+    def get(self, request, *args, **kwargs):
+        """Return statistics about the loaded FAISS index"""
+        return Response(faiss_service.get_index_stats(), status=status.HTTP_200_OK)
+
+
+class FAISSReadyView(APIView):
+    """Report whether this worker is warmed up"""
+    
+    def get(self, request, *args, **kwargs):
+        """Return 200 once the worker can serve searches, 503 while it warms up"""
+        readiness = faiss_service.get_readiness()
+        return Response(
+            readiness,
+            status=status.HTTP_200_OK if readiness['ready'] else status.HTTP_503_SERVICE_UNAVAILABLE
+        )
 
 
 class FAISSRebuildView(APIView):
     """Rebuild FAISS index"""
-    pass
+    
+    def post(self, request, *args, **kwargs):
+        """Run a full rebuild of the FAISS index from all chunks"""
+        if not request.data.get('confirm'):
+            return Response(
+                {'confirm': ['Set "confirm": true to rebuild the index.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            logger.info("Full FAISS index rebuild requested")
+            built = faiss_service.build_index()
+        except Exception as e:
+            logger.error(f"Error rebuilding FAISS index: {str(e)}")
+            return Response(
+                {
+                    'error': 'Failed to rebuild FAISS index',
+                    'detail': str(e)
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        return Response(
+            {
+                'message': 'FAISS index rebuilt' if built else 'No chunks found to index',
+                'stats': faiss_service.get_index_stats()
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class FAISSCompactView(APIView):
+    """Compact FAISS index"""
+    
+    def post(self, request, *args, **kwargs):
+        """Drop vectors of deleted documents from the FAISS index"""
+        try:
+            compacted = faiss_service.compact_index()
+        except Exception as e:
+            logger.error(f"Error compacting FAISS index: {str(e)}")
+            return Response(
+                {
+                    'error': 'Failed to compact FAISS index',
+                    'detail': str(e)
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        return Response(
+            {
+                'message': 'FAISS index compacted' if compacted else 'Nothing to compact',
+                'stats': faiss_service.get_index_stats()
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class FAISSSearchBatchView(APIView):
+    """Search FAISS index for many queries"""
+    
+    def post(self, request, *args, **kwargs):
+        """Run a batch of similarity searches in one request"""
+        serializer = SearchBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        queries = data['queries']
+        if 'filters' in data:
+            filters = [[str(doc_id) for doc_id in document_ids] for document_ids in data['filters']]
+        elif data.get('document_filter'):
+            filters = [[str(doc_id) for doc_id in data['document_filter']]] * len(queries)
+        else:
+            filters = None
+        
+        try:
+            logger.info(f"Batch search requested for {len(queries)} queries")
+            results = retrieval.search_batch(
+                queries,
+                top_k=data['top_k'],
+                filters=filters,
+                nprobe=data.get('nprobe'),
+                ef_search=data.get('ef_search')
+            )
+        except Exception as e:
+            logger.error(f"Error running batch search: {str(e)}")
+            return Response(
+                {
+                    'error': 'Failed to search FAISS index',
+                    'detail': str(e)
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        return Response(
+            {
+                'results': [
+                    {'query': query, 'results': query_results}
+                    for query, query_results in zip(queries, results)
+                ]
+            },
+            status=status.HTTP_200_OK
+        )
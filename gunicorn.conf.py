@@ -0,0 +1,60 @@
+"""
+Gunicorn configuration.
+
+Run from the backend directory:
+    gunicorn config.wsgi:application
+
+Gunicorn's own defaults apply unless GUNICORN_BIND, GUNICORN_WORKERS or
+GUNICORN_TIMEOUT is set.
+
+Preloading is opt-in: with GUNICORN_PRELOAD=True, the master process loads
+Django, the embedding model and the FAISS index once, then forks the
+workers, which share those pages copy-on-write instead of each loading
+their own copy. Each worker then resets its locks and thread pools and
+warms up (settings.FAISS_WARMUP) on its own.
+"""
+import gc
+import os
+
+if os.getenv('GUNICORN_BIND'):
+    bind = os.environ['GUNICORN_BIND']
+if os.getenv('GUNICORN_WORKERS'):
+    workers = int(os.environ['GUNICORN_WORKERS'])
+if os.getenv('GUNICORN_TIMEOUT'):
+    timeout = int(os.environ['GUNICORN_TIMEOUT'])
+preload_app = os.getenv('GUNICORN_PRELOAD', 'False') == 'True'
+
+if preload_app:
+    # Read by config.settings, so apps do not warm up in the master
+    os.environ['FAISS_PRELOAD'] = 'True'
+
+
+def when_ready(server):
+    """Load the model and index in the master, after the app and before forking workers."""
+    if not preload_app:
+        return
+    
+    from django.db import connections
+    from faiss_manager.services import faiss_service
+    
+    faiss_service.preload()
+    
+    # Workers must not share the master's database sockets
+    connections.close_all()
+    
+    # Move everything loaded so far out of the collector's reach, so the
+    # collector in each worker does not write to (and so copy) shared pages
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Re-create per-process state and warm up each worker forked from a preloaded master."""
+    if not preload_app:
+        return
+    
+    from faiss_manager.services import faiss_service
+    
+    faiss_service.reset_after_fork()
+    if faiss_service.warm_up_enabled():
+        faiss_service.start_warm_up()